@@ -3,9 +3,13 @@ Database configuration and session management
 """
 
 import os
-from sqlalchemy import create_engine
+from typing import Dict, Optional
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -13,15 +17,117 @@ load_dotenv()
 # Database URL
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./srm_timetable.db")
 
+# Async driver URL for the read endpoints; derived from DATABASE_URL unless set
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+}
+
+def to_async_url(database_url: str) -> str:
+    """DATABASE_URL with its driver swapped for the async one (sqlite -> aiosqlite, postgresql -> asyncpg)"""
+    scheme, sep, rest = database_url.partition("://")
+    dialect = scheme.split("+")[0]
+    return f"{ASYNC_DRIVERS.get(dialect, scheme)}{sep}{rest}"
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or to_async_url(DATABASE_URL)
+
+# Connection pool (recycle and pre-ping only apply to server databases such as PostgreSQL)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))  # seconds to wait for a free connection
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # seconds before a connection is replaced
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() == "true"
+
+# SQLite: WAL lets readers keep going while a generation transaction writes, and
+# busy_timeout makes a second writer wait for the lock instead of failing at once
+# WAL is a persistent property of the database file and keeps -wal/-shm files beside it;
+# SQLITE_JOURNAL_MODE=DELETE keeps a database in the rollback-journal format
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),  # safe with WAL, far fewer fsyncs than FULL
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE_KB", "20000")) * -1,  # negative means KiB, not pages
+    "temp_store": "MEMORY",
+    "busy_timeout": SQLITE_BUSY_TIMEOUT_MS,
+}
+
+def _is_memory_sqlite(database_url: str) -> bool:
+    return database_url in ("sqlite://", "sqlite:///:memory:") or "mode=memory" in database_url
+
+def _apply_sqlite_pragmas(engine: Engine, pragmas: Dict):
+    """Set pragmas on every new DBAPI connection"""
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+def _engine_options(database_url: str, sqlite_pragmas: Optional[Dict], queue_pool=QueuePool):
+    """create_engine keyword arguments and SQLite pragmas (None for other databases)
+
+    File-based SQLite gets queue_pool explicitly: depending on the SQLAlchemy
+    version and driver (aiosqlite defaults to NullPool) the default pool would
+    reject the sizing arguments.
+    """
+    if not database_url.startswith("sqlite"):
+        return {
+            "echo": DB_ECHO,
+            "pool_size": DB_POOL_SIZE,
+            "max_overflow": DB_MAX_OVERFLOW,
+            "pool_timeout": DB_POOL_TIMEOUT,
+            "pool_recycle": DB_POOL_RECYCLE,
+            "pool_pre_ping": DB_POOL_PRE_PING
+        }, None
+
+    pragmas = dict(SQLITE_PRAGMAS, **(sqlite_pragmas or {}))
+    options = {
+        "echo": DB_ECHO,
+        "connect_args": {"check_same_thread": False, "timeout": pragmas.get("busy_timeout", 0) / 1000}
+    }
+    if _is_memory_sqlite(database_url):
+        # An in-memory database has no journal file to put in WAL mode
+        pragmas.pop("journal_mode", None)
+    else:
+        options.update(poolclass=queue_pool, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW,
+                       pool_timeout=DB_POOL_TIMEOUT)
+    return options, pragmas
+
+def create_db_engine(database_url: str = DATABASE_URL, sqlite_pragmas: Optional[Dict] = None) -> Engine:
+    """Engine for database_url, tuned from the environment
+
+    SQLite gets its pragmas applied on connect (sqlite_pragmas overrides single
+    entries of SQLITE_PRAGMAS); other databases get a pre-pinged, recycled pool.
+    """
+    options, pragmas = _engine_options(database_url, sqlite_pragmas)
+    engine = create_engine(database_url, **options)
+    if pragmas:
+        _apply_sqlite_pragmas(engine, pragmas)
+    return engine
+
+def create_async_db_engine(database_url: str = ASYNC_DATABASE_URL,
+                           sqlite_pragmas: Optional[Dict] = None) -> AsyncEngine:
+    """Async counterpart of create_db_engine (aiosqlite or asyncpg), with the same tuning"""
+    options, pragmas = _engine_options(database_url, sqlite_pragmas, queue_pool=AsyncAdaptedQueuePool)
+    engine = create_async_engine(database_url, **options)
+    if pragmas:
+        _apply_sqlite_pragmas(engine.sync_engine, pragmas)
+    return engine
+
 # Create engine
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
-)
+engine = create_db_engine()
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine and sessions for the read-heavy endpoints; loaded rows stay usable after commit
+async_engine = create_async_db_engine()
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 # Create base class for models
 Base = declarative_base()
 
@@ -31,4 +137,9 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    """Get async database session"""
+    async with AsyncSessionLocal() as db:
+        yield db
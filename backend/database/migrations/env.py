@@ -0,0 +1,33 @@
+"""
+Alembic environment for the SRM Timetable database
+"""
+
+from logging.config import fileConfig
+from alembic import context
+from backend.database.database import engine, DATABASE_URL, Base
+from backend.database import models  # noqa: F401 - registers every table on Base.metadata
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+def run_migrations_offline():
+    """Emit SQL without a database connection"""
+    context.configure(url=DATABASE_URL, target_metadata=target_metadata,
+                      literal_binds=True, render_as_batch=True)
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online():
+    """Run migrations against DATABASE_URL"""
+    with engine.connect() as connection:
+        context.configure(connection=connection, target_metadata=target_metadata, render_as_batch=True)
+        with context.begin_transaction():
+            context.run_migrations()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,62 @@
+"""Composite indexes and clash-preventing unique indexes on timetable_entries
+
+Existing databases may already hold clashing bookings (per-section generation
+never looked at other sections). The upgrade refuses to run while any exist
+and lists the clashing entry ids, so an admin can delete, move or repair them
+(and rerun the upgrade) without the migration discarding timetable data.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_timetable_entries_scope", ["department_id", "semester", "section"], False),
+    ("ix_timetable_entries_staff", ["staff_id"], False),
+    ("ix_timetable_entries_classroom", ["classroom_id"], False),
+    ("uq_timetable_entries_staff_slot", ["day", "time_slot_id", "staff_id"], True),
+    ("uq_timetable_entries_room_slot", ["day", "time_slot_id", "classroom_id"], True),
+]
+
+def _find_clashes(resource_column):
+    """One line per (day, slot, resource) booked more than once, naming its entry ids"""
+    rows = op.get_bind().execute(sa.text(f"""
+        SELECT t.id, t.day, t.time_slot_id, t.{resource_column}
+        FROM timetable_entries t
+        JOIN (
+            SELECT day, time_slot_id, {resource_column} FROM timetable_entries
+            GROUP BY day, time_slot_id, {resource_column} HAVING COUNT(*) > 1
+        ) c ON c.day = t.day AND c.time_slot_id = t.time_slot_id AND c.{resource_column} = t.{resource_column}
+        ORDER BY t.day, t.time_slot_id, t.{resource_column}, t.id
+    """)).all()
+    groups = {}
+    for entry_id, day, slot_id, resource_id in rows:
+        groups.setdefault((day, slot_id, resource_id), []).append(str(entry_id))
+    return [f"{resource_column}={resource_id} on {day} slot {slot_id}: entries {', '.join(ids)}"
+            for (day, slot_id, resource_id), ids in groups.items()]
+
+def upgrade():
+    # Databases created by Base.metadata.create_all() already have the indexes
+    existing = {index["name"] for index in sa.inspect(op.get_bind()).get_indexes("timetable_entries")}
+    clashes = _find_clashes("staff_id") + _find_clashes("classroom_id")
+    if clashes:
+        raise RuntimeError(
+            f"❌ {len(clashes)} staff/room double-bookings must be resolved before the unique indexes "
+            "can be created (delete or move one entry of each, or repair the sections), then rerun:\n"
+            + "\n".join(clashes)
+        )
+    for name, columns, unique in INDEXES:
+        if name not in existing:
+            op.create_index(name, "timetable_entries", columns, unique=unique)
+
+def downgrade():
+    for name, _, _ in reversed(INDEXES):
+        op.drop_index(name, table_name="timetable_entries")
@@ -0,0 +1,78 @@
+"""Materialized per-(staff, day) workload and gap table
+
+The table is backfilled from the existing timetable_entries; afterwards the
+session hooks in backend.utils.staff_load keep it current. The backfill is
+written against the tables as they are at this revision, not the app models.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# Table shapes at this revision
+time_slots = sa.table(
+    "time_slots",
+    sa.column("id", sa.Integer), sa.column("start_time", sa.Time), sa.column("is_active", sa.Boolean),
+)
+timetable_entries = sa.table(
+    "timetable_entries",
+    sa.column("staff_id", sa.Integer), sa.column("day", sa.String), sa.column("time_slot_id", sa.Integer),
+)
+staff_day_loads = sa.table(
+    "staff_day_loads",
+    sa.column("staff_id", sa.Integer), sa.column("day", sa.String), sa.column("hours", sa.Integer),
+    sa.column("gaps", sa.Integer), sa.column("slot_ids", sa.String),
+)
+
+# Day value prefix of rows parked mid-move; they are not real bookings
+PARKED_DAY_PREFIX = "~"
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    if "staff_day_loads" not in sa.inspect(op.get_bind()).get_table_names():
+        op.create_table(
+            "staff_day_loads",
+            sa.Column("staff_id", sa.Integer(), sa.ForeignKey("staff.id"), primary_key=True),
+            sa.Column("day", sa.String(10), primary_key=True),
+            sa.Column("hours", sa.Integer(), nullable=False),
+            sa.Column("gaps", sa.Integer(), nullable=False),
+            sa.Column("slot_ids", sa.String(255), nullable=False),
+            sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        )
+    _backfill(op.get_bind())
+
+def _backfill(connection):
+    """One summary row per (staff, day): hours, free slots between the first and last class, ordered slot ids"""
+    rows = connection.execute(
+        sa.select(time_slots.c.id).where(time_slots.c.is_active == sa.true())
+        .order_by(time_slots.c.start_time, time_slots.c.id)
+    ).all()
+    positions = {row.id: i for i, row in enumerate(rows)}
+
+    slots = {}
+    for row in connection.execute(sa.select(timetable_entries)):
+        if row.staff_id is not None and row.day and not row.day.startswith(PARKED_DAY_PREFIX):
+            slots.setdefault((row.staff_id, row.day), []).append(row.time_slot_id)
+
+    summaries = []
+    for (staff_id, day), slot_ids in sorted(slots.items()):
+        # Slots that are no longer active count as hours but not towards gaps
+        busy = sorted({positions[slot_id] for slot_id in slot_ids if slot_id in positions})
+        gaps = busy[-1] - busy[0] + 1 - len(busy) if busy else 0
+        ordered = sorted(slot_ids, key=lambda slot_id: (positions.get(slot_id, len(positions)), slot_id))
+        summaries.append({"staff_id": staff_id, "day": day, "hours": len(slot_ids), "gaps": gaps,
+                          "slot_ids": ",".join(str(slot_id) for slot_id in ordered)})
+
+    connection.execute(sa.delete(staff_day_loads))
+    if summaries:
+        connection.execute(sa.insert(staff_day_loads), summaries)
+
+def downgrade():
+    op.drop_table("staff_day_loads")
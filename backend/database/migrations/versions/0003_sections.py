@@ -0,0 +1,33 @@
+"""Section enrollment sizes
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    if "sections" in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        "sections",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("department_id", sa.Integer(), sa.ForeignKey("departments.id"), nullable=False),
+        sa.Column("semester", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(5), nullable=False),
+        sa.Column("strength", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True)),
+    )
+    op.create_index("ix_sections_id", "sections", ["id"])
+    op.create_index("uq_sections_scope", "sections", ["department_id", "semester", "name"], unique=True)
+
+def downgrade():
+    op.drop_table("sections")
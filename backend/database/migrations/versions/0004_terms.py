@@ -0,0 +1,42 @@
+"""Academic terms and holidays
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    if "terms" in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        "terms",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(100), nullable=False),
+        sa.Column("start_date", sa.Date(), nullable=False),
+        sa.Column("end_date", sa.Date(), nullable=False),
+        sa.Column("department_id", sa.Integer(), sa.ForeignKey("departments.id"), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True)),
+    )
+    op.create_index("ix_terms_id", "terms", ["id"])
+    op.create_table(
+        "holidays",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("term_id", sa.Integer(), sa.ForeignKey("terms.id"), nullable=False),
+        sa.Column("date", sa.Date(), nullable=False),
+        sa.Column("name", sa.String(100), nullable=False),
+    )
+    op.create_index("ix_holidays_id", "holidays", ["id"])
+    op.create_index("uq_holidays_term_date", "holidays", ["term_id", "date"], unique=True)
+
+def downgrade():
+    op.drop_table("holidays")
+    op.drop_table("terms")
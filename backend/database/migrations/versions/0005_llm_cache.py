@@ -0,0 +1,33 @@
+"""LLM response cache
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    if "llm_cache" in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        "llm_cache",
+        sa.Column("cache_key", sa.String(64), primary_key=True),
+        sa.Column("provider", sa.String(20), nullable=False),
+        sa.Column("model", sa.String(100), nullable=False),
+        sa.Column("response", sa.Text(), nullable=False),
+        sa.Column("hits", sa.Integer()),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("last_used_at", sa.DateTime(), nullable=False),
+    )
+    # Least recently used entries are evicted first
+    op.create_index("ix_llm_cache_last_used_at", "llm_cache", ["last_used_at"])
+
+def downgrade():
+    op.drop_table("llm_cache")
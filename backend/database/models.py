@@ -2,7 +2,7 @@
 SQLAlchemy Models for SRM Timetable Management System
 """
 
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, Time
+from sqlalchemy import Column, Integer, String, Boolean, Date, DateTime, ForeignKey, Text, Time, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from backend.database.database import Base
@@ -107,9 +107,63 @@ class TimeSlot(Base):
     # Relationships
     timetable_entries = relationship("TimetableEntry", back_populates="time_slot")
 
+class Section(Base):
+    """Class section enrollment, used to seat sections in rooms that fit them"""
+    __tablename__ = "sections"
+    __table_args__ = (
+        Index("uq_sections_scope", "department_id", "semester", "name", unique=True),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    department_id = Column(Integer, ForeignKey("departments.id"), nullable=False)
+    semester = Column(Integer, nullable=False)
+    name = Column(String(5), nullable=False)  # A, B, C, etc.
+    strength = Column(Integer, nullable=False)  # enrolled students
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+class Term(Base):
+    """Academic term over which the weekly timetable repeats"""
+    __tablename__ = "terms"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(100), nullable=False)
+    start_date = Column(Date, nullable=False)
+    end_date = Column(Date, nullable=False)
+    department_id = Column(Integer, ForeignKey("departments.id"), nullable=True)  # None for every department
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    
+    # Relationships
+    holidays = relationship("Holiday", back_populates="term", cascade="all, delete-orphan",
+                            order_by="Holiday.date")
+
+class Holiday(Base):
+    """Date within a term on which no classes are held"""
+    __tablename__ = "holidays"
+    __table_args__ = (
+        Index("uq_holidays_term_date", "term_id", "date", unique=True),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    term_id = Column(Integer, ForeignKey("terms.id"), nullable=False)
+    date = Column(Date, nullable=False)
+    name = Column(String(100), nullable=False)
+    
+    # Relationships
+    term = relationship("Term", back_populates="holidays")
+
 class TimetableEntry(Base):
     """Timetable entry model"""
     __tablename__ = "timetable_entries"
+    __table_args__ = (
+        Index("ix_timetable_entries_scope", "department_id", "semester", "section"),
+        Index("ix_timetable_entries_staff", "staff_id"),
+        Index("ix_timetable_entries_classroom", "classroom_id"),
+        # A staff member or room can only be booked once per day and slot
+        Index("uq_timetable_entries_staff_slot", "day", "time_slot_id", "staff_id", unique=True),
+        Index("uq_timetable_entries_room_slot", "day", "time_slot_id", "classroom_id", unique=True),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     day = Column(String(10), nullable=False)  # Monday, Tuesday, etc.
@@ -152,4 +206,27 @@ class AuditLog(Base):
     record_id = Column(Integer, nullable=True)
     old_values = Column(Text, nullable=True)
     new_values = Column(Text, nullable=True)
-    timestamp = Column(DateTime(timezone=True), server_default=func.now())
\ No newline at end of file
+    timestamp = Column(DateTime(timezone=True), server_default=func.now())
+
+class StaffDayLoad(Base):
+    """Per-(staff, day) teaching load kept in step with timetable_entries"""
+    __tablename__ = "staff_day_loads"
+    
+    staff_id = Column(Integer, ForeignKey("staff.id"), primary_key=True)
+    day = Column(String(10), primary_key=True)
+    hours = Column(Integer, nullable=False)
+    gaps = Column(Integer, nullable=False)  # free slots between the first and last class
+    slot_ids = Column(String(255), nullable=False)  # comma-separated, in slot order
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class LLMCacheEntry(Base):
+    """Cached LLM timetable responses keyed on the canonical problem hash"""
+    __tablename__ = "llm_cache"
+    
+    cache_key = Column(String(64), primary_key=True)
+    provider = Column(String(20), nullable=False)
+    model = Column(String(100), nullable=False)
+    response = Column(Text, nullable=False)
+    hits = Column(Integer, default=0)
+    created_at = Column(DateTime, nullable=False)
+    last_used_at = Column(DateTime, nullable=False, index=True)
@@ -5,6 +5,7 @@ Provides RESTful APIs for all timetable management operations
 
 import os
 import uvicorn
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer
@@ -14,8 +15,17 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # Import routers
-from backend.routers import auth, departments, staff, subjects, timetable, classrooms
-from backend.database.database import engine, Base
+from backend.routers import auth, departments, staff, subjects, timetable, classrooms, terms
+from backend.database.database import engine, async_engine, Base
+from backend.utils.pagination import NEXT_CURSOR_HEADER
+from backend.utils.portfolio import shutdown_pools
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Close pooled async connections and solver worker processes on shutdown"""
+    yield
+    await async_engine.dispose()
+    shutdown_pools()
 
 # Create FastAPI app
 app = FastAPI(
@@ -23,7 +33,8 @@ app = FastAPI(
     description="Complete API for SRM College Ramapuram Timetable Management System",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -33,6 +44,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 # Create database tables
@@ -45,6 +57,7 @@ app.include_router(staff.router, prefix="/api/staff", tags=["Staff"])
 app.include_router(subjects.router, prefix="/api/subjects", tags=["Subjects"])
 app.include_router(timetable.router, prefix="/api/timetable", tags=["Timetable"])
 app.include_router(classrooms.router, prefix="/api/classrooms", tags=["Classrooms"])
+app.include_router(terms.router, prefix="/api/terms", tags=["Terms"])
 
 @app.get("/")
 async def root():
@@ -2,41 +2,53 @@
 Classroom management router
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from backend.database.database import get_db
+from backend.database.database import get_db, get_async_db
 from backend.database.models import Classroom, Department
 from backend.schemas.schemas import ClassroomCreate, ClassroomUpdate, ClassroomResponse
 from backend.utils.security import get_current_user
+from backend.utils.pagination import keyset_page, finish_page, LimitParam, CursorParam
+from backend.utils.repair import repair_timetable
+from backend.utils.timetable_data import clash_guard
 
 router = APIRouter()
 
 @router.get("/", response_model=List[ClassroomResponse])
 async def get_classrooms(
+    response: Response,
     department_id: Optional[int] = None,
     room_type: Optional[str] = None,
     available_only: bool = False,
-    db: Session = Depends(get_db),
+    min_capacity: Optional[int] = None,
+    limit: Optional[int] = LimitParam,
+    cursor: Optional[int] = CursorParam,
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_user)
 ):
     """Get all classrooms"""
-    query = db.query(Classroom)
+    query = select(Classroom)
     
     # Filter by department if specified
     if department_id:
-        query = query.filter(Classroom.department_id == department_id)
+        query = query.where(Classroom.department_id == department_id)
     
     # Filter by room type if specified
     if room_type:
-        query = query.filter(Classroom.room_type == room_type)
+        query = query.where(Classroom.room_type == room_type)
     
     # Filter by availability if specified
     if available_only:
-        query = query.filter(Classroom.is_available == True)
+        query = query.where(Classroom.is_available == True)
+    
+    if min_capacity:
+        query = query.where(Classroom.capacity >= min_capacity)
     
-    classrooms = query.all()
-    return classrooms
+    classrooms = (await db.scalars(keyset_page(query, Classroom.id, limit, cursor))).all()
+    return finish_page(classrooms, limit, response)
 
 @router.post("/", response_model=ClassroomResponse)
 async def create_classroom(
@@ -93,7 +105,7 @@ async def get_classroom(
     return classroom
 
 @router.put("/{classroom_id}", response_model=ClassroomResponse)
-async def update_classroom(
+def update_classroom(
     classroom_id: int,
     classroom_update: ClassroomUpdate,
     db: Session = Depends(get_db),
@@ -116,10 +128,17 @@ async def update_classroom(
             )
     
     # Update fields
+    was_available = classroom.is_available
     for field, value in classroom_update.dict(exclude_unset=True).items():
         setattr(classroom, field, value)
     
-    db.commit()
+    # Move bookings out of a room that was just taken out of service
+    with clash_guard(db):
+        if was_available and not classroom.is_available:
+            db.flush()
+            repair_timetable(db, classroom_id=classroom_id)
+        
+        db.commit()
     db.refresh(classroom)
     
     return classroom
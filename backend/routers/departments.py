@@ -2,24 +2,35 @@
 Department management router
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List
-from backend.database.database import get_db
-from backend.database.models import Department, Staff
-from backend.schemas.schemas import DepartmentCreate, DepartmentUpdate, DepartmentResponse
+from typing import List, Optional
+from backend.database.database import get_db, get_async_db
+from backend.database.models import Department, Staff, Section
+from backend.schemas.schemas import (
+    DepartmentCreate, DepartmentUpdate, DepartmentResponse, SectionStrength, SectionResponse
+)
 from backend.utils.security import get_current_user
+from backend.utils.pagination import keyset_page, finish_page, LimitParam, CursorParam
+from backend.utils.repair import repair_timetable
+from backend.utils.timetable_data import clash_guard
 
 router = APIRouter()
 
 @router.get("/", response_model=List[DepartmentResponse])
 async def get_departments(
-    db: Session = Depends(get_db),
+    response: Response,
+    limit: Optional[int] = LimitParam,
+    cursor: Optional[int] = CursorParam,
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_user)
 ):
     """Get all departments"""
-    departments = db.query(Department).all()
-    return departments
+    query = keyset_page(select(Department), Department.id, limit, cursor)
+    departments = (await db.scalars(query)).all()
+    return finish_page(departments, limit, response)
 
 @router.post("/", response_model=DepartmentResponse)
 async def create_department(
@@ -64,6 +75,71 @@ async def get_department(
         )
     return department
 
+@router.get("/{department_id}/sections", response_model=List[SectionResponse])
+async def get_sections(
+    department_id: int,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Get section enrollment sizes of a department"""
+    return db.query(Section).filter(Section.department_id == department_id).order_by(
+        Section.semester, Section.name
+    ).all()
+
+@router.put("/{department_id}/sections", response_model=SectionResponse)
+def set_section_strength(
+    department_id: int,
+    section: SectionStrength,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Create or update the enrollment size of a section; a stored timetable is re-seated if it grew"""
+    # Check permissions
+    if current_user["user_type"] != "main_admin":
+        if not (current_user["user_type"] == "staff" and current_user["user"].is_department_admin
+                and current_user["user"].department_id == department_id):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Insufficient permissions"
+            )
+    
+    if section.strength < 1:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Section strength must be at least 1"
+        )
+    
+    department = db.query(Department).filter(Department.id == department_id).first()
+    if not department:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Department not found"
+        )
+    
+    db_section = db.query(Section).filter(
+        Section.department_id == department_id,
+        Section.semester == section.semester,
+        Section.name == section.section
+    ).first()
+    grown = db_section is None or section.strength > db_section.strength
+    if db_section:
+        db_section.strength = section.strength
+    else:
+        db_section = Section(department_id=department_id, semester=section.semester,
+                             name=section.section, strength=section.strength)
+        db.add(db_section)
+    
+    # Move the section's classes out of rooms that no longer seat it
+    with clash_guard(db):
+        if grown:
+            db.flush()
+            repair_timetable(db, section_scope=(department_id, section.semester, section.section))
+        
+        db.commit()
+    db.refresh(db_section)
+    
+    return db_section
+
 @router.put("/{department_id}", response_model=DepartmentResponse)
 async def update_department(
     department_id: int,
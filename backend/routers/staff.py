@@ -2,35 +2,52 @@
 Staff management router
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import select, or_
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from backend.database.database import get_db
+from backend.database.database import get_db, get_async_db
 from backend.database.models import Staff, Department, Subject
 from backend.schemas.schemas import StaffCreate, StaffUpdate, StaffResponse
 from backend.utils.security import get_current_user, hash_password
+from backend.utils.pagination import keyset_page, finish_page, LimitParam, CursorParam
+from backend.utils.staff_load import workload_report
+from backend.utils.timetable_data import MAX_HOURS_PER_DAY
 
 router = APIRouter()
 
 @router.get("/", response_model=List[StaffResponse])
 async def get_staff(
+    response: Response,
     department_id: Optional[int] = None,
-    db: Session = Depends(get_db),
+    role: Optional[str] = None,
+    search: Optional[str] = None,
+    limit: Optional[int] = LimitParam,
+    cursor: Optional[int] = CursorParam,
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_user)
 ):
     """Get all staff members"""
-    query = db.query(Staff)
+    query = select(Staff)
     
     # Filter by department if specified
     if department_id:
-        query = query.filter(Staff.department_id == department_id)
+        query = query.where(Staff.department_id == department_id)
+    
+    if role:
+        query = query.where(Staff.role == role)
+    
+    # Match name or email
+    if search:
+        query = query.where(or_(Staff.name.ilike(f"%{search}%"), Staff.email.ilike(f"%{search}%")))
     
     # If user is department admin, only show their department staff
     if current_user["user_type"] == "staff" and current_user["user"].is_department_admin:
-        query = query.filter(Staff.department_id == current_user["user"].department_id)
+        query = query.where(Staff.department_id == current_user["user"].department_id)
     
-    staff_members = query.all()
-    return staff_members
+    staff_members = (await db.scalars(keyset_page(query, Staff.id, limit, cursor))).all()
+    return finish_page(staff_members, limit, response)
 
 @router.post("/", response_model=StaffResponse)
 async def create_staff(
@@ -82,6 +99,36 @@ async def create_staff(
     
     return db_staff
 
+@router.get("/workload")
+async def get_staff_workload(
+    staff_ids: Optional[List[int]] = Query(None),
+    department_id: Optional[int] = None,
+    max_hours_per_day: int = Query(MAX_HOURS_PER_DAY, ge=1),
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Daily workload, gap and overload report for a set of staff members"""
+    query = db.query(Staff)
+    if staff_ids:
+        query = query.filter(Staff.id.in_(staff_ids))
+    if department_id:
+        query = query.filter(Staff.department_id == department_id)
+    
+    # Department admins see their department, other staff only themselves
+    if current_user["user_type"] == "staff":
+        user = current_user["user"]
+        if user.is_department_admin:
+            query = query.filter(Staff.department_id == user.department_id)
+        else:
+            query = query.filter(Staff.id == user.id)
+    
+    report = workload_report(db, query.order_by(Staff.id).all(), max_hours_per_day)
+    return {
+        "max_hours_per_day": max_hours_per_day,
+        "staff": report,
+        "overloaded_staff": [s["staff_id"] for s in report if s["overloaded_days"]]
+    }
+
 @router.get("/{staff_id}", response_model=StaffResponse)
 async def get_staff_member(
     staff_id: int,
@@ -2,40 +2,57 @@
 Subject management router
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy import select, or_
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from backend.database.database import get_db
+from backend.database.database import get_db, get_async_db
 from backend.database.models import Subject, Department, Staff
 from backend.schemas.schemas import SubjectCreate, SubjectUpdate, SubjectResponse
 from backend.utils.security import get_current_user
+from backend.utils.pagination import keyset_page, finish_page, LimitParam, CursorParam
+from backend.utils.repair import repair_timetable
+from backend.utils.timetable_data import clash_guard
 
 router = APIRouter()
 
 @router.get("/", response_model=List[SubjectResponse])
 async def get_subjects(
+    response: Response,
     department_id: Optional[int] = None,
     semester: Optional[int] = None,
-    db: Session = Depends(get_db),
+    assigned_staff_id: Optional[int] = None,
+    search: Optional[str] = None,
+    limit: Optional[int] = LimitParam,
+    cursor: Optional[int] = CursorParam,
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_user)
 ):
     """Get all subjects"""
-    query = db.query(Subject)
+    query = select(Subject)
     
     # Filter by department if specified
     if department_id:
-        query = query.filter(Subject.department_id == department_id)
+        query = query.where(Subject.department_id == department_id)
     
     # Filter by semester if specified
     if semester:
-        query = query.filter(Subject.semester == semester)
+        query = query.where(Subject.semester == semester)
+    
+    if assigned_staff_id:
+        query = query.where(Subject.assigned_staff_id == assigned_staff_id)
+    
+    # Match name or code
+    if search:
+        query = query.where(or_(Subject.name.ilike(f"%{search}%"), Subject.code.ilike(f"%{search}%")))
     
     # If user is department admin, only show their department subjects
     if current_user["user_type"] == "staff" and current_user["user"].is_department_admin:
-        query = query.filter(Subject.department_id == current_user["user"].department_id)
+        query = query.where(Subject.department_id == current_user["user"].department_id)
     
-    subjects = query.all()
-    return subjects
+    subjects = (await db.scalars(keyset_page(query, Subject.id, limit, cursor))).all()
+    return finish_page(subjects, limit, response)
 
 @router.post("/", response_model=SubjectResponse)
 async def create_subject(
@@ -148,7 +165,7 @@ async def delete_subject(
     return {"message": "Subject deleted successfully"}
 
 @router.post("/{subject_id}/assign/{staff_id}")
-async def assign_subject_to_staff(
+def assign_subject_to_staff(
     subject_id: int,
     staff_id: int,
     db: Session = Depends(get_db),
@@ -192,12 +209,15 @@ async def assign_subject_to_staff(
             detail=f"Staff member has reached maximum subject limit ({staff.max_subjects})"
         )
     
-    # Assign subject
+    # Assign subject and move any existing timetable entries over to the new staff member
     subject.assigned_staff_id = staff_id
-    db.commit()
+    with clash_guard(db):
+        db.flush()
+        repair = repair_timetable(db, subject_id=subject_id)
+        db.commit()
     db.refresh(subject)
     
-    return {"message": "Subject assigned successfully", "subject": subject}
+    return {"message": "Subject assigned successfully", "subject": subject, "timetable_repair": repair}
 
 @router.delete("/{subject_id}/unassign")
 async def unassign_subject(
@@ -0,0 +1,232 @@
+"""
+Academic term router: terms, holidays and dated session calendars
+"""
+
+from datetime import date
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from backend.database.database import get_db
+from backend.database.models import Term, Holiday, Department, TimetableEntry
+from backend.schemas.schemas import TermCreate, TermUpdate, TermResponse, HolidayCreate, HolidayResponse
+from backend.utils.security import get_current_user
+from backend.utils.term_calendar import iter_occurrences, iter_ndjson, iter_ical
+from backend.utils.timetable_view import timetable_view_query
+
+router = APIRouter()
+
+def _check_term_permission(current_user: dict, department_id: Optional[int]):
+    """Main admin for any term; department admins for their own department's terms"""
+    if current_user["user_type"] == "main_admin":
+        return
+    if not (current_user["user_type"] == "staff" and current_user["user"].is_department_admin
+            and department_id is not None and current_user["user"].department_id == department_id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Insufficient permissions"
+        )
+
+def _get_term(db: Session, term_id: int) -> Term:
+    term = db.query(Term).filter(Term.id == term_id).first()
+    if not term:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Term not found"
+        )
+    return term
+
+def _check_dates(start_date: date, end_date: date):
+    if end_date < start_date:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Term end date must not be before its start date"
+        )
+
+@router.get("/", response_model=List[TermResponse])
+async def get_terms(
+    department_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Get academic terms (institution-wide terms are always included)"""
+    query = db.query(Term)
+    if department_id:
+        query = query.filter((Term.department_id == department_id) | (Term.department_id.is_(None)))
+    return query.order_by(Term.start_date).all()
+
+@router.post("/", response_model=TermResponse)
+async def create_term(
+    term: TermCreate,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Create an academic term with its holidays"""
+    _check_term_permission(current_user, term.department_id)
+    _check_dates(term.start_date, term.end_date)
+
+    if term.department_id:
+        department = db.query(Department).filter(Department.id == term.department_id).first()
+        if not department:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid department"
+            )
+
+    db_term = Term(**term.dict(exclude={"holidays"}))
+    # One holiday per date; a repeated date keeps the last name given
+    holidays = {holiday.date: holiday.name for holiday in term.holidays}
+    db_term.holidays = [Holiday(date=day, name=name) for day, name in sorted(holidays.items())]
+    db.add(db_term)
+    db.commit()
+    db.refresh(db_term)
+
+    return db_term
+
+@router.get("/{term_id}", response_model=TermResponse)
+async def get_term(
+    term_id: int,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Get term by ID"""
+    return _get_term(db, term_id)
+
+@router.put("/{term_id}", response_model=TermResponse)
+async def update_term(
+    term_id: int,
+    term_update: TermUpdate,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Rename a term or change its dates"""
+    term = _get_term(db, term_id)
+    _check_term_permission(current_user, term.department_id)
+
+    for field, value in term_update.dict(exclude_unset=True).items():
+        setattr(term, field, value)
+    _check_dates(term.start_date, term.end_date)
+
+    db.commit()
+    db.refresh(term)
+
+    return term
+
+@router.delete("/{term_id}")
+async def delete_term(
+    term_id: int,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Delete a term and its holidays"""
+    term = _get_term(db, term_id)
+    _check_term_permission(current_user, term.department_id)
+
+    db.delete(term)
+    db.commit()
+
+    return {"message": "Term deleted successfully"}
+
+@router.put("/{term_id}/holidays", response_model=HolidayResponse)
+async def set_holiday(
+    term_id: int,
+    holiday: HolidayCreate,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Add a holiday to a term, or rename the one already on that date"""
+    term = _get_term(db, term_id)
+    _check_term_permission(current_user, term.department_id)
+
+    if not term.start_date <= holiday.date <= term.end_date:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Holiday must fall within the term"
+        )
+
+    db_holiday = db.query(Holiday).filter(Holiday.term_id == term_id, Holiday.date == holiday.date).first()
+    if db_holiday:
+        db_holiday.name = holiday.name
+    else:
+        db_holiday = Holiday(term_id=term_id, date=holiday.date, name=holiday.name)
+        db.add(db_holiday)
+
+    db.commit()
+    db.refresh(db_holiday)
+
+    return db_holiday
+
+@router.delete("/{term_id}/holidays/{holiday_id}")
+async def delete_holiday(
+    term_id: int,
+    holiday_id: int,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Remove a holiday from a term"""
+    term = _get_term(db, term_id)
+    _check_term_permission(current_user, term.department_id)
+
+    holiday = db.query(Holiday).filter(Holiday.id == holiday_id, Holiday.term_id == term_id).first()
+    if not holiday:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Holiday not found"
+        )
+
+    db.delete(holiday)
+    db.commit()
+
+    return {"message": "Holiday deleted successfully"}
+
+@router.get("/{term_id}/sessions")
+async def get_term_sessions(
+    term_id: int,
+    staff_id: Optional[int] = None,
+    classroom_id: Optional[int] = None,
+    department_id: Optional[int] = None,
+    semester: Optional[int] = None,
+    section: Optional[str] = None,
+    from_date: Optional[date] = None,
+    to_date: Optional[date] = None,
+    format: str = "ndjson",
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Stream the dated sessions of a staff member, room or section over a term as NDJSON or iCalendar"""
+    if format not in ("ndjson", "ics"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Format must be ndjson or ics"
+        )
+    if not (staff_id or classroom_id or (department_id and semester and section)):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Provide staff_id, classroom_id, or department_id with semester and section"
+        )
+
+    term = _get_term(db, term_id)
+    start = max(term.start_date, from_date) if from_date else term.start_date
+    end = min(term.end_date, to_date) if to_date else term.end_date
+    holidays = [holiday.date for holiday in term.holidays]
+
+    # The weekly pattern is small; only its expansion over the term is large, and that is streamed
+    query = timetable_view_query(department_id, semester, section, staff_id, classroom_id)
+    if term.department_id:
+        query = query.where(TimetableEntry.department_id == term.department_id)
+
+    # If user is staff, filter by their department
+    if current_user["user_type"] == "staff":
+        query = query.where(TimetableEntry.department_id == current_user["user"].department_id)
+
+    entries = [dict(row) for row in db.execute(query).mappings()]
+    occurrences = iter_occurrences(entries, start, end, holidays)
+
+    if format == "ndjson":
+        return StreamingResponse(iter_ndjson(occurrences), media_type="application/x-ndjson")
+
+    return StreamingResponse(
+        iter_ical(occurrences, calendar_name=term.name),
+        media_type="text/calendar",
+        headers={"Content-Disposition": f"attachment; filename=term_{term.id}.ics"}
+    )
@@ -2,17 +2,41 @@
 Timetable management router with AI-powered generation
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status, Response
+from fastapi import APIRouter, Depends, HTTPException, status, Response, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from sqlalchemy import or_, and_, not_, select
 from typing import List, Optional
-from backend.database.database import get_db
+from backend.database.database import get_db, get_async_db, SessionLocal
 from backend.database.models import TimetableEntry, Subject, Staff, Classroom, TimeSlot, Department
 from backend.schemas.schemas import (
-    TimetableEntryCreate, TimetableEntryResponse, 
-    TimetableGenerateRequest, TimetableResponse
+    TimetableEntryCreate, TimetableEntryUpdate, TimetableEntryResponse, 
+    TimetableGenerateRequest, TimetableResponse, TimetableOptimizeRequest,
+    TimetableBatchGenerateRequest, TimetableBatchResponse, TimetableRepairRequest,
+    TimetableJobResponse, TimetableDraftResponse, TimetableViewEntry
 )
 from backend.utils.security import get_current_user
+from backend.utils.pagination import keyset_page, finish_page, LimitParam, CursorParam
+from backend.utils.timetable_view import timetable_view_query
 from backend.utils.ai_service import ai_service
+from backend.utils.batch_generation import generate_batch, scope_key
+from backend.utils.repair import repair_timetable
+from backend.utils.generation import generate_scope_timetable, validate_generation_request
+from backend.utils.jobs import job_manager, COMPLETED, FINISHED
+from backend.utils.drafts import draft_store
+from backend.utils.llm_cache import llm_cache
+from backend.utils.conflict_index import conflict_index
+from backend.utils.occupancy import DAYS, seating_requirement
+from backend.utils.csp_solver import lab_block_hours
+from backend.utils.staff_load import workload_report
+from backend.utils.sql_conflicts import clash_page, iter_clashes
+from backend.utils.timetable_data import (
+    subject_to_dict, staff_to_dict, classroom_to_dict, time_slot_to_dict,
+    entry_to_dict, load_active_time_slots, load_section_strengths, default_constraints, move_entries, clash_guard,
+    insert_entries, MAX_HOURS_PER_DAY, LUNCH_BREAK
+)
+import json
 import pandas as pd
 from io import BytesIO
 
@@ -20,40 +44,214 @@ router = APIRouter()
 
 @router.get("/", response_model=List[TimetableEntryResponse])
 async def get_timetable(
+    response: Response,
     department_id: Optional[int] = None,
     semester: Optional[int] = None,
     section: Optional[str] = None,
     staff_id: Optional[int] = None,
-    db: Session = Depends(get_db),
+    classroom_id: Optional[int] = None,
+    day: Optional[str] = None,
+    limit: Optional[int] = LimitParam,
+    cursor: Optional[int] = CursorParam,
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_user)
 ):
     """Get timetable entries"""
-    query = db.query(TimetableEntry)
+    query = select(TimetableEntry)
     
     # Apply filters
     if department_id:
-        query = query.filter(TimetableEntry.department_id == department_id)
+        query = query.where(TimetableEntry.department_id == department_id)
     if semester:
-        query = query.filter(TimetableEntry.semester == semester)
+        query = query.where(TimetableEntry.semester == semester)
     if section:
-        query = query.filter(TimetableEntry.section == section)
+        query = query.where(TimetableEntry.section == section)
     if staff_id:
-        query = query.filter(TimetableEntry.staff_id == staff_id)
+        query = query.where(TimetableEntry.staff_id == staff_id)
+    if classroom_id:
+        query = query.where(TimetableEntry.classroom_id == classroom_id)
+    if day:
+        query = query.where(TimetableEntry.day == day)
+    
+    # If user is staff, filter by their department
+    if current_user["user_type"] == "staff":
+        query = query.where(TimetableEntry.department_id == current_user["user"].department_id)
+    
+    entries = (await db.scalars(keyset_page(query, TimetableEntry.id, limit, cursor))).all()
+    return finish_page(entries, limit, response)
+
+@router.get("/view", response_model=List[TimetableViewEntry])
+async def get_timetable_view(
+    response: Response,
+    department_id: Optional[int] = None,
+    semester: Optional[int] = None,
+    section: Optional[str] = None,
+    staff_id: Optional[int] = None,
+    classroom_id: Optional[int] = None,
+    day: Optional[str] = None,
+    limit: Optional[int] = LimitParam,
+    cursor: Optional[int] = CursorParam,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Get timetable entries with subject, staff, room and slot details from one joined query"""
+    query = timetable_view_query(department_id, semester, section, staff_id, classroom_id, day)
     
     # If user is staff, filter by their department
     if current_user["user_type"] == "staff":
-        query = query.filter(TimetableEntry.department_id == current_user["user"].department_id)
+        query = query.where(TimetableEntry.department_id == current_user["user"].department_id)
     
-    entries = query.all()
-    return entries
+    rows = (await db.execute(keyset_page(query, TimetableEntry.id, limit, cursor))).all()
+    return finish_page(rows, limit, response)
+
+def _check_generate_permission(current_user: dict):
+    if current_user["user_type"] != "main_admin":
+        if not (current_user["user_type"] == "staff" and current_user["user"].is_department_admin):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Insufficient permissions"
+            )
+
+def _job_owner(current_user: dict):
+    return (current_user["user_type"], current_user["user"].id)
+
+def _get_job(job_id: str, current_user: dict):
+    job = job_manager.get(job_id)
+    if not job or (current_user["user_type"] != "main_admin" and job.owner != _job_owner(current_user)):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+    return job
 
 @router.post("/generate", response_model=TimetableResponse)
-async def generate_timetable(
+def generate_timetable(
     request: TimetableGenerateRequest,
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    """Generate AI-powered timetable"""
+    """Generate AI-powered timetable and wait for the result"""
+    # Check permissions
+    _check_generate_permission(current_user)
+    
+    return generate_scope_timetable(db, request)
+
+@router.post("/jobs", response_model=TimetableJobResponse, status_code=status.HTTP_202_ACCEPTED)
+def submit_generation_job(
+    request: TimetableGenerateRequest,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Queue a timetable generation and return its job id"""
+    _check_generate_permission(current_user)
+    
+    # Fail fast on bad requests instead of queueing them
+    validate_generation_request(db, request)
+    
+    job = job_manager.submit(request, _job_owner(current_user))
+    return job.to_dict()
+
+@router.get("/jobs/{job_id}", response_model=TimetableJobResponse)
+def get_generation_job(
+    job_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """Get status and progress of a generation job"""
+    return _get_job(job_id, current_user).to_dict()
+
+@router.delete("/jobs/{job_id}", response_model=TimetableJobResponse)
+def cancel_generation_job(
+    job_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """Cancel a queued or running generation job"""
+    job = _get_job(job_id, current_user)
+    if job.status in FINISHED:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Job already {job.status}"
+        )
+    return job_manager.cancel(job_id).to_dict()
+
+@router.get("/jobs/{job_id}/result", response_model=TimetableResponse)
+def get_generation_job_result(
+    job_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """Get the timetable produced by a completed generation job"""
+    job = _get_job(job_id, current_user)
+    if job.status != COMPLETED:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=job.error or f"Job is {job.status}"
+        )
+    return job.result
+
+def _get_draft(draft_id: str, current_user: dict):
+    draft = draft_store.get(draft_id)
+    if not draft or (current_user["user_type"] != "main_admin" and draft.owner != _job_owner(current_user)):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Draft not found"
+        )
+    return draft
+
+@router.post("/drafts", response_model=TimetableDraftResponse)
+def create_timetable_draft(
+    request: TimetableGenerateRequest,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Generate a timetable without replacing the live one and diff it against the live one"""
+    _check_generate_permission(current_user)
+    
+    return draft_store.create(db, request, _job_owner(current_user)).to_dict()
+
+@router.get("/drafts", response_model=List[TimetableDraftResponse])
+def list_timetable_drafts(current_user: dict = Depends(get_current_user)):
+    """Uncommitted drafts (all of them for the main admin, otherwise your own)"""
+    _check_generate_permission(current_user)
+    
+    owner = None if current_user["user_type"] == "main_admin" else _job_owner(current_user)
+    return [draft.to_dict() for draft in draft_store.list(owner)]
+
+@router.get("/drafts/{draft_id}", response_model=TimetableDraftResponse)
+def get_timetable_draft(
+    draft_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """Get a draft with its score and diff"""
+    return _get_draft(draft_id, current_user).to_dict()
+
+@router.post("/drafts/{draft_id}/commit", response_model=TimetableResponse)
+def commit_timetable_draft(
+    draft_id: str,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Replace the live timetable with a draft in one transaction"""
+    _get_draft(draft_id, current_user)
+    
+    return draft_store.commit(db, draft_id)
+
+@router.delete("/drafts/{draft_id}")
+def discard_timetable_draft(
+    draft_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """Throw a draft away"""
+    _get_draft(draft_id, current_user)
+    draft_store.discard(draft_id)
+    
+    return {"message": "Draft discarded"}
+
+@router.post("/generate/batch", response_model=TimetableBatchResponse)
+def generate_timetable_batch(
+    request: TimetableBatchGenerateRequest,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Generate timetables for many department/semester/section scopes in one solve"""
     # Check permissions
     if current_user["user_type"] != "main_admin":
         if not (current_user["user_type"] == "staff" and current_user["user"].is_department_admin):
@@ -61,126 +259,200 @@ async def generate_timetable(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Insufficient permissions"
             )
+        if any(scope.department_id != current_user["user"].department_id for scope in request.scopes):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Department admins can only generate their own department's timetables"
+            )
+    
+    scopes = list({scope_key(s.dict()): s.dict() for s in request.scopes}.values())
+    if not scopes:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No scopes requested"
+        )
     
-    # Validate department
-    department = db.query(Department).filter(Department.id == request.department_id).first()
-    if not department:
+    department_ids = {scope["department_id"] for scope in scopes}
+    found = {d.id for d in db.query(Department).filter(Department.id.in_(department_ids)).all()}
+    if found != department_ids:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="Department not found"
+            detail=f"Department not found: {sorted(department_ids - found)}"
         )
     
-    # Get required data
+    # Load every reference table once for all scopes
     subjects = db.query(Subject).filter(
-        Subject.department_id == request.department_id,
-        Subject.semester == request.semester,
+        Subject.department_id.in_(department_ids),
         Subject.assigned_staff_id.isnot(None)
     ).all()
+    by_semester = {}
+    for s in subjects:
+        by_semester.setdefault((s.department_id, s.semester), []).append(subject_to_dict(s))
+    subjects_by_scope = {
+        scope_key(scope): by_semester.get((scope["department_id"], scope["semester"]), [])
+        for scope in scopes
+    }
     
-    if not subjects:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="No assigned subjects found for this department and semester"
-        )
-    
-    staff = db.query(Staff).filter(Staff.department_id == request.department_id).all()
+    staff_ids = {s.assigned_staff_id for s in subjects}
+    staff = db.query(Staff).filter(Staff.id.in_(staff_ids)).all()
     classrooms = db.query(Classroom).filter(
-        Classroom.department_id == request.department_id,
+        Classroom.department_id.in_(department_ids),
         Classroom.is_available == True
     ).all()
-    time_slots = db.query(TimeSlot).filter(TimeSlot.is_active == True).all()
-    
-    # Prepare data for AI
-    subjects_data = [
-        {
-            "id": s.id,
-            "name": s.name,
-            "code": s.code,
-            "assigned_staff_id": s.assigned_staff_id,
-            "theory_hours": s.theory_hours,
-            "practical_hours": s.practical_hours,
-            "credits": s.credits
-        }
-        for s in subjects
+    rooms_by_department = {}
+    for c in classrooms:
+        rooms_by_department.setdefault(c.department_id, []).append(classroom_to_dict(c))
+    time_slots_data = load_active_time_slots(db)
+    
+    # Bookings outside the requested scopes stay fixed and block their staff and rooms
+    requested = {scope_key(scope) for scope in scopes}
+    fixed_entries = [
+        entry_to_dict(e) for e in db.query(TimetableEntry).filter(or_(
+            TimetableEntry.staff_id.in_(staff_ids),
+            TimetableEntry.classroom_id.in_([c.id for c in classrooms])
+        )).all()
+        if (e.department_id, e.semester, e.section) not in requested
     ]
     
-    staff_data = [
-        {
-            "id": s.id,
-            "name": s.name,
-            "role": s.role,
-            "max_subjects": s.max_subjects
-        }
-        for s in staff
-    ]
+    result = generate_batch(
+        scopes, subjects_by_scope,
+        [staff_to_dict(s) for s in staff],
+        rooms_by_department, time_slots_data, fixed_entries,
+        max_hours_per_day=MAX_HOURS_PER_DAY,
+        time_budget=request.time_budget,
+        max_workers=request.max_workers,
+        section_strengths=load_section_strengths(db, requested),
+        lunch_break=dict(LUNCH_BREAK)
+    )
     
-    classrooms_data = [
-        {
-            "id": c.id,
-            "room_number": c.room_number,
-            "capacity": c.capacity,
-            "room_type": c.room_type
-        }
-        for c in classrooms
-    ]
+    # Replace all requested scopes in one transaction
+    with clash_guard(db, "Generated timetables clash with a booking made while they were generating; try again"):
+        for scope in scopes:
+            db.query(TimetableEntry).filter(
+                TimetableEntry.department_id == scope["department_id"],
+                TimetableEntry.semester == scope["semester"],
+                TimetableEntry.section == scope["section"]
+            ).delete()
+        
+        created_entries = insert_entries(db, result["timetable"])
+        db.commit()
     
-    time_slots_data = [
-        {
-            "id": t.id,
-            "slot_name": t.slot_name,
-            "start_time": str(t.start_time),
-            "end_time": str(t.end_time)
-        }
-        for t in time_slots
-    ]
+    return TimetableBatchResponse(
+        entries=created_entries,
+        total_entries=len(created_entries),
+        conflicts=result["conflicts"],
+        unplaced=result["unplaced"],
+        optimization_score=result["optimization_score"],
+        score_breakdown=result["score_breakdown"],
+        components=result["components"]
+    )
+
+def _check_entry_permission(current_user: dict, department_id: int):
+    if current_user["user_type"] == "main_admin":
+        return
+    if not (current_user["user_type"] == "staff" and current_user["user"].is_department_admin
+            and current_user["user"].department_id == department_id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Insufficient permissions"
+        )
+
+@router.post("/entries", response_model=TimetableEntryResponse)
+def create_timetable_entry(
+    entry: TimetableEntryCreate,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Manually add a timetable entry"""
+    _check_entry_permission(current_user, entry.department_id)
     
-    constraints = {
-        "department_id": request.department_id,
-        "semester": request.semester,
-        "section": request.section,
-        "max_hours_per_day": 6,
-        "lunch_break": {"start": "13:15", "end": "14:00"}
-    }
+    db_entry = TimetableEntry(**entry.dict())
+    with clash_guard(db, "Staff member or classroom is already booked at this time"):
+        db.add(db_entry)
+        db.commit()
+    db.refresh(db_entry)
     
-    # Clear existing timetable for this department, semester, and section
-    db.query(TimetableEntry).filter(
-        TimetableEntry.department_id == request.department_id,
-        TimetableEntry.semester == request.semester,
-        TimetableEntry.section == request.section
-    ).delete()
+    return db_entry
+
+@router.put("/entries/{entry_id}", response_model=TimetableEntryResponse)
+def update_timetable_entry(
+    entry_id: int,
+    entry_update: TimetableEntryUpdate,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Manually move or change a timetable entry"""
+    entry = db.query(TimetableEntry).filter(TimetableEntry.id == entry_id).first()
+    if not entry:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Timetable entry not found"
+        )
     
-    # Generate timetable using AI
-    ai_result = ai_service.generate_timetable_suggestions(
-        subjects_data, staff_data, classrooms_data, time_slots_data, constraints
-    )
+    _check_entry_permission(current_user, entry.department_id)
+    
+    for field, value in entry_update.dict(exclude_unset=True).items():
+        setattr(entry, field, value)
     
-    # Create timetable entries
-    created_entries = []
-    for entry_data in ai_result.get("timetable", []):
-        entry = TimetableEntry(
-            day=entry_data["day"],
-            time_slot_id=entry_data["time_slot_id"],
-            subject_id=entry_data["subject_id"],
-            staff_id=entry_data["staff_id"],
-            classroom_id=entry_data["classroom_id"],
-            department_id=request.department_id,
-            semester=request.semester,
-            section=request.section
+    with clash_guard(db, "Staff member or classroom is already booked at this time"):
+        db.commit()
+    db.refresh(entry)
+    
+    return entry
+
+@router.delete("/entries/{entry_id}")
+def delete_timetable_entry(
+    entry_id: int,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Manually remove a timetable entry"""
+    entry = db.query(TimetableEntry).filter(TimetableEntry.id == entry_id).first()
+    if not entry:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Timetable entry not found"
         )
-        db.add(entry)
-        created_entries.append(entry)
     
+    _check_entry_permission(current_user, entry.department_id)
+    
+    db.delete(entry)
     db.commit()
     
-    # Refresh entries to get IDs
-    for entry in created_entries:
-        db.refresh(entry)
+    return {"message": "Timetable entry deleted successfully"}
+
+@router.post("/repair")
+def repair_timetable_entries(
+    request: TimetableRepairRequest,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Re-place only the entries affected by a subject, classroom or time slot change"""
+    # Check permissions
+    if current_user["user_type"] != "main_admin":
+        if not (current_user["user_type"] == "staff" and current_user["user"].is_department_admin):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Insufficient permissions"
+            )
     
-    return TimetableResponse(
-        entries=created_entries,
-        total_entries=len(created_entries),
-        conflicts=ai_result.get("conflicts", [])
-    )
+    if request.subject_id is None and request.classroom_id is None and request.time_slot_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Specify subject_id, classroom_id or time_slot_id"
+        )
+    
+    with clash_guard(db):
+        summary = repair_timetable(
+            db,
+            subject_id=request.subject_id,
+            classroom_id=request.classroom_id,
+            time_slot_id=request.time_slot_id,
+            time_budget=request.time_budget
+        )
+        db.commit()
+    
+    return summary
 
 @router.get("/export")
 async def export_timetable(
@@ -191,12 +463,8 @@ async def export_timetable(
     current_user: dict = Depends(get_current_user)
 ):
     """Export timetable to Excel"""
-    # Get timetable entries
-    entries = db.query(TimetableEntry).filter(
-        TimetableEntry.department_id == department_id,
-        TimetableEntry.semester == semester,
-        TimetableEntry.section == section
-    ).all()
+    # Get timetable rows with their names and times resolved in the same query
+    entries = db.execute(timetable_view_query(department_id, semester, section, week_order=True)).all()
     
     if not entries:
         raise HTTPException(
@@ -204,30 +472,19 @@ async def export_timetable(
             detail="No timetable found for the specified criteria"
         )
     
-    # Get related data
-    time_slots = {ts.id: ts for ts in db.query(TimeSlot).all()}
-    subjects = {s.id: s for s in db.query(Subject).all()}
-    staff = {st.id: st for st in db.query(Staff).all()}
-    classrooms = {c.id: c for c in db.query(Classroom).all()}
-    
     # Prepare data for Excel
     timetable_data = []
     for entry in entries:
-        time_slot = time_slots.get(entry.time_slot_id)
-        subject = subjects.get(entry.subject_id)
-        staff_member = staff.get(entry.staff_id)
-        classroom = classrooms.get(entry.classroom_id)
-        
         timetable_data.append({
             "Day": entry.day,
-            "Time Slot": time_slot.slot_name if time_slot else "",
-            "Start Time": str(time_slot.start_time) if time_slot else "",
-            "End Time": str(time_slot.end_time) if time_slot else "",
-            "Subject": subject.name if subject else "",
-            "Subject Code": subject.code if subject else "",
-            "Staff": staff_member.name if staff_member else "",
-            "Classroom": classroom.room_number if classroom else "",
-            "Room Type": classroom.room_type if classroom else "",
+            "Time Slot": entry.slot_name or "",
+            "Start Time": str(entry.start_time),
+            "End Time": str(entry.end_time),
+            "Subject": entry.subject_name,
+            "Subject Code": entry.subject_code,
+            "Staff": entry.staff_name,
+            "Classroom": entry.room_number,
+            "Room Type": entry.room_type,
             "Semester": entry.semester,
             "Section": entry.section
         })
@@ -298,15 +555,52 @@ async def clear_timetable(
     
     return {"message": f"Cleared {deleted_count} timetable entries"}
 
+def _optimization_inputs(db: Session, department_id: int, semester: int, section: str, entries):
+    """Time slots, candidate rooms, the bookings an optimizer must work around and lab block lengths"""
+    time_slots = db.query(TimeSlot).filter(TimeSlot.is_active == True).order_by(TimeSlot.start_time).all()
+    room_ids = {e.classroom_id for e in entries}
+    classrooms = db.query(Classroom).filter(or_(
+        and_(Classroom.department_id == department_id, Classroom.is_available == True),
+        Classroom.id.in_(room_ids)
+    )).all()
+    
+    staff_ids = {e.staff_id for e in entries}
+    fixed = db.query(TimetableEntry).filter(
+        or_(TimetableEntry.staff_id.in_(staff_ids),
+            TimetableEntry.classroom_id.in_([c.id for c in classrooms])),
+        not_(and_(TimetableEntry.department_id == department_id,
+                  TimetableEntry.semester == semester,
+                  TimetableEntry.section == section))
+    ).all()
+    
+    time_slots_data = [
+        {"id": t.id, "slot_name": t.slot_name, "start_time": str(t.start_time), "end_time": str(t.end_time)}
+        for t in time_slots
+    ]
+    classrooms_data = [
+        {"id": c.id, "room_number": c.room_number, "capacity": c.capacity,
+         "room_type": c.room_type, "is_available": c.is_available}
+        for c in classrooms
+    ]
+    fixed_data = [
+        {"day": e.day, "time_slot_id": e.time_slot_id, "staff_id": e.staff_id, "classroom_id": e.classroom_id}
+        for e in fixed
+    ]
+    subjects = db.query(Subject).filter(Subject.id.in_({e.subject_id for e in entries})).all()
+    block_hours = lab_block_hours([subject_to_dict(s) for s in subjects])
+    return time_slots_data, classrooms_data, fixed_data, block_hours
+
 @router.get("/conflicts")
-async def check_conflicts(
+def check_conflicts(
     department_id: int,
     semester: int,
     section: str,
+    optimize: bool = False,
+    time_budget: Optional[float] = None,
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    """Check for conflicts in timetable"""
+    """Check for conflicts in timetable, optionally returning an optimized version"""
     entries = db.query(TimetableEntry).filter(
         TimetableEntry.department_id == department_id,
         TimetableEntry.semester == semester,
@@ -319,19 +613,265 @@ async def check_conflicts(
     # Convert to format expected by AI service
     entries_data = [
         {
+            "id": e.id,
             "day": e.day,
             "time_slot_id": e.time_slot_id,
+            "subject_id": e.subject_id,
             "staff_id": e.staff_id,
             "classroom_id": e.classroom_id
         }
         for e in entries
     ]
     
-    conflicts = ai_service.detect_conflicts(entries_data)
+    # Every slot, active or not, so slots of different lengths that overlap are caught
+    all_time_slots = [time_slot_to_dict(t) for t in db.query(TimeSlot).order_by(TimeSlot.start_time).all()]
+    conflicts = ai_service.detect_conflicts(entries_data, all_time_slots)
     suggestions = ai_service.optimize_timetable(entries_data)
     
-    return {
+    # Clashes with other sections and departments come from the global index
+    conflict_index.ensure_built(db)
+    
+    # Institution-wide load of the section's staff comes from the materialized summary
+    section_staff = db.query(Staff).filter(Staff.id.in_({e.staff_id for e in entries})).order_by(Staff.id).all()
+    
+    response = {
         "conflicts": conflicts,
+        "cross_section_conflicts": conflict_index.conflicts_for(e.id for e in entries),
         "suggestions": suggestions,
+        "staff_workload": workload_report(db, section_staff, MAX_HOURS_PER_DAY),
         "total_entries": len(entries)
-    }
\ No newline at end of file
+    }
+    
+    if optimize:
+        time_slots_data, classrooms_data, fixed_data, block_hours = _optimization_inputs(
+            db, department_id, semester, section, entries
+        )
+        improved = ai_service.improve_timetable(
+            entries_data, time_slots_data, classrooms_data,
+            fixed_entries=fixed_data, time_budget=time_budget,
+            constraints=default_constraints(department_id, semester, section),
+            block_hours=block_hours
+        )
+        response["optimized"] = improved
+        response["score_before"] = improved["score_before"]
+        response["score_after"] = improved["score_after"]
+        response["score_breakdown"] = improved["score_breakdown"]
+    
+    return response
+
+@router.get("/conflicts/global")
+def check_global_conflicts(
+    department_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Every staff and room clash across departments, semesters and sections"""
+    # Staff only see clashes that touch their own department
+    if current_user["user_type"] == "staff":
+        department_id = current_user["user"].department_id
+    
+    conflict_index.ensure_built(db)
+    conflicts = conflict_index.conflicts(department_id)
+    
+    return {
+        "conflicts": conflicts,
+        "total_conflicts": len(conflicts),
+        "staff_conflicts": sum(1 for c in conflicts if c["type"] == "staff"),
+        "room_conflicts": sum(1 for c in conflicts if c["type"] == "room")
+    }
+
+@router.get("/conflicts/sql")
+def check_conflicts_in_database(
+    department_id: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    stream: bool = False,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Staff and room clashes computed by the database, paged or streamed as NDJSON"""
+    if current_user["user_type"] == "staff":
+        department_id = current_user["user"].department_id
+    
+    if not stream:
+        return clash_page(db, limit, offset, department_id)
+    
+    def generate():
+        # Own session: the request session may be closed before streaming finishes
+        stream_db = SessionLocal()
+        try:
+            for clash in iter_clashes(stream_db, department_id):
+                yield json.dumps(clash) + "\n"
+        finally:
+            stream_db.close()
+    
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+@router.get("/availability/rooms")
+def get_free_rooms(
+    day: str,
+    time_slot_ids: List[int] = Query(...),
+    room_type: Optional[str] = None,
+    min_capacity: Optional[int] = Query(None, ge=1),
+    department_id: Optional[int] = None,
+    semester: Optional[int] = None,
+    section: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Rooms free in every given slot of a day
+
+    With department_id, semester and section, only rooms that seat the section are
+    listed, by the same rule the generators use (capped at the largest matching room).
+    """
+    if day not in DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Day must be one of {', '.join(DAYS)}"
+        )
+
+    query = db.query(Classroom).filter(Classroom.is_available == True)
+    if room_type:
+        query = query.filter(Classroom.room_type == room_type)
+    if min_capacity:
+        query = query.filter(Classroom.capacity >= min_capacity)
+    if department_id:
+        query = query.filter(or_(Classroom.department_id == department_id, Classroom.department_id.is_(None)))
+    rooms = query.order_by(Classroom.capacity, Classroom.room_number).all()
+    if department_id and semester and section:
+        scope = (department_id, semester, section)
+        required = seating_requirement(load_section_strengths(db, [scope]).get(scope),
+                                       [room.capacity for room in rooms])
+        rooms = [room for room in rooms if room.capacity >= required]
+
+    conflict_index.ensure_built(db)
+    unknown = [slot_id for slot_id in time_slot_ids if (day, slot_id) not in conflict_index.bit_index]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Time slots {unknown} are not active"
+        )
+    free_ids = set(conflict_index.free_rooms([room.id for room in rooms], [(day, i) for i in time_slot_ids]))
+
+    return {
+        "day": day,
+        "time_slot_ids": time_slot_ids,
+        "rooms": [classroom_to_dict(room) for room in rooms if room.id in free_ids]
+    }
+
+@router.get("/availability/common")
+def get_common_free_slots(
+    staff_ids: Optional[List[int]] = Query(None),
+    classroom_ids: Optional[List[int]] = Query(None),
+    match: str = Query("all", pattern="^(all|any)$"),
+    day: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Slots where all (or any) of the given staff members and rooms are free"""
+    if not staff_ids and not classroom_ids:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Provide at least one staff_ids or classroom_ids value"
+        )
+
+    conflict_index.ensure_built(db)
+    free = conflict_index.common_free(staff_ids or [], classroom_ids or [], match)
+    slots = conflict_index.cells_of(free)
+    if day:
+        slots = [slot for slot in slots if slot["day"] == day]
+
+    return {
+        "staff_ids": staff_ids or [],
+        "classroom_ids": classroom_ids or [],
+        "match": match,
+        "free_slots": slots,
+        "total_free_slots": len(slots)
+    }
+
+@router.post("/optimize")
+def optimize_timetable(
+    request: TimetableOptimizeRequest,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Improve a stored timetable with local search and write the result back"""
+    # Check permissions
+    if current_user["user_type"] != "main_admin":
+        if not (current_user["user_type"] == "staff" and current_user["user"].is_department_admin):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Insufficient permissions"
+            )
+    
+    entries = db.query(TimetableEntry).filter(
+        TimetableEntry.department_id == request.department_id,
+        TimetableEntry.semester == request.semester,
+        TimetableEntry.section == request.section
+    ).all()
+    
+    if not entries:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No timetable found for the specified criteria"
+        )
+    
+    time_slots_data, classrooms_data, fixed_data, block_hours = _optimization_inputs(
+        db, request.department_id, request.semester, request.section, entries
+    )
+    entries_data = [
+        {"id": e.id, "day": e.day, "time_slot_id": e.time_slot_id, "subject_id": e.subject_id,
+         "staff_id": e.staff_id, "classroom_id": e.classroom_id}
+        for e in entries
+    ]
+    improved = ai_service.improve_timetable(
+        entries_data, time_slots_data, classrooms_data,
+        fixed_entries=fixed_data, time_budget=request.time_budget,
+        constraints=default_constraints(request.department_id, request.semester, request.section),
+        block_hours=block_hours
+    )
+    
+    # Only touch entries that actually moved
+    by_id = {e.id: e for e in entries}
+    moves = []
+    for entry_data in improved["timetable"]:
+        entry = by_id[entry_data["id"]]
+        if (entry.day, entry.time_slot_id, entry.classroom_id) != (
+                entry_data["day"], entry_data["time_slot_id"], entry_data["classroom_id"]):
+            moves.append(dict(entry_data, row=entry))
+    moved = len(moves)
+    
+    with clash_guard(db):
+        move_entries(db, moves)
+        db.commit()
+    
+    return {
+        "message": f"Moved {moved} timetable entries",
+        "moved_entries": moved,
+        "score_before": improved["score_before"],
+        "score_after": improved["score_after"],
+        "score_breakdown": improved["score_breakdown"]
+    }
+
+@router.get("/ai-cache")
+def get_ai_cache_stats(current_user: dict = Depends(get_current_user)):
+    """Get LLM response cache statistics"""
+    if current_user["user_type"] != "main_admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only main admin can view AI cache statistics"
+        )
+    
+    return llm_cache.stats()
+
+@router.delete("/ai-cache")
+def clear_ai_cache(current_user: dict = Depends(get_current_user)):
+    """Drop every cached LLM response"""
+    if current_user["user_type"] != "main_admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only main admin can clear the AI cache"
+        )
+    
+    removed = llm_cache.clear()
+    return {"message": f"Removed {removed} cached AI responses"}
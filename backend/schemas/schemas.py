@@ -4,7 +4,7 @@ Pydantic schemas for request/response validation
 
 from pydantic import BaseModel, EmailStr
 from typing import Optional, List
-from datetime import datetime, time
+from datetime import datetime, date, time
 
 # Authentication Schemas
 class LoginRequest(BaseModel):
@@ -45,6 +45,22 @@ class DepartmentResponse(DepartmentBase):
     class Config:
         from_attributes = True
 
+# Section Schemas
+class SectionStrength(BaseModel):
+    semester: int
+    section: str
+    strength: int
+
+class SectionResponse(BaseModel):
+    id: int
+    department_id: int
+    semester: int
+    name: str
+    strength: int
+    
+    class Config:
+        from_attributes = True
+
 # Staff Schemas
 class StaffBase(BaseModel):
     name: str
@@ -143,6 +159,13 @@ class TimetableEntryBase(BaseModel):
 class TimetableEntryCreate(TimetableEntryBase):
     pass
 
+class TimetableEntryUpdate(BaseModel):
+    day: Optional[str] = None
+    time_slot_id: Optional[int] = None
+    subject_id: Optional[int] = None
+    staff_id: Optional[int] = None
+    classroom_id: Optional[int] = None
+
 class TimetableEntryResponse(TimetableEntryBase):
     id: int
     created_at: datetime
@@ -150,15 +173,93 @@ class TimetableEntryResponse(TimetableEntryBase):
     class Config:
         from_attributes = True
 
+class TimetableViewEntry(TimetableEntryBase):
+    """Timetable entry with the names and times of what it references"""
+    id: int
+    slot_name: Optional[str] = None
+    start_time: time
+    end_time: time
+    subject_code: str
+    subject_name: str
+    staff_name: str
+    room_number: str
+    room_type: str
+
 class TimetableGenerateRequest(BaseModel):
     department_id: int
     semester: int
     section: str
+    engine: Optional[str] = None  # auto, ai, greedy, csp or portfolio
+    time_budget: Optional[float] = None  # seconds, solver engines only
+
+class TimetableScope(BaseModel):
+    department_id: int
+    semester: int
+    section: str
+
+class TimetableBatchGenerateRequest(BaseModel):
+    scopes: List[TimetableScope]
+    time_budget: Optional[float] = None  # seconds per independent component
+    max_workers: Optional[int] = None
+
+class TimetableRepairRequest(BaseModel):
+    subject_id: Optional[int] = None  # subject reassigned to another staff member
+    classroom_id: Optional[int] = None  # classroom marked unavailable
+    time_slot_id: Optional[int] = None  # time slot deactivated
+    time_budget: Optional[float] = None  # seconds
+
+class TimetableOptimizeRequest(BaseModel):
+    department_id: int
+    semester: int
+    section: str
+    time_budget: Optional[float] = None  # seconds
 
 class TimetableResponse(BaseModel):
     entries: List[TimetableEntryResponse]
     total_entries: int
     conflicts: List[str] = []
+    unplaced: List[dict] = []
+    optimization_score: Optional[float] = None  # 0..1, 1.0 means no soft-constraint penalties
+    score_breakdown: Optional[dict] = None  # weighted penalty per soft constraint
+    token_usage: Optional[dict] = None  # LLM prompt/completion tokens per request
+    repair_report: Optional[dict] = None  # what validation changed in the LLM output
+
+class TimetableBatchResponse(TimetableResponse):
+    components: int
+
+class TimetableDraftResponse(BaseModel):
+    id: str
+    department_id: int
+    semester: int
+    section: str
+    engine: Optional[str] = None
+    entries: List[TimetableEntryBase]
+    total_entries: int
+    diff: dict  # added, removed and moved entries against the live timetable
+    optimization_score: Optional[float] = None
+    live_score: Optional[float] = None  # score of the live timetable, same objective
+    score_breakdown: Optional[dict] = None
+    conflicts: List[str] = []
+    unplaced: List[dict] = []
+    token_usage: Optional[dict] = None
+    repair_report: Optional[dict] = None
+    created_at: datetime
+    expires_at: datetime
+
+class TimetableJobResponse(BaseModel):
+    id: str
+    status: str  # queued, running, completed, failed or cancelled
+    department_id: int
+    semester: int
+    section: str
+    engine: Optional[str] = None
+    placed_hours: int = 0
+    total_hours: int = 0
+    score: Optional[float] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
 
 # Time Slot Schemas
 class TimeSlotBase(BaseModel):
@@ -177,6 +278,43 @@ class TimeSlotResponse(TimeSlotBase):
     class Config:
         from_attributes = True
 
+# Term Schemas
+class HolidayBase(BaseModel):
+    date: date
+    name: str
+
+class HolidayCreate(HolidayBase):
+    pass
+
+class HolidayResponse(HolidayBase):
+    id: int
+    term_id: int
+    
+    class Config:
+        from_attributes = True
+
+class TermBase(BaseModel):
+    name: str
+    start_date: date
+    end_date: date
+    department_id: Optional[int] = None
+
+class TermCreate(TermBase):
+    holidays: List[HolidayCreate] = []
+
+class TermUpdate(BaseModel):
+    name: Optional[str] = None
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+
+class TermResponse(TermBase):
+    id: int
+    holidays: List[HolidayResponse] = []
+    created_at: datetime
+    
+    class Config:
+        from_attributes = True
+
 # System Rule Schemas
 class SystemRuleBase(BaseModel):
     rule_name: str
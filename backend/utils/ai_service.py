@@ -3,9 +3,18 @@ AI Service for intelligent timetable generation using Gemini or Groq
 """
 
 import os
-import json
-from typing import List, Dict, Any
+import numpy as np
+from typing import List, Dict, Any, Callable
 from dotenv import load_dotenv
+from backend.utils.occupancy import OccupancyGrid, required_room_type
+from backend.utils.csp_solver import CSPTimetableSolver, build_tasks, describe_unplaced
+from backend.utils.local_search import TimetableAnnealer
+from backend.utils.slot_intervals import SlotIntervals
+from backend.utils.scoring import score_timetable
+from backend.utils.portfolio import SolverPortfolio
+from backend.utils.llm_cache import llm_cache, problem_hash
+from backend.utils.prompt_encoding import PromptEncoder, estimate_tokens
+from backend.utils.llm_validation import validate_and_repair, parse_llm_json
 
 load_dotenv()
 
@@ -13,6 +22,20 @@ load_dotenv()
 AI_PROVIDER = os.getenv("AI_PROVIDER", "gemini").lower()
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-pro")
+GROQ_MODEL = os.getenv("GROQ_MODEL", "mixtral-8x7b-32768")
+
+# Model limits used to decide when a problem must be split into chunks
+GEMINI_CONTEXT_TOKENS = int(os.getenv("GEMINI_CONTEXT_TOKENS", "30720"))
+GEMINI_MAX_OUTPUT_TOKENS = int(os.getenv("GEMINI_MAX_OUTPUT_TOKENS", "2048"))
+GROQ_CONTEXT_TOKENS = int(os.getenv("GROQ_CONTEXT_TOKENS", "32768"))
+GROQ_MAX_OUTPUT_TOKENS = int(os.getenv("GROQ_MAX_OUTPUT_TOKENS", "2000"))
+
+# Generation engine: auto (AI when configured, else greedy), ai, greedy, csp or portfolio
+TIMETABLE_ENGINE = os.getenv("TIMETABLE_ENGINE", "auto").lower()
+SOLVER_TIME_BUDGET = float(os.getenv("SOLVER_TIME_BUDGET", "5"))
+OPTIMIZER_TIME_BUDGET = float(os.getenv("OPTIMIZER_TIME_BUDGET", "2"))
+GENERATION_ENGINES = ("auto", "ai", "greedy", "csp", "portfolio")
 
 class AITimetableService:
     """AI-powered timetable generation service"""
@@ -27,7 +50,7 @@ class AITimetableService:
             try:
                 import google.generativeai as genai
                 genai.configure(api_key=GEMINI_API_KEY)
-                self.client = genai.GenerativeModel('gemini-pro')
+                self.client = genai.GenerativeModel(GEMINI_MODEL)
                 self.available = True
             except ImportError:
                 print("⚠️ Gemini AI not available. Install google-generativeai package.")
@@ -49,26 +72,94 @@ class AITimetableService:
                                      staff: List[Dict], 
                                      classrooms: List[Dict], 
                                      time_slots: List[Dict],
-                                     constraints: Dict) -> Dict[str, Any]:
-        """Generate AI-powered timetable suggestions"""
+                                     constraints: Dict,
+                                     engine: str = None,
+                                     time_budget: float = None,
+                                     progress: Callable[[Dict], None] = None,
+                                     should_stop: Callable[[], bool] = None,
+                                     fixed_entries: List[Dict] = ()) -> Dict[str, Any]:
+        """Generate AI-powered timetable suggestions around fixed bookings of other sections"""
+        result = self.generate_with_engine(subjects, staff, classrooms, time_slots, constraints, engine,
+                                           time_budget, progress, should_stop, fixed_entries)
+        return dict(result, **self.score_result(result.get("timetable", []), subjects, classrooms,
+                                                time_slots, constraints))
+    
+    def score_result(self, timetable, subjects, classrooms, time_slots, constraints):
+        """Score a generated timetable with the shared soft-constraint objective"""
+        quality = score_timetable(timetable, time_slots, classrooms, constraints,
+                                  required_hours=sum(task["hours"] for task in build_tasks(subjects)))
+        return {"optimization_score": quality["score"], "score_breakdown": quality["components"]}
+    
+    def generate_with_engine(self, subjects, staff, classrooms, time_slots, constraints, engine=None,
+                             time_budget=None, progress=None, should_stop=None, fixed_entries=()):
+        """Dispatch to the requested engine, falling back to the greedy algorithm"""
+        engine = (engine or TIMETABLE_ENGINE).lower()
+        
+        if engine == "csp":
+            return self.generate_with_csp(subjects, staff, classrooms, time_slots, constraints, time_budget,
+                                          progress=progress, should_stop=should_stop,
+                                          fixed_entries=fixed_entries)
         
-        if not self.available:
-            return self.fallback_timetable_generation(subjects, staff, classrooms, time_slots, constraints)
+        if engine == "portfolio":
+            return self.generate_with_portfolio(subjects, staff, classrooms, time_slots, constraints, time_budget,
+                                                progress=progress, should_stop=should_stop,
+                                                fixed_entries=fixed_entries)
+        
+        if engine == "greedy" or not self.available:
+            return self.fallback_timetable_generation(subjects, staff, classrooms, time_slots, constraints,
+                                                      fixed_entries=fixed_entries)
         
         try:
             # Prepare data for AI
             context = self.prepare_ai_context(subjects, staff, classrooms, time_slots, constraints)
             
-            if self.provider == "gemini":
-                return self.generate_with_gemini(context)
-            elif self.provider == "groq":
-                return self.generate_with_groq(context)
+            if self.provider not in ("gemini", "groq"):
+                return self.fallback_timetable_generation(subjects, staff, classrooms, time_slots, constraints,
+                                                          fixed_entries=fixed_entries)
+            
+            # Unchanged problems reuse the previous response instead of a new remote call
+            cache_key = problem_hash(context, self.provider, self.model_name())
+            result = llm_cache.get(cache_key)
+            if result is not None:
+                print("♻️ Using cached AI timetable response")
+                result["token_usage"] = {"requests": [], "prompt_tokens": 0, "completion_tokens": 0, "cached": True}
+            elif self.provider == "gemini":
+                result = self.generate_with_gemini(context, cache_key)
             else:
-                return self.fallback_timetable_generation(subjects, staff, classrooms, time_slots, constraints)
+                result = self.generate_with_groq(context, cache_key)
+            
+            return self.validate_ai_result(result, subjects, staff, classrooms, time_slots, constraints,
+                                           fixed_entries=fixed_entries)
                 
         except Exception as e:
             print(f"❌ AI generation failed: {e}")
-            return self.fallback_timetable_generation(subjects, staff, classrooms, time_slots, constraints)
+            return self.fallback_timetable_generation(subjects, staff, classrooms, time_slots, constraints,
+                                                      fixed_entries=fixed_entries)
+    
+    def validate_ai_result(self, result, subjects, staff, classrooms, time_slots, constraints, fixed_entries=()):
+        """Check AI output against occupancy, repair what it can and fill missing hours"""
+        checked = validate_and_repair(result.get("timetable", []), subjects, staff, classrooms,
+                                      time_slots, constraints, fixed_entries=fixed_entries)
+        report = checked["report"]
+        if report["repaired"] or report["dropped"] or report["filled"]:
+            print(f"🩹 AI timetable repaired: kept {report['kept']}, dropped {len(report['dropped'])}, "
+                  f"fixed {len(report['repaired'])}, filled {report['filled']}")
+        
+        suggestions = list(result.get("suggestions", []))
+        if report["dropped"]:
+            suggestions.append(f"{len(report['dropped'])} AI entries were invalid and re-placed by the solver")
+        return dict(
+            result,
+            timetable=checked["timetable"],
+            conflicts=list(result.get("conflicts", [])) + describe_unplaced(checked["unplaced"]),
+            unplaced=[{"subject_id": item["subject"]["id"], "hours": item["hours"]} for item in checked["unplaced"]],
+            suggestions=suggestions,
+            repair_report=report
+        )
+    
+    def model_name(self):
+        """Model used by the configured provider"""
+        return GEMINI_MODEL if self.provider == "gemini" else GROQ_MODEL
     
     def prepare_ai_context(self, subjects, staff, classrooms, time_slots, constraints):
         """Prepare context for AI model"""
@@ -81,47 +172,13 @@ class AITimetableService:
             "task": "Generate an optimal timetable allocation"
         }
     
-    def generate_with_gemini(self, context):
+    def generate_with_gemini(self, context, cache_key=None):
         """Generate timetable using Gemini AI"""
-        prompt = f"""
-        You are an expert timetable scheduling AI for SRM College. Generate an optimal timetable based on the following data:
-
-        SUBJECTS: {json.dumps(context['subjects'], indent=2)}
-        STAFF: {json.dumps(context['staff'], indent=2)}
-        CLASSROOMS: {json.dumps(context['classrooms'], indent=2)}
-        TIME_SLOTS: {json.dumps(context['time_slots'], indent=2)}
-        CONSTRAINTS: {json.dumps(context['constraints'], indent=2)}
-
-        RULES:
-        1. No staff member can have overlapping classes
-        2. No classroom can be double-booked
-        3. Respect lunch break timings
-        4. Balance workload across days
-        5. Prefer theory classes in morning, labs in afternoon
-        6. Minimize gaps in staff schedules
-
-        Return a JSON response with:
-        {{
-            "timetable": [
-                {{
-                    "day": "Monday",
-                    "time_slot_id": 1,
-                    "subject_id": 1,
-                    "staff_id": 1,
-                    "classroom_id": 1,
-                    "confidence": 0.95
-                }}
-            ],
-            "conflicts": [],
-            "suggestions": [],
-            "optimization_score": 0.85
-        }}
-        """
-        
         try:
-            response = self.client.generate_content(prompt)
-            # Parse JSON from response
-            result = json.loads(response.text)
+            result = self.generate_with_llm(context, self.complete_with_gemini,
+                                            GEMINI_CONTEXT_TOKENS, GEMINI_MAX_OUTPUT_TOKENS)
+            if cache_key and result["complete_response"]:
+                llm_cache.put(cache_key, "gemini", GEMINI_MODEL, result)
             return result
         except Exception as e:
             print(f"Gemini generation error: {e}")
@@ -131,32 +188,13 @@ class AITimetableService:
                 context['constraints']
             )
     
-    def generate_with_groq(self, context):
+    def generate_with_groq(self, context, cache_key=None):
         """Generate timetable using Groq AI"""
-        prompt = f"""
-        Generate an optimal timetable for SRM College based on this data:
-        
-        Subjects: {context['subjects']}
-        Staff: {context['staff']}
-        Classrooms: {context['classrooms']}
-        Time Slots: {context['time_slots']}
-        Constraints: {context['constraints']}
-        
-        Return optimized timetable as JSON with conflict resolution.
-        """
-        
         try:
-            response = self.client.chat.completions.create(
-                messages=[
-                    {"role": "system", "content": "You are an expert timetable scheduling AI."},
-                    {"role": "user", "content": prompt}
-                ],
-                model="mixtral-8x7b-32768",
-                temperature=0.3,
-                max_tokens=2000
-            )
-            
-            result = json.loads(response.choices[0].message.content)
+            result = self.generate_with_llm(context, self.complete_with_groq,
+                                            GROQ_CONTEXT_TOKENS, GROQ_MAX_OUTPUT_TOKENS)
+            if cache_key and result["complete_response"]:
+                llm_cache.put(cache_key, "groq", GROQ_MODEL, result)
             return result
         except Exception as e:
             print(f"Groq generation error: {e}")
@@ -166,24 +204,97 @@ class AITimetableService:
                 context['constraints']
             )
     
-    def fallback_timetable_generation(self, subjects, staff, classrooms, time_slots, constraints):
+    def complete_with_gemini(self, prompt):
+        """Send one prompt to Gemini; returns the text and token counts"""
+        response = self.client.generate_content(
+            prompt, generation_config={"max_output_tokens": GEMINI_MAX_OUTPUT_TOKENS}
+        )
+        usage = getattr(response, "usage_metadata", None)
+        return response.text, {
+            "prompt_tokens": getattr(usage, "prompt_token_count", None),
+            "completion_tokens": getattr(usage, "candidates_token_count", None)
+        }
+    
+    def complete_with_groq(self, prompt):
+        """Send one prompt to Groq; returns the text and token counts"""
+        response = self.client.chat.completions.create(
+            messages=[
+                {"role": "system", "content": "You are an expert timetable scheduling AI."},
+                {"role": "user", "content": prompt}
+            ],
+            model=GROQ_MODEL,
+            temperature=0.3,
+            max_tokens=GROQ_MAX_OUTPUT_TOKENS
+        )
+        usage = getattr(response, "usage", None)
+        return response.choices[0].message.content, {
+            "prompt_tokens": getattr(usage, "prompt_tokens", None),
+            "completion_tokens": getattr(usage, "completion_tokens", None)
+        }
+    
+    def generate_with_llm(self, context, complete, context_tokens, max_output_tokens):
+        """Encode the problem compactly, solve it chunk by chunk and merge the answers"""
+        encoder = PromptEncoder(context)
+        chunks = encoder.chunks(context_tokens, max_output_tokens)
+        if len(chunks) > 1:
+            print(f"✂️ Splitting AI request into {len(chunks)} staff-group chunks")
+        
+        timetable, conflicts, suggestions, requests = [], [], [], []
+        taken = set()
+        failed = 0
+        for chunk in chunks:
+            prompt = encoder.encode(chunk, taken)
+            try:
+                text, usage = complete(prompt)
+                result = parse_llm_json(text)
+            except Exception as e:
+                # The validation stage fills this chunk's hours with the local solver
+                print(f"⚠️ AI chunk of {len(chunk)} subjects failed: {e}")
+                failed += 1
+                continue
+            entries = encoder.decode(result, chunk)
+            
+            # Later chunks must not reuse cells booked by earlier ones
+            for entry in entries:
+                taken.add(encoder.cell(entry))
+            timetable.extend(entries)
+            conflicts.extend(result.get("c", []))
+            suggestions.extend(result.get("s", []))
+            requests.append({
+                "subjects": len(chunk),
+                "partial": bool(result.get("partial")),
+                "prompt_tokens": usage.get("prompt_tokens") or estimate_tokens(prompt),
+                "completion_tokens": usage.get("completion_tokens") or estimate_tokens(text),
+                "estimated": not usage.get("prompt_tokens")
+            })
+        
+        if failed == len(chunks):
+            raise ValueError("every AI request failed")
+        
+        token_usage = {
+            "requests": requests,
+            "prompt_tokens": sum(r["prompt_tokens"] for r in requests),
+            "completion_tokens": sum(r["completion_tokens"] for r in requests)
+        }
+        print(f"🔢 AI tokens: {token_usage['prompt_tokens']} prompt + "
+              f"{token_usage['completion_tokens']} completion over {len(requests)} request(s)")
+        return {
+            "timetable": timetable,
+            "conflicts": conflicts,
+            "suggestions": suggestions,
+            "token_usage": token_usage,
+            "complete_response": failed == 0 and not any(r.get("partial") for r in requests)
+        }
+    
+    def fallback_timetable_generation(self, subjects, staff, classrooms, time_slots, constraints, fixed_entries=()):
         """Fallback algorithm when AI is not available"""
         print("🔄 Using fallback timetable generation algorithm...")
         
         timetable = []
         conflicts = []
-        staff_schedule = {}
-        classroom_schedule = {}
-        
-        days = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
-        
-        # Initialize schedules
-        for day in days:
-            staff_schedule[day] = {}
-            classroom_schedule[day] = {}
-            for slot in time_slots:
-                staff_schedule[day][slot['id']] = None
-                classroom_schedule[day][slot['id']] = []
+        grid = OccupancyGrid.for_subjects(subjects, staff, classrooms, time_slots)
+        for entry in fixed_entries:
+            grid.block_entry(entry)
         
         # Assign subjects to time slots
         for subject in subjects:
@@ -191,50 +302,21 @@ class AITimetableService:
                 continue
                 
             total_hours = subject.get('theory_hours', 3) + subject.get('practical_hours', 0)
-            hours_assigned = 0
+            room_type = grid.sized_room_key(required_room_type(subject), constraints.get("section_strength"))
             
-            for day in days:
-                if hours_assigned >= total_hours:
-                    break
-                    
-                for slot in time_slots:
-                    if hours_assigned >= total_hours:
-                        break
-                    
-                    slot_id = slot['id']
-                    staff_id = subject['assigned_staff_id']
-                    
-                    # Check staff availability
-                    if staff_schedule[day][slot_id] is not None:
-                        continue
-                    
-                    # Find available classroom
-                    suitable_classrooms = [
-                        c for c in classrooms 
-                        if c['id'] not in classroom_schedule[day][slot_id] and
-                        c.get('is_available', True) and
-                        (c.get('room_type') == 'Lab' if subject.get('practical_hours', 0) > 0 else True)
-                    ]
-                    
-                    if not suitable_classrooms:
-                        continue
-                    
-                    # Assign to timetable
-                    classroom = suitable_classrooms[0]
-                    
-                    timetable.append({
-                        "day": day,
-                        "time_slot_id": slot_id,
-                        "subject_id": subject['id'],
-                        "staff_id": staff_id,
-                        "classroom_id": classroom['id'],
-                        "confidence": 0.8
-                    })
-                    
-                    # Update schedules
-                    staff_schedule[day][slot_id] = staff_id
-                    classroom_schedule[day][slot_id].append(classroom['id'])
-                    hours_assigned += 1
+            # Cells where staff, section and a suitable room are free, in day/slot order
+            feasible = np.flatnonzero(grid.feasible_cells(subject['assigned_staff_id'], room_type))
+            for cell in feasible[:total_hours]:
+                day_idx, slot_idx = divmod(int(cell), len(grid.slot_ids))
+                room_idx = grid.best_fit_room(day_idx, slot_idx, room_type)
+                
+                timetable.append(grid.make_entry(day_idx, slot_idx, subject, room_idx))
+                grid.book(day_idx, slot_idx, subject['assigned_staff_id'], room_idx)
+            
+            if len(feasible) < total_hours:
+                conflicts.extend(describe_unplaced([
+                    {"subject": subject, "section": None, "hours": total_hours - len(feasible)}
+                ]))
         
         return {
             "timetable": timetable,
@@ -243,34 +325,109 @@ class AITimetableService:
                 "Consider balancing workload across days",
                 "Schedule labs in afternoon slots when possible",
                 "Minimize gaps in staff schedules"
+            ]
+        }
+    
+    def generate_with_csp(self, subjects, staff, classrooms, time_slots, constraints, time_budget=None,
+                          progress=None, should_stop=None, fixed_entries=()):
+        """Generate timetable with the backtracking constraint solver"""
+        print("🧩 Using constraint-satisfaction timetable solver...")
+        
+        grid = OccupancyGrid.for_subjects(subjects, staff, classrooms, time_slots)
+        for entry in fixed_entries:
+            grid.block_entry(entry)
+        solver = CSPTimetableSolver(
+            grid,
+            build_tasks(subjects, min_capacity=constraints.get("section_strength")),
+            max_hours_per_day=constraints.get("max_hours_per_day"),
+            time_budget=time_budget or SOLVER_TIME_BUDGET,
+            should_stop=should_stop,
+            progress=progress,
+            intervals=SlotIntervals(time_slots, constraints.get("lunch_break"))
+        )
+        result = solver.solve()
+        
+        suggestions = []
+        if result["timed_out"]:
+            suggestions.append("Solver time budget ran out; increase time_budget for a complete schedule")
+        
+        return {
+            "timetable": result["timetable"],
+            "conflicts": describe_unplaced(result["unplaced"]),
+            "unplaced": [
+                {"subject_id": item["subject"]["id"], "hours": item["hours"]}
+                for item in result["unplaced"]
             ],
-            "optimization_score": 0.75
+            "suggestions": suggestions
         }
     
-    def detect_conflicts(self, timetable_entries):
-        """Detect conflicts in timetable"""
+    def generate_with_portfolio(self, subjects, staff, classrooms, time_slots, constraints, time_budget=None,
+                                progress=None, should_stop=None, fixed_entries=()):
+        """Run strategy-varied solvers in parallel and keep the best timetable"""
+        print("🏁 Using parallel solver portfolio...")
+        
+        best = SolverPortfolio().solve(
+            subjects, staff, classrooms, time_slots, constraints,
+            time_budget or SOLVER_TIME_BUDGET,
+            should_stop=should_stop,
+            fixed_entries=fixed_entries
+        )
+        if best is None:
+            return {"timetable": [], "conflicts": ["Generation cancelled"], "unplaced": [],
+                    "suggestions": []}
+        strategy = best["strategy"]
+        if progress:
+            total = sum(task["hours"] for task in build_tasks(subjects))
+            progress({"placed_hours": total - sum(item["hours"] for item in best["unplaced"]),
+                      "total_hours": total, "score": best["score"]})
+        
+        return {
+            "timetable": best["timetable"],
+            "conflicts": describe_unplaced(best["unplaced_subjects"]),
+            "unplaced": best["unplaced"],
+            "suggestions": [
+                f"Best of {best['instances']} solver instances "
+                f"(ordering={strategy['ordering']}, seed={strategy['seed']})"
+            ]
+        }
+    
+    def detect_conflicts(self, timetable_entries, time_slots=None):
+        """Detect conflicts in timetable
+
+        With time_slots, bookings in different slots whose times overlap are reported too.
+        """
         conflicts = []
-        staff_slots = {}
-        classroom_slots = {}
+        staff_slots = set()
+        classroom_slots = set()
+        intervals = SlotIntervals(time_slots) if time_slots else None
+        staff_days = {}
+        classroom_days = {}
         
         for entry in timetable_entries:
-            key = f"{entry['day']}_{entry['time_slot_id']}"
+            key = (entry['day'], entry['time_slot_id'])
+            
+            if intervals is not None:
+                overlapping = intervals.overlapping(entry['time_slot_id'])
+                staff_day = staff_days.setdefault((entry['day'], entry['staff_id']), set())
+                for other in sorted(overlapping & staff_day):
+                    conflicts.append(f"Staff conflict: Staff {entry['staff_id']} has overlapping classes at {entry['day']} slots {other} and {entry['time_slot_id']}")
+                staff_day.add(entry['time_slot_id'])
+                room_day = classroom_days.setdefault((entry['day'], entry['classroom_id']), set())
+                for other in sorted(overlapping & room_day):
+                    conflicts.append(f"Classroom conflict: Room {entry['classroom_id']} is booked in overlapping slots at {entry['day']} slots {other} and {entry['time_slot_id']}")
+                room_day.add(entry['time_slot_id'])
             
             # Check staff conflicts
-            if entry['staff_id'] in staff_slots.get(key, []):
+            if key + (entry['staff_id'],) in staff_slots:
                 conflicts.append(f"Staff conflict: Staff {entry['staff_id']} has multiple classes at {entry['day']} slot {entry['time_slot_id']}")
             else:
-                if key not in staff_slots:
-                    staff_slots[key] = []
-                staff_slots[key].append(entry['staff_id'])
+                staff_slots.add(key + (entry['staff_id'],))
             
             # Check classroom conflicts
-            if entry['classroom_id'] in classroom_slots.get(key, []):
+            if key + (entry['classroom_id'],) in classroom_slots:
                 conflicts.append(f"Classroom conflict: Room {entry['classroom_id']} is double-booked at {entry['day']} slot {entry['time_slot_id']}")
             else:
-                if key not in classroom_slots:
-                    classroom_slots[key] = []
-                classroom_slots[key].append(entry['classroom_id'])
+                classroom_slots.add(key + (entry['classroom_id'],))
         
         return conflicts
     
@@ -307,5 +464,15 @@ class AITimetableService:
         
         return suggestions
 
+    
+    def improve_timetable(self, timetable_entries, time_slots, classrooms,
+                          fixed_entries=(), constraints=None, time_budget=None, block_hours=None):
+        """Improve an existing timetable with simulated annealing under a time budget"""
+        annealer = TimetableAnnealer(
+            timetable_entries, time_slots, classrooms,
+            fixed_entries=fixed_entries, constraints=constraints, block_hours=block_hours
+        )
+        return annealer.run(time_budget or OPTIMIZER_TIME_BUDGET)
+
 # Global AI service instance
-ai_service = AITimetableService()
\ No newline at end of file
+ai_service = AITimetableService()
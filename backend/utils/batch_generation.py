@@ -0,0 +1,152 @@
+"""
+Institution-wide batch timetable generation
+
+Every requested (department, semester, section) scope is solved against one
+shared staff/room occupancy state. Scopes that share no staff member and no
+room are independent, so each connected group is solved in its own process.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Optional
+from backend.utils.occupancy import OccupancyGrid
+from backend.utils.csp_solver import CSPTimetableSolver, build_tasks, describe_unplaced, DEFAULT_TIME_BUDGET
+from backend.utils.scoring import score_timetable
+from backend.utils.slot_intervals import SlotIntervals
+
+BATCH_MAX_WORKERS = int(os.getenv("BATCH_MAX_WORKERS", str(os.cpu_count() or 1)))
+
+def scope_key(scope: Dict):
+    """Hashable (department_id, semester, section) key for a scope"""
+    return (scope['department_id'], scope['semester'], scope['section'])
+
+def plan_components(scopes: List[Dict],
+                    subjects_by_scope: Dict,
+                    rooms_by_department: Dict) -> List[List[int]]:
+    """Group scope indexes that share staff or rooms (union-find)"""
+    parent = list(range(len(scopes)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    owner = {}
+    for i, scope in enumerate(scopes):
+        resources = [("staff", s['assigned_staff_id']) for s in subjects_by_scope[scope_key(scope)]]
+        resources += [("room", room['id']) for room in rooms_by_department.get(scope['department_id'], [])]
+        for resource in resources:
+            if resource in owner:
+                parent[find(i)] = find(owner[resource])
+            else:
+                owner[resource] = i
+
+    groups = {}
+    for i in range(len(scopes)):
+        groups.setdefault(find(i), []).append(i)
+    return list(groups.values())
+
+def solve_component(payload: Dict) -> Dict:
+    """Solve one independent group of scopes; runs inside a worker process"""
+    scopes = payload['scopes']
+    keys = [scope_key(scope) for scope in scopes]
+    subjects = [s for key in keys for s in payload['subjects_by_scope'][key]]
+    grid = OccupancyGrid.for_subjects(subjects, payload['staff'], payload['classrooms'],
+                                      payload['time_slots'], sections=keys)
+    for entry in payload['fixed_entries']:
+        grid.block_entry(entry)
+
+    tasks = []
+    for key in keys:
+        room_ids = [room['id'] for room in payload['rooms_by_department'].get(key[0], [])]
+        for task in build_tasks(payload['subjects_by_scope'][key], section=key,
+                                min_capacity=payload['section_strengths'].get(key)):
+            task['room_type'] = grid.add_room_group((key[0], task['room_type']), room_ids, task['room_type'])
+            tasks.append(task)
+
+    solver = CSPTimetableSolver(grid, tasks,
+                                max_hours_per_day=payload.get('max_hours_per_day'),
+                                time_budget=payload.get('time_budget') or DEFAULT_TIME_BUDGET,
+                                intervals=SlotIntervals(payload['time_slots'], payload.get('lunch_break')))
+    result = solver.solve()
+
+    timetable = []
+    for entry in result['timetable']:
+        department_id, semester, section = entry.pop('section')
+        entry.update(department_id=department_id, semester=semester, section=section)
+        timetable.append(entry)
+    unplaced = result['unplaced']
+    return {
+        "timetable": timetable,
+        "conflicts": describe_unplaced([dict(item, section=item['section'][2]) for item in unplaced]),
+        "unplaced": [
+            {"subject_id": item['subject']['id'], "department_id": item['section'][0],
+             "semester": item['section'][1], "section": item['section'][2], "hours": item['hours']}
+            for item in unplaced
+        ],
+        "timed_out": result['timed_out']
+    }
+
+def generate_batch(scopes: List[Dict],
+                   subjects_by_scope: Dict,
+                   staff: List[Dict],
+                   rooms_by_department: Dict,
+                   time_slots: List[Dict],
+                   fixed_entries: List[Dict],
+                   max_hours_per_day: Optional[int] = None,
+                   time_budget: Optional[float] = None,
+                   max_workers: Optional[int] = None,
+                   section_strengths: Optional[Dict] = None,
+                   lunch_break: Optional[Dict] = None) -> Dict:
+    """Generate timetables for many scopes at once, one process per independent component"""
+    section_strengths = section_strengths or {}
+    components = plan_components(scopes, subjects_by_scope, rooms_by_department)
+    payloads = []
+    for component in components:
+        component_scopes = [scopes[i] for i in component]
+        departments = {scope['department_id'] for scope in component_scopes}
+        classrooms = [room for d in departments for room in rooms_by_department.get(d, [])]
+        room_ids = {room['id'] for room in classrooms}
+        staff_ids = {s['assigned_staff_id'] for scope in component_scopes
+                     for s in subjects_by_scope[scope_key(scope)]}
+        payloads.append({
+            "scopes": component_scopes,
+            "subjects_by_scope": {scope_key(scope): subjects_by_scope[scope_key(scope)] for scope in component_scopes},
+            "staff": [s for s in staff if s['id'] in staff_ids],
+            "classrooms": classrooms,
+            "rooms_by_department": {d: rooms_by_department.get(d, []) for d in departments},
+            "time_slots": time_slots,
+            "fixed_entries": [e for e in fixed_entries
+                              if e['staff_id'] in staff_ids or e['classroom_id'] in room_ids],
+            "section_strengths": {scope_key(scope): section_strengths[scope_key(scope)]
+                                  for scope in component_scopes if scope_key(scope) in section_strengths},
+            "max_hours_per_day": max_hours_per_day,
+            "lunch_break": lunch_break,
+            "time_budget": time_budget
+        })
+
+    workers = min(max_workers or BATCH_MAX_WORKERS, len(payloads))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(solve_component, payloads))
+    else:
+        results = [solve_component(payload) for payload in payloads]
+
+    timetable = [entry for result in results for entry in result['timetable']]
+    # Score every scope as its own section, so equal section letters in different departments stay apart
+    quality = score_timetable(
+        [dict(entry, section=scope_key(entry)) for entry in timetable], time_slots,
+        [room for rooms in rooms_by_department.values() for room in rooms],
+        {"max_hours_per_day": max_hours_per_day, "lunch_break": lunch_break},
+        required_hours=sum(task['hours'] for scope in scopes for task in build_tasks(subjects_by_scope[scope_key(scope)]))
+    )
+    return {
+        "timetable": timetable,
+        "conflicts": [conflict for result in results for conflict in result['conflicts']],
+        "unplaced": [item for result in results for item in result['unplaced']],
+        "components": len(payloads),
+        "timed_out": any(result['timed_out'] for result in results),
+        "optimization_score": quality['score'],
+        "score_breakdown": quality['components']
+    }
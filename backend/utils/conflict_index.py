@@ -0,0 +1,260 @@
+"""
+Institution-wide conflict index
+
+Keeps a (day, time slot) -> staff / room -> entries index over every row in
+timetable_entries, so staff members and rooms double-booked across sections
+or departments are found without rescanning the table. Alongside it every
+staff member and room has a week bitmap (one bit per day x active time slot)
+of the cells it is booked in, so free-room and common-free-slot questions are
+answered with integer AND/OR instead of queries. The index is built lazily
+from one narrow query and then kept current by session events: ORM inserts,
+updates and deletes, bulk deletes of entries and the tracked bulk insert of
+insert_entries are applied when their transaction commits, while other bulk
+statements and time slot changes mark it stale for a rebuild on the next read.
+"""
+
+import threading
+from typing import List, Dict, Optional, Iterable, Tuple
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from backend.database.models import TimetableEntry, TimeSlot
+from backend.utils.occupancy import DAYS
+
+_FIELDS = ("day", "time_slot_id", "staff_id", "classroom_id", "subject_id", "department_id", "semester", "section")
+
+# Execution option of a bulk insert whose RETURNING rows the caller passes to track_inserted
+TRACKED_INSERT = "conflict_index_tracked"
+
+def _snapshot(entry: TimetableEntry) -> Dict:
+    return {"id": entry.id, **{field: getattr(entry, field) for field in _FIELDS}}
+
+class ConflictIndex:
+    """(day, slot) -> staff/room booking index with incrementally maintained clash sets"""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.entries = {}
+        self.staff_cells = {}
+        self.room_cells = {}
+        self.staff_clashes = set()
+        self.room_clashes = set()
+        # Week bitmaps: bit day_idx * len(slot_ids) + slot position is set while the resource is booked
+        self.slot_ids = []
+        self.bit_index = {}
+        self.staff_bits = {}
+        self.room_bits = {}
+        self.built = False
+
+    def invalidate(self):
+        with self.lock:
+            self.built = False
+
+    def rebuild(self, db: Session):
+        """Load every booking with a single column-only query"""
+        columns = [TimetableEntry.id] + [getattr(TimetableEntry, field) for field in _FIELDS]
+        with self.lock:
+            self.entries.clear()
+            self.staff_cells.clear()
+            self.room_cells.clear()
+            self.staff_clashes.clear()
+            self.room_clashes.clear()
+            self.staff_bits.clear()
+            self.room_bits.clear()
+            self.slot_ids = [row.id for row in db.query(TimeSlot.id).filter(
+                TimeSlot.is_active == True).order_by(TimeSlot.start_time, TimeSlot.id)]
+            self.bit_index = {
+                (day, slot_id): day_idx * len(self.slot_ids) + slot_idx
+                for day_idx, day in enumerate(DAYS) for slot_idx, slot_id in enumerate(self.slot_ids)
+            }
+            for row in db.query(*columns).yield_per(1000):
+                self._add(dict(row._mapping))
+            self.built = True
+
+    def ensure_built(self, db: Session):
+        if not self.built:
+            self.rebuild(db)
+
+    def _link(self, cells: Dict, clashes: set, bits: Dict, key, entry_id: int):
+        ids = cells.setdefault(key, set())
+        ids.add(entry_id)
+        if len(ids) > 1:
+            clashes.add(key)
+        bit = self.bit_index.get(key[:2])
+        if bit is not None:
+            bits[key[2]] = bits.get(key[2], 0) | (1 << bit)
+
+    def _unlink(self, cells: Dict, clashes: set, bits: Dict, key, entry_id: int):
+        ids = cells.get(key)
+        if not ids:
+            return
+        ids.discard(entry_id)
+        if len(ids) < 2:
+            clashes.discard(key)
+        if not ids:
+            del cells[key]
+            bit = self.bit_index.get(key[:2])
+            if bit is not None:
+                bits[key[2]] = bits.get(key[2], 0) & ~(1 << bit)
+
+    def _add(self, entry: Dict):
+        self.entries[entry['id']] = entry
+        cell = (entry['day'], entry['time_slot_id'])
+        self._link(self.staff_cells, self.staff_clashes, self.staff_bits, cell + (entry['staff_id'],), entry['id'])
+        self._link(self.room_cells, self.room_clashes, self.room_bits, cell + (entry['classroom_id'],), entry['id'])
+
+    def _remove(self, entry_id: int):
+        entry = self.entries.pop(entry_id, None)
+        if entry is None:
+            return
+        cell = (entry['day'], entry['time_slot_id'])
+        self._unlink(self.staff_cells, self.staff_clashes, self.staff_bits, cell + (entry['staff_id'],), entry_id)
+        self._unlink(self.room_cells, self.room_clashes, self.room_bits, cell + (entry['classroom_id'],), entry_id)
+
+    def apply(self, upserts: Iterable[Dict], removals: Iterable[int]):
+        """Apply committed row changes (idempotent, so replays are harmless)"""
+        with self.lock:
+            if not self.built:
+                return
+            for entry_id in removals:
+                self._remove(entry_id)
+            for entry in upserts:
+                self._remove(entry['id'])
+                self._add(entry)
+
+    def _describe(self, kind: str, key, ids) -> Dict:
+        day, time_slot_id, resource_id = key
+        return {
+            "type": kind,
+            "day": day,
+            "time_slot_id": time_slot_id,
+            "staff_id" if kind == "staff" else "classroom_id": resource_id,
+            "entries": [self.entries[i] for i in sorted(ids)]
+        }
+
+    def conflicts(self, department_id: Optional[int] = None) -> List[Dict]:
+        """Every staff and room clash, optionally only those touching one department"""
+        with self.lock:
+            result = [self._describe("staff", key, self.staff_cells[key]) for key in self.staff_clashes]
+            result += [self._describe("room", key, self.room_cells[key]) for key in self.room_clashes]
+        if department_id is not None:
+            result = [c for c in result if any(e['department_id'] == department_id for e in c['entries'])]
+        return sorted(result, key=lambda c: (c['day'], c['time_slot_id'], c['type']))
+
+    def conflicts_for(self, entry_ids: Iterable[int]) -> List[Dict]:
+        """Clashes involving any of the given entries"""
+        wanted = set(entry_ids)
+        return [c for c in self.conflicts() if any(e['id'] in wanted for e in c['entries'])]
+
+    # Availability queries over the week bitmaps
+
+    def week_mask(self) -> int:
+        """Bitmap with every (day, active slot) cell set"""
+        return (1 << (len(DAYS) * len(self.slot_ids))) - 1
+
+    def cell_bits(self, cells: Iterable[Tuple[str, int]]) -> int:
+        """Bitmap of the given (day, time_slot_id) cells; cells off the active grid are ignored"""
+        mask = 0
+        for cell in cells:
+            bit = self.bit_index.get(tuple(cell))
+            if bit is not None:
+                mask |= 1 << bit
+        return mask
+
+    def cells_of(self, mask: int) -> List[Dict]:
+        """(day, time_slot_id) cells of a bitmap in week order"""
+        n_slots = len(self.slot_ids)
+        cells = []
+        while mask:
+            low = mask & -mask
+            day_idx, slot_idx = divmod(low.bit_length() - 1, n_slots)
+            cells.append({"day": DAYS[day_idx], "time_slot_id": self.slot_ids[slot_idx]})
+            mask ^= low
+        return cells
+
+    def common_free(self, staff_ids: Iterable[int] = (), room_ids: Iterable[int] = (), match: str = "all") -> int:
+        """Cells where all (match="all") or at least one (match="any") of the resources is free"""
+        with self.lock:
+            busy = [self.staff_bits.get(i, 0) for i in staff_ids] + [self.room_bits.get(i, 0) for i in room_ids]
+            week = self.week_mask()
+        if not busy:
+            return week
+        if match == "any":
+            free = 0
+            for bits in busy:
+                free |= week & ~bits
+            return free
+        taken = 0
+        for bits in busy:
+            taken |= bits
+        return week & ~taken
+
+    def free_rooms(self, room_ids: Iterable[int], cells: Iterable[Tuple[str, int]]) -> List[int]:
+        """Rooms with none of the given cells booked"""
+        with self.lock:
+            wanted = self.cell_bits(cells)
+            return [room_id for room_id in room_ids if not self.room_bits.get(room_id, 0) & wanted]
+
+conflict_index = ConflictIndex()
+
+# Session hooks: collect changes per flush, apply them only once the transaction commits
+
+def _pending(session):
+    return (session.info.setdefault("conflict_index_upserts", {}),
+            session.info.setdefault("conflict_index_removals", set()))
+
+def track_inserted(session: Session, rows: Iterable):
+    """Queue rows returned by a TRACKED_INSERT statement for the index"""
+    upserts, removals = _pending(session)
+    for row in rows:
+        upserts[row.id] = {"id": row.id, **{field: row._mapping[field] for field in _FIELDS}}
+        removals.discard(row.id)
+
+@event.listens_for(Session, "after_flush")
+def _collect_entry_changes(session, flush_context):
+    upserts, removals = _pending(session)
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, TimetableEntry):
+            upserts[obj.id] = _snapshot(obj)
+            removals.discard(obj.id)
+    for obj in session.deleted:
+        if isinstance(obj, TimetableEntry):
+            upserts.pop(obj.id, None)
+            removals.add(obj.id)
+    # Slot order and activity decide the bitmap layout
+    if any(isinstance(obj, TimeSlot) for obj in list(session.new) + list(session.dirty) + list(session.deleted)):
+        session.info["conflict_index_stale"] = True
+
+@event.listens_for(Session, "do_orm_execute")
+def _detect_bulk_writes(orm_execute_state):
+    if orm_execute_state.is_select:
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None or mapper.class_ not in (TimetableEntry, TimeSlot):
+        return
+    session = orm_execute_state.session
+    if mapper.class_ is TimetableEntry and orm_execute_state.is_delete:
+        # Read the ids the delete is about to remove before it runs
+        query = select(TimetableEntry.id)
+        if orm_execute_state.statement.whereclause is not None:
+            query = query.where(orm_execute_state.statement.whereclause)
+        upserts, removals = _pending(session)
+        for (entry_id,) in session.connection().execute(query):
+            upserts.pop(entry_id, None)
+            removals.add(entry_id)
+    elif not (mapper.class_ is TimetableEntry and orm_execute_state.is_insert
+              and orm_execute_state.execution_options.get(TRACKED_INSERT)):
+        session.info["conflict_index_stale"] = True
+
+@event.listens_for(Session, "after_commit")
+def _apply_entry_changes(session):
+    upserts = session.info.pop("conflict_index_upserts", {})
+    removals = session.info.pop("conflict_index_removals", set())
+    if session.info.pop("conflict_index_stale", False):
+        conflict_index.invalidate()
+    elif upserts or removals:
+        conflict_index.apply(upserts.values(), removals)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_entry_changes(session):
+    for key in ("conflict_index_upserts", "conflict_index_removals", "conflict_index_stale"):
+        session.info.pop(key, None)
@@ -0,0 +1,397 @@
+"""
+Constraint-satisfaction timetable solver
+
+Backtracking search over subject hours with MRV/degree variable ordering
+and forward checking on the staff, room and section domains kept in an
+OccupancyGrid. Practical hours are placed as one block of contiguous slots
+in a single room, using the slot interval model for contiguity. Search runs
+under a wall-clock budget and always reports the hours it could not place.
+"""
+
+import time
+import random
+from typing import List, Dict, Optional, Callable
+import numpy as np
+from backend.utils.occupancy import OccupancyGrid, required_room_type
+from backend.utils.slot_intervals import SlotIntervals
+
+DEFAULT_TIME_BUDGET = 5.0
+
+# Variable ordering heuristics: key of an unfinished task given (slack, degree, remaining hours)
+ORDERINGS = {
+    "mrv": lambda slack, degree, hours: (slack, -degree),
+    "degree": lambda slack, degree, hours: (-degree, slack),
+    "largest": lambda slack, degree, hours: (-hours, slack),
+}
+
+def build_tasks(subjects: List[Dict], section="default", min_capacity: Optional[int] = None,
+                lab_blocks: bool = True) -> List[Dict]:
+    """Tasks for every assigned subject's weekly hours for one section of min_capacity students
+
+    With lab_blocks, practical hours of more than one slot become a separate task
+    placed as a single block of that many contiguous slots.
+    """
+    tasks = []
+    for subject in subjects:
+        if not subject.get('assigned_staff_id'):
+            continue
+        theory = subject.get('theory_hours', 3)
+        practical = subject.get('practical_hours', 0) or 0
+        parts = [(theory, 1), (practical, practical)] if lab_blocks and practical > 1 else [(theory + practical, 1)]
+        for hours, block in parts:
+            if hours <= 0:
+                continue
+            tasks.append({
+                "subject": subject,
+                "section": section,
+                "staff_id": subject['assigned_staff_id'],
+                "room_type": required_room_type(subject),
+                "min_capacity": min_capacity,
+                "hours": hours,
+                "block": block
+            })
+    return tasks
+
+def lab_block_hours(subjects: List[Dict]) -> Dict[int, int]:
+    """Practical block length of every subject whose practical hours are placed as one block"""
+    return {s['id']: s['practical_hours'] for s in subjects if (s.get('practical_hours') or 0) > 1}
+
+def describe_unplaced(unplaced: List[Dict]) -> List[str]:
+    """Human readable conflict messages for hours that could not be placed"""
+    messages = []
+    for item in unplaced:
+        subject = item['subject']
+        label = subject.get('code') or subject.get('name') or subject['id']
+        section = item.get('section')
+        scope = f" (section {section})" if section not in (None, "default") else ""
+        messages.append(
+            f"Unplaced: {label}{scope} needs {item['hours']} more hour(s); "
+            f"no free staff/room/slot combination found"
+        )
+    return messages
+
+class CSPTimetableSolver:
+    """Backtracking solver with MRV/degree ordering and forward checking"""
+
+    def __init__(self,
+                 grid: OccupancyGrid,
+                 tasks: List[Dict],
+                 max_hours_per_day: Optional[int] = None,
+                 time_budget: float = DEFAULT_TIME_BUDGET,
+                 seed: Optional[int] = None,
+                 should_stop: Optional[Callable[[], bool]] = None,
+                 ordering: str = "mrv",
+                 progress: Optional[Callable[[Dict], None]] = None,
+                 intervals: Optional[SlotIntervals] = None):
+        self.grid = grid
+        self.tasks = tasks
+        self.intervals = intervals or SlotIntervals(grid.time_slots)
+        # Sized sections may only use rooms that seat them
+        for task in tasks:
+            task['room_type'] = grid.sized_room_key(task['room_type'], task.pop('min_capacity', None))
+        self.max_hours_per_day = max_hours_per_day
+        self.time_budget = time_budget
+        self.rng = random.Random(seed) if seed is not None else None
+        self.should_stop = should_stop
+        self.progress = progress
+        self.ordering = ORDERINGS[ordering]
+        self.n_slots = len(grid.slot_ids)
+
+        # Staff teaching hours per day (including bookings already on the grid) for max_hours_per_day
+        self.staff_load = grid.staff_busy.sum(axis=1).astype(np.int32)
+
+        # Tasks are placed in units of their block length (one unit per block)
+        n = len(tasks)
+        self.blocks = [task.get('block', 1) for task in tasks]
+        self.remaining = [task['hours'] // self.blocks[t] for t, task in enumerate(tasks)]
+        self.last_cell = [-1] * n
+        self.day_counts = [[0] * len(grid.days) for _ in range(n)]
+        self.domain_counts = [0] * n
+        self.neighbors = self._build_neighbors()
+        self.placed = []
+        self.nodes = 0
+
+    def _build_neighbors(self) -> List[List[int]]:
+        """Tasks that compete for the same staff, section or rooms"""
+        by_staff, by_section, by_room_type = {}, {}, {}
+        for i, task in enumerate(self.tasks):
+            by_staff.setdefault(task['staff_id'], set()).add(i)
+            by_section.setdefault(task['section'], set()).add(i)
+            by_room_type.setdefault(task['room_type'], set()).add(i)
+
+        # Room masks that share at least one room compete with each other
+        sharing = {
+            key: set().union(*(members for other, members in by_room_type.items()
+                               if self.grid.rooms_overlap(key, other)))
+            for key in by_room_type
+        }
+
+        neighbors = []
+        for i, task in enumerate(self.tasks):
+            related = by_staff[task['staff_id']] | by_section[task['section']] | sharing[task['room_type']]
+            neighbors.append(sorted(related - {i}))
+        return neighbors
+
+    def domain(self, t: int) -> np.ndarray:
+        """Flat mask of cells still available to task t"""
+        task = self.tasks[t]
+        cells = self.grid.feasible_cells(task['staff_id'], task['room_type'], task['section'])
+        block = self.blocks[t]
+        if self.max_hours_per_day:
+            staff_idx = self.grid.staff_index[task['staff_id']]
+            cells &= (self.staff_load[:, staff_idx] + block <= self.max_hours_per_day)[:, None]
+        if block > 1:
+            cells = self._block_starts(cells, task['room_type'], block)
+        flat = cells.ravel()
+        # Hours of one task are interchangeable: place them in increasing cell order
+        flat[:self.last_cell[t] + 1] = False
+        return flat
+
+    def _block_starts(self, cells: np.ndarray, room_type, block: int) -> np.ndarray:
+        """Cells starting block contiguous free slots that share one free suitable room"""
+        n = self.n_slots - block + 1
+        starts = np.zeros_like(cells)
+        if n <= 0:
+            return starts
+        rooms_free = self.grid.room_mask(room_type) & ~self.grid.room_busy
+        window = cells[:, :n] & self.intervals.block_starts(block)[:n]
+        common = rooms_free[:, :n]
+        for offset in range(1, block):
+            window &= cells[:, offset:offset + n]
+            common = common & rooms_free[:, offset:offset + n]
+        starts[:, :n] = window & common.any(axis=2)
+        return starts
+
+    def _refresh(self, t: int) -> bool:
+        """Recompute the domain size of task t; False if it can no longer finish"""
+        if self.remaining[t] == 0:
+            return True
+        self.domain_counts[t] = int(self.domain(t).sum())
+        return self.domain_counts[t] >= self.remaining[t]
+
+    def _select_task(self) -> Optional[int]:
+        """MRV (least slack) with degree tie-breaking, or the configured alternative ordering"""
+        best, best_key = None, None
+        for t in range(len(self.tasks)):
+            if self.remaining[t] == 0:
+                continue
+            key = self.ordering(self.domain_counts[t] - self.remaining[t],
+                                len(self.neighbors[t]), self.remaining[t])
+            if best_key is None or key < best_key:
+                best, best_key = t, key
+        return best
+
+    def _order_values(self, t: int) -> List[int]:
+        """Candidate cells, spreading a subject's hours across days"""
+        cells = np.flatnonzero(self.domain(t)).tolist()
+        counts = self.day_counts[t]
+        if self.rng is not None:
+            jitter = {cell: self.rng.random() for cell in cells}
+            return sorted(cells, key=lambda c: (counts[c // self.n_slots], jitter[c]))
+        return sorted(cells, key=lambda c: (counts[c // self.n_slots], c))
+
+    def _assign(self, t: int, cell: int):
+        task = self.tasks[t]
+        block = self.blocks[t]
+        day_idx, slot_idx = divmod(cell, self.n_slots)
+        room_idx = self.grid.best_fit_room(day_idx, slot_idx, task['room_type'], length=block)
+        for offset in range(block):
+            self.grid.book(day_idx, slot_idx + offset, task['staff_id'], room_idx, task['section'])
+        self.staff_load[day_idx, self.grid.staff_index[task['staff_id']]] += block
+        self.day_counts[t][day_idx] += 1
+        self.remaining[t] -= 1
+        previous = self.last_cell[t]
+        self.last_cell[t] = cell
+        return (t, cell, room_idx, previous)
+
+    def _unassign(self, assignment):
+        t, cell, room_idx, previous = assignment
+        task = self.tasks[t]
+        block = self.blocks[t]
+        day_idx, slot_idx = divmod(cell, self.n_slots)
+        for offset in range(block):
+            self.grid.release(day_idx, slot_idx + offset, task['staff_id'], room_idx, task['section'])
+        self.staff_load[day_idx, self.grid.staff_index[task['staff_id']]] -= block
+        self.day_counts[t][day_idx] -= 1
+        self.remaining[t] += 1
+        self.last_cell[t] = previous
+
+    def _forward_check(self, t: int) -> bool:
+        ok = self._refresh(t)
+        for u in self.neighbors[t]:
+            ok = self._refresh(u) and ok
+        return ok
+
+    def _provably_incomplete(self) -> bool:
+        """Counting bound: some section, staff member or room type has more hours than free cells"""
+        demand = {}
+        for t, task in enumerate(self.tasks):
+            for key in (("section", task['section']), ("staff", task['staff_id']), ("room", task['room_type'])):
+                demand[key] = demand.get(key, 0) + self.remaining[t] * self.blocks[t]
+        grid = self.grid
+        for (kind, key), hours in demand.items():
+            if kind == "section":
+                capacity = int((~grid.section_busy[:, :, grid.section_index[key]]).sum())
+            elif kind == "staff":
+                capacity = int((~grid.staff_busy[:, :, grid.staff_index[key]]).sum())
+                if self.max_hours_per_day:
+                    capacity = min(capacity, len(grid.days) * self.max_hours_per_day)
+            else:
+                # A room type with no rooms at all has no capacity
+                counts = grid.free_rooms_count.get(key)
+                capacity = int(counts.sum()) if counts is not None else 0
+            if hours > capacity:
+                return True
+        return False
+
+    def _out_of_time(self, deadline: float) -> bool:
+        if time.monotonic() >= deadline:
+            return True
+        return bool(self.should_stop and self.should_stop())
+
+    def solve(self) -> Dict:
+        """Run the search and return placed entries plus unplaced hours"""
+        deadline = time.monotonic() + self.time_budget
+        unplaced = []
+
+        # Hours that cannot fit even in an empty week are reported up front; blocks fall back to single hours
+        t = 0
+        while t < len(self.tasks):
+            task = self.tasks[t]
+            available = int(self.domain(t).sum())
+            if available < self.remaining[t]:
+                if self.blocks[t] > 1:
+                    self._split_block(t, self.remaining[t] - available)
+                else:
+                    unplaced.append({"subject": task['subject'], "section": task['section'],
+                                     "hours": self.remaining[t] - available})
+                self.remaining[t] = available
+            t += 1
+        for t in range(len(self.tasks)):
+            self._refresh(t)
+
+        trail = self.placed
+        frames = []
+        best = []
+        total = sum(self.remaining)
+        timed_out = False
+        # Exhaustive search cannot succeed, so make a single forward-checked descent
+        allow_backtrack = not self._provably_incomplete()
+
+        t = self._select_task()
+        if t is not None:
+            frames.append((t, self._order_values(t), 0))
+
+        while frames:
+            if self._out_of_time(deadline):
+                timed_out = True
+                break
+            t, values, pos = frames.pop()
+            if pos >= len(values):
+                if not allow_backtrack:
+                    break
+                # Domain exhausted: undo the assignment that led here
+                if trail:
+                    undone = trail.pop()
+                    self._unassign(undone)
+                    self._forward_check(undone[0])
+                continue
+            frames.append((t, values, pos + 1))
+            self.nodes += 1
+            trail.append(self._assign(t, values[pos]))
+            if not self._forward_check(t):
+                self._unassign(trail.pop())
+                self._forward_check(t)
+                continue
+            if len(trail) > len(best):
+                best = list(trail)
+                if self.progress:
+                    self.progress({"placed_hours": sum(self.blocks[a[0]] for a in best),
+                                   "total_hours": sum(task['hours'] for task in self.tasks)})
+            if len(trail) == total:
+                break
+            nxt = self._select_task()
+            frames.append((nxt, self._order_values(nxt), 0))
+
+        complete = len(trail) == total
+        if not complete:
+            self._restore(best)
+            unplaced.extend(self._greedy_fill())
+
+        return {
+            "timetable": self.entries(),
+            "unplaced": self._merge_unplaced(unplaced),
+            "complete": not unplaced,
+            "timed_out": timed_out,
+            "nodes": self.nodes
+        }
+
+    def _restore(self, best):
+        """Roll the grid back to the deepest partial assignment seen"""
+        while self.placed:
+            self._unassign(self.placed.pop())
+        for t, cell, _, _ in best:
+            self.placed.append(self._assign(t, cell))
+
+    def _greedy_fill(self) -> List[Dict]:
+        """Place leftover hours first-fit without the ordering restriction
+
+        Blocks that no longer fit anywhere are split into single hours rather than dropped.
+        """
+        unplaced = []
+        t = 0
+        while t < len(self.tasks):
+            task = self.tasks[t]
+            while self.remaining[t] > 0:
+                self.last_cell[t] = -1
+                cells = np.flatnonzero(self.domain(t))
+                if len(cells) == 0:
+                    if self.blocks[t] > 1:
+                        self._split_block(t, self.remaining[t])
+                    else:
+                        unplaced.append({"subject": task['subject'], "section": task['section'],
+                                         "hours": self.remaining[t]})
+                    self.remaining[t] = 0
+                    break
+                self.placed.append(self._assign(t, int(cells[0])))
+            t += 1
+        return unplaced
+
+    def _split_block(self, t: int, units: int):
+        """Add a single-hour task for units blocks of task t that cannot be placed whole"""
+        single = dict(self.tasks[t], hours=units * self.blocks[t], block=1)
+        new = len(self.tasks)
+        self.tasks.append(single)
+        self.blocks.append(1)
+        self.remaining.append(single['hours'])
+        self.last_cell.append(-1)
+        self.day_counts.append([0] * len(self.grid.days))
+        self.domain_counts.append(0)
+        self.neighbors.append(self.neighbors[t] + [t])
+        for u in self.neighbors[new]:
+            self.neighbors[u].append(new)
+
+    def _merge_unplaced(self, unplaced: List[Dict]) -> List[Dict]:
+        merged = {}
+        for item in unplaced:
+            key = (item['subject']['id'], item['section'])
+            if key in merged:
+                merged[key]['hours'] += item['hours']
+            else:
+                merged[key] = dict(item)
+        return list(merged.values())
+
+    def entries(self) -> List[Dict]:
+        """Timetable entries for every booked task hour"""
+        entries = []
+        for t, cell, room_idx, _ in self.placed:
+            for offset in range(self.blocks[t]):
+                entries.append(self._entry(t, cell + offset, room_idx))
+        return entries
+
+    def _entry(self, t: int, cell: int, room_idx: int) -> Dict:
+        day_idx, slot_idx = divmod(cell, self.n_slots)
+        entry = self.grid.make_entry(day_idx, slot_idx, self.tasks[t]['subject'], room_idx, confidence=0.9)
+        if self.tasks[t]['section'] != "default":
+            entry['section'] = self.tasks[t]['section']
+        return entry
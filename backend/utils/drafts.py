@@ -0,0 +1,224 @@
+"""
+Sandbox ("what-if") timetable generation
+
+A draft is a timetable generated fully in memory for one department /
+semester / section and kept alongside the live one instead of replacing it.
+Each draft records the proposed entries, their score next to the live
+timetable's score, a compact diff (added, removed and moved entries) and a
+fingerprint of the live rows it was compared with. Committing a draft swaps
+the scope's rows in one transaction, and is refused when the live timetable
+changed after the draft was made.
+"""
+
+import os
+import threading
+import uuid
+from collections import Counter, OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from fastapi import HTTPException, status
+from sqlalchemy.orm import Session
+from backend.database.models import TimetableEntry
+from backend.schemas.schemas import TimetableGenerateRequest, TimetableResponse
+from backend.utils.ai_service import ai_service
+from backend.utils.generation import plan_scope_timetable, store_scope_timetable
+from backend.utils.occupancy import DAYS
+from backend.utils.timetable_data import entry_to_dict
+
+# Drafts kept in memory per process; the oldest are dropped first
+DRAFT_LIMIT = int(os.getenv("DRAFT_LIMIT", "50"))
+DRAFT_TTL_MINUTES = int(os.getenv("DRAFT_TTL_MINUTES", "120"))
+
+_CELL_FIELDS = ("day", "time_slot_id", "staff_id", "classroom_id")
+
+def _placement(entry: Dict) -> Tuple:
+    return (entry["subject_id"],) + tuple(entry[field] for field in _CELL_FIELDS)
+
+def live_entries(db: Session, department_id: int, semester: int, section: str) -> List[Dict]:
+    """Current entries of a scope"""
+    rows = db.query(TimetableEntry).filter(
+        TimetableEntry.department_id == department_id,
+        TimetableEntry.semester == semester,
+        TimetableEntry.section == section
+    ).order_by(TimetableEntry.id).all()
+    return [entry_to_dict(e) for e in rows]
+
+def live_fingerprint(entries: List[Dict]) -> Tuple:
+    """Identity of a scope's live rows; any insert, update or delete changes it"""
+    return tuple(sorted((e["id"],) + _placement(e) for e in entries))
+
+def timetable_diff(live: List[Dict], proposed: List[Dict]) -> Dict:
+    """Added, removed and moved entries turning the live timetable into the proposed one
+
+    Identical placements are unchanged; a subject hour that only changed day, slot,
+    staff or room is reported as moved rather than as a removal plus an addition.
+    """
+    common = Counter(_placement(e) for e in live) & Counter(_placement(e) for e in proposed)
+    kept = common.copy()
+    removed = []
+    for entry in live:
+        if kept[_placement(entry)]:
+            kept[_placement(entry)] -= 1
+        else:
+            removed.append(entry)
+    kept = common.copy()
+    added = []
+    for entry in proposed:
+        if kept[_placement(entry)]:
+            kept[_placement(entry)] -= 1
+        else:
+            added.append(entry)
+
+    # Pair leftover hours of the same subject as moves, in week order
+    day_rank = {day: i for i, day in enumerate(DAYS)}
+    order = lambda e: (day_rank.get(e["day"], len(DAYS)),) + _placement(e)[1:]
+    pending = {}
+    for entry in sorted(added, key=order):
+        pending.setdefault(entry["subject_id"], []).append(entry)
+    moved, still_removed = [], []
+    for entry in sorted(removed, key=order):
+        targets = pending.get(entry["subject_id"])
+        if not targets:
+            still_removed.append(entry)
+            continue
+        target = targets.pop(0)
+        moved.append({
+            "entry_id": entry["id"],
+            "subject_id": entry["subject_id"],
+            "from": {field: entry[field] for field in _CELL_FIELDS},
+            "to": {field: target[field] for field in _CELL_FIELDS}
+        })
+    still_added = [entry for targets in pending.values() for entry in targets]
+
+    return {
+        "added": [{"subject_id": e["subject_id"], **{f: e[f] for f in _CELL_FIELDS}} for e in still_added],
+        "removed": [{"entry_id": e["id"], "subject_id": e["subject_id"], **{f: e[f] for f in _CELL_FIELDS}}
+                    for e in still_removed],
+        "moved": moved,
+        "unchanged": sum(common.values())
+    }
+
+class TimetableDraft:
+    """A generated but uncommitted timetable for one scope"""
+
+    def __init__(self, request: TimetableGenerateRequest, owner: tuple, result: Dict,
+                 live: List[Dict], live_score: Optional[float]):
+        self.id = uuid.uuid4().hex
+        self.request = request
+        self.owner = owner
+        self.result = result
+        self.entries = [
+            {**{field: entry[field] for field in ("subject_id",) + _CELL_FIELDS},
+             "department_id": request.department_id, "semester": request.semester, "section": request.section}
+            for entry in result.get("timetable", [])
+        ]
+        self.base_fingerprint = live_fingerprint(live)
+        self.diff = timetable_diff(live, self.entries)
+        self.live_score = live_score
+        self.created_at = datetime.utcnow()
+        self.expires_at = self.created_at + timedelta(minutes=DRAFT_TTL_MINUTES)
+
+    def to_dict(self) -> Dict:
+        return {
+            "id": self.id,
+            "department_id": self.request.department_id,
+            "semester": self.request.semester,
+            "section": self.request.section,
+            "engine": self.request.engine,
+            "entries": self.entries,
+            "total_entries": len(self.entries),
+            "diff": self.diff,
+            "optimization_score": self.result.get("optimization_score"),
+            "live_score": self.live_score,
+            "score_breakdown": self.result.get("score_breakdown"),
+            "conflicts": self.result.get("conflicts", []),
+            "unplaced": self.result.get("unplaced", []),
+            "token_usage": self.result.get("token_usage"),
+            "repair_report": self.result.get("repair_report"),
+            "created_at": self.created_at,
+            "expires_at": self.expires_at
+        }
+
+class DraftStore:
+    """Keeps recent drafts in memory and commits them on request"""
+
+    def __init__(self):
+        self.drafts = OrderedDict()
+        self.lock = threading.Lock()
+
+    def create(self, db: Session, request: TimetableGenerateRequest, owner: tuple) -> TimetableDraft:
+        """Generate a draft against the current data without touching timetable_entries"""
+        result, inputs = plan_scope_timetable(db, request)
+        live = live_entries(db, request.department_id, request.semester, request.section)
+        live_score = None
+        if live:
+            live_score = ai_service.score_result(live, inputs["subjects"], inputs["classrooms"],
+                                                 inputs["time_slots"], inputs["constraints"])["optimization_score"]
+        draft = TimetableDraft(request, owner, result, live, live_score)
+        with self.lock:
+            self._prune()
+            self.drafts[draft.id] = draft
+        return draft
+
+    def get(self, draft_id: str) -> Optional[TimetableDraft]:
+        with self.lock:
+            self._prune()
+            return self.drafts.get(draft_id)
+
+    def list(self, owner: Optional[tuple] = None) -> List[TimetableDraft]:
+        with self.lock:
+            self._prune()
+            return [d for d in self.drafts.values() if owner is None or d.owner == owner]
+
+    def discard(self, draft_id: str) -> Optional[TimetableDraft]:
+        with self.lock:
+            return self.drafts.pop(draft_id, None)
+
+    def commit(self, db: Session, draft_id: str) -> TimetableResponse:
+        """Replace the live scope with the draft, if the live scope is still what the draft was diffed against"""
+        draft = self.discard(draft_id)
+        if draft is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Draft not found"
+            )
+        request = draft.request
+        live = live_entries(db, request.department_id, request.semester, request.section)
+        if live_fingerprint(live) != draft.base_fingerprint:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Live timetable changed since this draft was made; create a new draft"
+            )
+
+        try:
+            created_entries = store_scope_timetable(
+                db, request.department_id, request.semester, request.section, draft.entries,
+                clash_detail="Draft clashes with a booking made after it was generated; create a new draft"
+            )
+        except Exception as e:
+            # A clash can't be fixed by retrying the same draft; anything else can be retried
+            if not (isinstance(e, HTTPException) and e.status_code == status.HTTP_409_CONFLICT):
+                with self.lock:
+                    self.drafts[draft.id] = draft
+            raise
+
+        return TimetableResponse(
+            entries=created_entries,
+            total_entries=len(created_entries),
+            conflicts=draft.result.get("conflicts", []),
+            unplaced=draft.result.get("unplaced", []),
+            optimization_score=draft.result.get("optimization_score"),
+            score_breakdown=draft.result.get("score_breakdown"),
+            token_usage=draft.result.get("token_usage"),
+            repair_report=draft.result.get("repair_report")
+        )
+
+    def _prune(self):
+        """Drop expired drafts and the oldest beyond DRAFT_LIMIT"""
+        now = datetime.utcnow()
+        for draft_id in [i for i, d in self.drafts.items() if d.expires_at <= now]:
+            del self.drafts[draft_id]
+        while len(self.drafts) > DRAFT_LIMIT:
+            self.drafts.popitem(last=False)
+
+draft_store = DraftStore()
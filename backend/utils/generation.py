@@ -0,0 +1,143 @@
+"""
+Single-scope timetable generation shared by the HTTP endpoint and background jobs
+"""
+
+from typing import Callable, Dict, List, Optional, Tuple
+from fastapi import HTTPException, status
+from sqlalchemy.orm import Session
+from backend.database.models import TimetableEntry, Subject, Staff, Classroom, Department
+from backend.schemas.schemas import TimetableGenerateRequest, TimetableResponse
+from backend.utils.ai_service import ai_service, GENERATION_ENGINES
+from backend.utils.csp_solver import build_tasks
+from backend.utils.timetable_data import (
+    subject_to_dict, staff_to_dict, classroom_to_dict, default_constraints,
+    load_active_time_slots, load_section_strengths, load_outside_bookings, clash_guard, insert_entries
+)
+
+class GenerationCancelled(Exception):
+    """Raised when a generation is cancelled before its results are written"""
+
+def validate_generation_request(db: Session, request: TimetableGenerateRequest) -> List[Subject]:
+    """Reject unknown engines and empty scopes; returns the scope's assigned subjects"""
+    if request.engine and request.engine.lower() not in GENERATION_ENGINES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown engine. Choose one of: {', '.join(GENERATION_ENGINES)}"
+        )
+
+    # Validate department
+    department = db.query(Department).filter(Department.id == request.department_id).first()
+    if not department:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Department not found"
+        )
+
+    # Get required data
+    subjects = db.query(Subject).filter(
+        Subject.department_id == request.department_id,
+        Subject.semester == request.semester,
+        Subject.assigned_staff_id.isnot(None)
+    ).all()
+
+    if not subjects:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No assigned subjects found for this department and semester"
+        )
+    return subjects
+
+def plan_scope_timetable(db: Session,
+                         request: TimetableGenerateRequest,
+                         progress: Optional[Callable[[dict], None]] = None,
+                         should_stop: Optional[Callable[[], bool]] = None) -> Tuple[Dict, Dict]:
+    """Generate one department/semester/section timetable in memory without writing it
+
+    Returns the engine result and the inputs it was generated and scored from.
+    """
+    subjects = validate_generation_request(db, request)
+
+    staff = db.query(Staff).filter(Staff.department_id == request.department_id).all()
+    classrooms = db.query(Classroom).filter(
+        Classroom.department_id == request.department_id,
+        Classroom.is_available == True
+    ).all()
+
+    # Prepare data for AI
+    subjects_data = [subject_to_dict(s) for s in subjects]
+    staff_data = [staff_to_dict(s) for s in staff]
+    classrooms_data = [classroom_to_dict(c) for c in classrooms]
+    # Chronological order, so gap and back-to-back scoring see the real teaching day
+    time_slots_data = load_active_time_slots(db)
+    scope = (request.department_id, request.semester, request.section)
+    constraints = default_constraints(*scope, section_strength=load_section_strengths(db, [scope]).get(scope))
+    # Other sections' bookings of the same staff and rooms stay fixed
+    fixed_entries = load_outside_bookings(
+        db, request.department_id, request.semester, request.section,
+        [s.assigned_staff_id for s in subjects], [c.id for c in classrooms]
+    )
+    if progress:
+        progress({"total_hours": sum(task["hours"] for task in build_tasks(subjects_data))})
+
+    # Generate timetable using AI
+    ai_result = ai_service.generate_timetable_suggestions(
+        subjects_data, staff_data, classrooms_data, time_slots_data, constraints,
+        engine=request.engine, time_budget=request.time_budget,
+        progress=progress, should_stop=should_stop, fixed_entries=fixed_entries
+    )
+
+    inputs = {
+        "subjects": subjects_data,
+        "classrooms": classrooms_data,
+        "time_slots": time_slots_data,
+        "constraints": constraints
+    }
+    return ai_result, inputs
+
+def store_scope_timetable(db: Session, department_id: int, semester: int, section: str,
+                          timetable: List[Dict],
+                          clash_detail: str = "Generated timetable clashes with a booking made while it was generating; try again"
+                          ) -> List:
+    """Replace a scope's entries with the given timetable in one transaction"""
+    with clash_guard(db, clash_detail):
+        # Clear existing timetable for this department, semester, and section
+        db.query(TimetableEntry).filter(
+            TimetableEntry.department_id == department_id,
+            TimetableEntry.semester == semester,
+            TimetableEntry.section == section
+        ).delete()
+
+        # Create timetable entries; the rows come back with their ids
+        created_entries = insert_entries(db, [
+            dict(entry_data, department_id=department_id, semester=semester, section=section)
+            for entry_data in timetable
+        ])
+        db.commit()
+
+    return created_entries
+
+def generate_scope_timetable(db: Session,
+                             request: TimetableGenerateRequest,
+                             progress: Optional[Callable[[dict], None]] = None,
+                             should_stop: Optional[Callable[[], bool]] = None) -> TimetableResponse:
+    """Generate and store the timetable for one department/semester/section"""
+    ai_result, _ = plan_scope_timetable(db, request, progress, should_stop)
+
+    if should_stop and should_stop():
+        raise GenerationCancelled()
+    if progress:
+        progress({"score": ai_result.get("optimization_score")})
+
+    created_entries = store_scope_timetable(db, request.department_id, request.semester, request.section,
+                                            ai_result.get("timetable", []))
+
+    return TimetableResponse(
+        entries=created_entries,
+        total_entries=len(created_entries),
+        conflicts=ai_result.get("conflicts", []),
+        unplaced=ai_result.get("unplaced", []),
+        optimization_score=ai_result.get("optimization_score"),
+        score_breakdown=ai_result.get("score_breakdown"),
+        token_usage=ai_result.get("token_usage"),
+        repair_report=ai_result.get("repair_report")
+    )
@@ -0,0 +1,147 @@
+"""
+Background job queue for timetable generation
+
+Generations are queued on a small worker pool so the HTTP request returns a
+job id straight away. Each job runs in its own database session, reports
+progress (placed hours, score) while the solver works and can be cancelled;
+a cancelled job never writes to the database.
+"""
+
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Optional
+from fastapi import HTTPException
+from backend.database.database import SessionLocal
+from backend.schemas.schemas import TimetableGenerateRequest
+from backend.utils.generation import generate_scope_timetable, GenerationCancelled
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+
+# Finished jobs kept in memory for status and result lookups
+JOB_HISTORY = int(os.getenv("JOB_HISTORY", "100"))
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (COMPLETED, FAILED, CANCELLED)
+
+class GenerationJob:
+    """One queued timetable generation"""
+
+    def __init__(self, request: TimetableGenerateRequest, owner: tuple):
+        self.id = uuid.uuid4().hex
+        self.request = request
+        self.owner = owner
+        self.status = QUEUED
+        self.placed_hours = 0
+        self.total_hours = 0
+        self.score = None
+        self.result = None
+        self.error = None
+        self.created_at = datetime.utcnow()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+        self.future = None
+
+    def update_progress(self, progress: Dict):
+        """Progress callback handed to the generation engines"""
+        for field in ("placed_hours", "total_hours", "score"):
+            if progress.get(field) is not None:
+                setattr(self, field, progress[field])
+
+    def is_cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    def to_dict(self) -> Dict:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "department_id": self.request.department_id,
+            "semester": self.request.semester,
+            "section": self.request.section,
+            "engine": self.request.engine,
+            "placed_hours": self.placed_hours,
+            "total_hours": self.total_hours,
+            "score": self.score,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at
+        }
+
+class JobManager:
+    """Runs generation jobs on a thread pool and keeps recent jobs in memory"""
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers or JOB_WORKERS,
+                                           thread_name_prefix="timetable-job")
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+
+    def submit(self, request: TimetableGenerateRequest, owner: tuple) -> GenerationJob:
+        """Queue a generation and return its job immediately"""
+        job = GenerationJob(request, owner)
+        with self.lock:
+            self.jobs[job.id] = job
+            self._prune()
+        job.future = self.executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id: str) -> Optional[GenerationJob]:
+        return self.jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[GenerationJob]:
+        """Cancel a queued job outright, or ask a running one to stop"""
+        job = self.jobs.get(job_id)
+        if job is None or job.status in FINISHED:
+            return job
+        job.cancel_event.set()
+        if job.future is not None and job.future.cancel():
+            self._finish(job, CANCELLED)
+        return job
+
+    def _run(self, job: GenerationJob):
+        if job.is_cancelled():
+            self._finish(job, CANCELLED)
+            return
+        job.status = RUNNING
+        job.started_at = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            job.result = generate_scope_timetable(db, job.request, progress=job.update_progress,
+                                                  should_stop=job.is_cancelled)
+            job.placed_hours = max(job.placed_hours, job.result.total_entries)
+            self._finish(job, COMPLETED)
+        except GenerationCancelled:
+            db.rollback()
+            self._finish(job, CANCELLED)
+        except HTTPException as e:
+            db.rollback()
+            job.error = e.detail
+            self._finish(job, FAILED)
+        except Exception as e:
+            db.rollback()
+            print(f"❌ Timetable job {job.id} failed: {e}")
+            job.error = str(e)
+            self._finish(job, FAILED)
+        finally:
+            db.close()
+
+    def _finish(self, job: GenerationJob, status: str):
+        job.status = status
+        job.finished_at = datetime.utcnow()
+
+    def _prune(self):
+        """Drop the oldest finished jobs beyond JOB_HISTORY"""
+        finished = [job_id for job_id, job in self.jobs.items() if job.status in FINISHED]
+        for job_id in finished[:max(0, len(finished) - JOB_HISTORY)]:
+            del self.jobs[job_id]
+
+job_manager = JobManager()
@@ -0,0 +1,148 @@
+"""
+Persistent cache for LLM timetable responses
+
+Responses are keyed on a stable hash of the canonicalized problem (subjects,
+staff, rooms, slots, constraints) plus the provider and model, so pressing
+"regenerate" on an unchanged department reuses the previous answer instead of
+paying for another remote call. Entries expire after a TTL and the least
+recently used ones are evicted once the table grows past its size limit.
+"""
+
+import os
+import json
+import hashlib
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+from sqlalchemy import func
+from backend.database.database import SessionLocal
+from backend.database.models import LLMCacheEntry
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))  # seconds
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "500"))
+
+def _canonical(value):
+    """Sort dict keys and order lists independently of database row order"""
+    if isinstance(value, dict):
+        return {key: _canonical(value[key]) for key in sorted(value)}
+    if isinstance(value, (list, tuple)):
+        items = [_canonical(item) for item in value]
+        return sorted(items, key=lambda item: json.dumps(item, sort_keys=True, default=str))
+    return value
+
+def problem_hash(context: Dict, provider: str, model: str) -> str:
+    """Stable SHA-256 of the AI context and the model that answers it"""
+    payload = {"provider": provider, "model": model, "context": _canonical(context)}
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+class LLMResponseCache:
+    """SQL-backed response cache with TTL/size eviction and hit/miss counters"""
+
+    def __init__(self, session_factory=SessionLocal,
+                 ttl: int = LLM_CACHE_TTL,
+                 max_entries: int = LLM_CACHE_MAX_ENTRIES,
+                 enabled: bool = LLM_CACHE_ENABLED):
+        self.session_factory = session_factory
+        self.ttl = timedelta(seconds=ttl)
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def _count(self, hit: bool):
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Cached response for key, or None when missing or expired"""
+        if not self.enabled:
+            return None
+        db = self.session_factory()
+        try:
+            row = db.query(LLMCacheEntry).filter(LLMCacheEntry.cache_key == key).first()
+            now = datetime.utcnow()
+            if row is not None and now - row.created_at > self.ttl:
+                db.delete(row)
+                db.commit()
+                row = None
+            if row is None:
+                self._count(False)
+                return None
+            row.hits = (row.hits or 0) + 1
+            row.last_used_at = now
+            response = json.loads(row.response)
+            db.commit()
+            self._count(True)
+            return response
+        except Exception as e:
+            db.rollback()
+            print(f"⚠️ LLM cache lookup failed: {e}")
+            return None
+        finally:
+            db.close()
+
+    def put(self, key: str, provider: str, model: str, response: Dict):
+        """Store a response and evict expired or least recently used entries"""
+        if not self.enabled:
+            return
+        db = self.session_factory()
+        try:
+            now = datetime.utcnow()
+            db.merge(LLMCacheEntry(cache_key=key, provider=provider, model=model,
+                                   response=json.dumps(response), hits=0,
+                                   created_at=now, last_used_at=now))
+            db.flush()
+            db.query(LLMCacheEntry).filter(
+                LLMCacheEntry.created_at < now - self.ttl
+            ).delete(synchronize_session=False)
+            stale = db.query(LLMCacheEntry.cache_key).order_by(
+                LLMCacheEntry.last_used_at.desc()
+            ).offset(self.max_entries).all()
+            if stale:
+                db.query(LLMCacheEntry).filter(
+                    LLMCacheEntry.cache_key.in_([row.cache_key for row in stale])
+                ).delete(synchronize_session=False)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"⚠️ LLM cache write failed: {e}")
+        finally:
+            db.close()
+
+    def clear(self) -> int:
+        """Remove every cached response"""
+        db = self.session_factory()
+        try:
+            removed = db.query(LLMCacheEntry).delete(synchronize_session=False)
+            db.commit()
+            return removed
+        finally:
+            db.close()
+
+    def stats(self) -> Dict:
+        """Process hit/miss counters plus stored entry totals"""
+        db = self.session_factory()
+        try:
+            entries = db.query(LLMCacheEntry).count()
+            stored_hits = db.query(func.coalesce(func.sum(LLMCacheEntry.hits), 0)).scalar()
+        finally:
+            db.close()
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "entries": entries,
+            "stored_hits": stored_hits,
+            "max_entries": self.max_entries,
+            "ttl_seconds": int(self.ttl.total_seconds())
+        }
+
+llm_cache = LLMResponseCache()
@@ -0,0 +1,130 @@
+"""
+Validate-and-repair stage for LLM-generated timetables
+
+Every entry the model returns is checked against the occupancy grid in
+order: unknown ids, extra hours, staff/section clashes and the daily staff
+limit drop the entry; a wrong or double-booked room is swapped for a free
+room of the right type at the same cell. Hours that are still missing are
+filled by the constraint solver around the accepted entries, so a partly
+wrong answer keeps most of the model's work instead of being thrown away.
+"""
+
+import re
+import json
+from typing import List, Dict, Optional
+from backend.utils.occupancy import OccupancyGrid, required_room_type
+from backend.utils.csp_solver import CSPTimetableSolver, build_tasks
+
+VALIDATION_TIME_BUDGET = 2.0
+
+_ROW_PATTERN = re.compile(r"\[\s*(\d+)\s*,\s*(\d+)\s*,\s*(\d+)\s*,\s*(\d+)\s*\]")
+_FENCE_PATTERN = re.compile(r"^```(?:json)?\s*|\s*```$")
+
+def parse_llm_json(text: str) -> Dict:
+    """Parse a compact LLM answer, salvaging complete rows from truncated or malformed JSON"""
+    cleaned = _FENCE_PATTERN.sub("", (text or "").strip())
+    try:
+        result = json.loads(cleaned)
+        if isinstance(result, dict):
+            return result
+    except ValueError:
+        pass
+    rows = [[int(value) for value in match] for match in _ROW_PATTERN.findall(cleaned)]
+    if not rows:
+        raise ValueError("LLM response contains no timetable rows")
+    return {"t": rows, "c": [], "s": [], "partial": True}
+
+def _as_int(value) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def validate_and_repair(timetable: List[Dict],
+                        subjects: List[Dict],
+                        staff: List[Dict],
+                        classrooms: List[Dict],
+                        time_slots: List[Dict],
+                        constraints: Dict,
+                        time_budget: float = VALIDATION_TIME_BUDGET,
+                        fixed_entries: List[Dict] = ()) -> Dict:
+    """Keep valid LLM entries, repair rooms, drop the rest and fill missing hours"""
+    grid = OccupancyGrid.for_subjects(subjects, staff, classrooms, time_slots)
+    for entry in fixed_entries:
+        grid.block_entry(entry)
+    subjects_by_id = {s['id']: s for s in subjects if s.get('assigned_staff_id')}
+    # LLM rows are single hours, so practical hours are checked and filled hour by hour
+    remaining = {task['subject']['id']: task['hours'] for task in build_tasks(subjects, lab_blocks=False)}
+    max_hours_per_day = constraints.get("max_hours_per_day")
+    section_strength = constraints.get("section_strength")
+
+    kept, repaired, dropped = [], [], []
+    for entry in timetable:
+        subject = subjects_by_id.get(_as_int(entry.get('subject_id')))
+        if subject is None:
+            dropped.append(f"Unknown subject {entry.get('subject_id')}")
+            continue
+        code = subject['code']
+        cell = grid.cell_of({"day": entry.get('day'), "time_slot_id": _as_int(entry.get('time_slot_id'))})
+        if cell is None:
+            dropped.append(f"{code}: unknown day/time slot {entry.get('day')} {entry.get('time_slot_id')}")
+            continue
+        where = f"{code} on {grid.days[cell[0]]} slot {grid.slot_ids[cell[1]]}"
+        if remaining.get(subject['id'], 0) <= 0:
+            dropped.append(f"{where}: more hours than the subject needs")
+            continue
+
+        staff_id = subject['assigned_staff_id']
+        if _as_int(entry.get('staff_id')) != staff_id:
+            repaired.append(f"{where}: staff corrected to assigned staff {staff_id}")
+        staff_idx = grid.staff_index[staff_id]
+        if grid.staff_busy[cell[0], cell[1], staff_idx]:
+            dropped.append(f"{where}: staff {staff_id} already teaching")
+            continue
+        if grid.section_busy[cell[0], cell[1], grid.section_index["default"]]:
+            dropped.append(f"{where}: section already has a class")
+            continue
+        if max_hours_per_day and grid.staff_busy[cell[0], :, staff_idx].sum() >= max_hours_per_day:
+            dropped.append(f"{where}: staff {staff_id} over {max_hours_per_day} hours that day")
+            continue
+
+        room_type = required_room_type(subject)
+        room_key = grid.sized_room_key(room_type, section_strength)
+        room_idx = grid.room_index.get(_as_int(entry.get('classroom_id')))
+        if room_idx is None or not grid.room_mask(room_key)[room_idx] or grid.room_busy[cell[0], cell[1], room_idx]:
+            room_idx = grid.best_fit_room(cell[0], cell[1], room_key)
+            if room_idx is None:
+                dropped.append(f"{where}: no free {room_type or 'room'}")
+                continue
+            repaired.append(f"{where}: room {entry.get('classroom_id')} replaced by {grid.classrooms[room_idx]['id']}")
+
+        grid.book(cell[0], cell[1], staff_id, room_idx)
+        remaining[subject['id']] -= 1
+        kept.append(grid.make_entry(cell[0], cell[1], subject, room_idx,
+                                    confidence=entry.get('confidence', 0.9)))
+
+    # Fill the hours the model skipped or that had to be dropped
+    tasks = []
+    for task in build_tasks(subjects, min_capacity=section_strength, lab_blocks=False):
+        task['hours'] = remaining[task['subject']['id']]
+        if task['hours'] > 0:
+            tasks.append(task)
+    filled, unplaced = [], []
+    if tasks:
+        result = CSPTimetableSolver(grid, tasks, max_hours_per_day=max_hours_per_day,
+                                    time_budget=time_budget).solve()
+        filled = result['timetable']
+        unplaced = result['unplaced']
+
+    return {
+        "timetable": kept + filled,
+        "unplaced": unplaced,
+        "report": {
+            "llm_entries": len(timetable),
+            "kept": len(kept),
+            "repaired": repaired,
+            "dropped": dropped,
+            "filled": len(filled),
+            "unplaced_hours": sum(item['hours'] for item in unplaced)
+        }
+    }
@@ -0,0 +1,332 @@
+"""
+Anytime local-search optimizer for generated timetables
+
+Simulated annealing over move (entry to another day/slot) and swap (two
+entries of one section exchange cells) neighbourhoods. Hard constraints
+are kept by the OccupancyGrid, plus the max_hours_per_day limit on each
+staff member's daily load, as in the CSP solver; soft-constraint cost is tracked per
+(staff, day) and (section, day) so every candidate move is evaluated
+from the handful of keys it touches. Contiguous lab blocks only move as a
+whole, to another run of contiguous slots in a single room.
+"""
+
+import math
+import time
+import random
+from typing import List, Dict, Optional, Iterable
+from backend.utils.occupancy import OccupancyGrid, LAB_ROOM_TYPE
+from backend.utils.slot_intervals import SlotIntervals
+from backend.utils.scoring import (
+    WEIGHTS, MAX_CONSECUTIVE_HOURS, afternoon_slot_flags, score_timetable
+)
+
+DEFAULT_TIME_BUDGET = 2.0
+
+def gaps_in(mask: int) -> int:
+    """Free slots between the first and last busy slot of a day bitmask"""
+    if mask == 0:
+        return 0
+    low = (mask & -mask).bit_length() - 1
+    return mask.bit_length() - low - bin(mask).count("1")
+
+def longest_run(mask: int) -> int:
+    """Longest run of consecutive busy slots in a day bitmask"""
+    run = 0
+    while mask:
+        mask &= mask >> 1
+        run += 1
+    return run
+
+class TimetableAnnealer:
+    """Simulated annealing with incremental (delta) cost evaluation"""
+
+    def __init__(self,
+                 entries: List[Dict],
+                 time_slots: List[Dict],
+                 classrooms: List[Dict],
+                 fixed_entries: Iterable[Dict] = (),
+                 constraints: Optional[Dict] = None,
+                 weights: Optional[Dict] = None,
+                 seed: Optional[int] = None,
+                 block_hours: Optional[Dict[int, int]] = None):
+        self.entries = [dict(entry) for entry in entries]
+        self.weights = dict(WEIGHTS, **(weights or {}))
+        self.constraints = constraints
+        self.max_consecutive = (constraints or {}).get("max_consecutive_hours", MAX_CONSECUTIVE_HOURS)
+        self.max_hours_per_day = (constraints or {}).get("max_hours_per_day")
+        self.rng = random.Random(seed)
+
+        fixed_entries = list(fixed_entries)
+        staff_ids = [e['staff_id'] for e in self.entries] + [e['staff_id'] for e in fixed_entries]
+        sections = [e.get('section', "default") for e in self.entries]
+        self.grid = OccupancyGrid(time_slots, staff_ids, classrooms, sections=sections)
+        self.afternoon = afternoon_slot_flags(self.grid.time_slots, constraints)
+        self.n_slots = len(self.grid.slot_ids)
+
+        for entry in fixed_entries:
+            self.grid.block_entry(entry)
+
+        # Entry positions as (day_idx, slot_idx, room_idx); entries off the grid stay where they are
+        self.positions = []
+        self.movable = []
+        for i, entry in enumerate(self.entries):
+            cell = self.grid.cell_of(entry)
+            room_idx = self.grid.room_index.get(entry['classroom_id'])
+            if cell is not None and room_idx is not None and self.grid.book_entry(entry, self._section(i)):
+                self.positions.append((cell[0], cell[1], room_idx))
+                self.movable.append(i)
+            else:
+                self.positions.append(None)
+
+        self.room_types = [room.get('room_type') or "Theory" for room in self.grid.classrooms]
+        self.block_of = {}
+        if block_hours:
+            self.intervals = SlotIntervals(self.grid.time_slots, (constraints or {}).get("lunch_break"))
+            for block in self._lab_blocks(block_hours):
+                for i in block:
+                    self.block_of[i] = block
+        self.by_section = {}
+        for i in self.movable:
+            if i not in self.block_of:
+                self.by_section.setdefault(self._section(i), []).append(i)
+
+        # Even spread of each staff member's weekly hours; moves never change the totals
+        weekly = {}
+        for i in self.movable:
+            weekly[self.entries[i]['staff_id']] = weekly.get(self.entries[i]['staff_id'], 0) + 1
+        self.daily_target = {staff_id: math.ceil(hours / len(self.grid.days)) for staff_id, hours in weekly.items()}
+
+        # Day bitmasks per (staff, day) and (section, day)
+        self.staff_masks = {}
+        self.section_masks = {}
+        for i in self.movable:
+            self._toggle(i, self.positions[i])
+        self.cost = self.total_cost()
+
+    def _lab_blocks(self, block_hours: Dict[int, int]) -> List[tuple]:
+        """Practical blocks: block_hours[subject] contiguous entries of one subject and section in one lab"""
+        cells = {}
+        for i in self.movable:
+            day_idx, slot_idx, room_idx = self.positions[i]
+            if self.room_types[room_idx] == LAB_ROOM_TYPE:
+                key = (self.entries[i]['subject_id'], self._section(i), day_idx, room_idx)
+                cells.setdefault(key, {})[slot_idx] = i
+        blocks = []
+        for (subject_id, _, _, _), slots in cells.items():
+            length = block_hours.get(subject_id, 0)
+            if length < 2:
+                continue
+            for slot_idx in sorted(slots):
+                if slot_idx - 1 in slots and self.intervals.adjacent[slot_idx - 1]:
+                    continue
+                run = [slots[slot_idx]]
+                while slot_idx + 1 in slots and self.intervals.adjacent[slot_idx]:
+                    slot_idx += 1
+                    run.append(slots[slot_idx])
+                # A longer run also holds single (theory) hours; only whole blocks are kept together
+                blocks.extend(tuple(run[k:k + length]) for k in range(0, len(run) - length + 1, length))
+        return blocks
+
+    def _section(self, i: int):
+        return self.entries[i].get('section', "default")
+
+    def _toggle(self, i: int, position):
+        day_idx, slot_idx, _ = position
+        bit = 1 << slot_idx
+        staff_key = (self.entries[i]['staff_id'], day_idx)
+        section_key = (self._section(i), day_idx)
+        self.staff_masks[staff_key] = self.staff_masks.get(staff_key, 0) ^ bit
+        self.section_masks[section_key] = self.section_masks.get(section_key, 0) ^ bit
+
+    def _staff_cost(self, key) -> float:
+        mask = self.staff_masks.get(key, 0)
+        excess = max(0, bin(mask).count("1") - self.daily_target.get(key[0], 0))
+        over = max(0, longest_run(mask) - self.max_consecutive)
+        return (self.weights["staff_gaps"] * gaps_in(mask) +
+                self.weights["load_imbalance"] * excess * excess +
+                self.weights["back_to_back"] * over)
+
+    def _staff_load(self, key) -> int:
+        """Hours booked for (staff, day), fixed entries included"""
+        staff_id, day_idx = key
+        return int(self.grid.staff_busy[day_idx, :, self.grid.staff_index[staff_id]].sum())
+
+    def _section_cost(self, key) -> float:
+        return self.weights["section_gaps"] * gaps_in(self.section_masks.get(key, 0))
+
+    def _entry_cost(self, i: int, position) -> float:
+        day_idx, slot_idx, room_idx = position
+        if self.room_types[room_idx] == LAB_ROOM_TYPE and not self.afternoon[slot_idx]:
+            return self.weights["labs_outside_afternoon"]
+        return 0.0
+
+    def total_cost(self) -> float:
+        """Full cost from the shared vectorized objective; deltas are tracked per key afterwards"""
+        return self.score(self.positions)["cost"]
+
+    def score(self, positions) -> Dict:
+        """Vectorized score and component breakdown of the movable entries at the given positions"""
+        placed = [dict(self.entries[i], day=self.grid.days[positions[i][0]],
+                       time_slot_id=self.grid.slot_ids[positions[i][1]],
+                       classroom_id=self.grid.classrooms[positions[i][2]]['id'])
+                  for i in self.movable]
+        return score_timetable(placed, self.grid.time_slots, self.grid.classrooms,
+                               constraints=self.constraints, weights=self.weights, days=self.grid.days)
+
+    def _local_cost(self, indices, days) -> float:
+        """Cost of the keys touched by a move"""
+        staff_keys = {(self.entries[i]['staff_id'], d) for i in indices for d in days}
+        section_keys = {(self._section(i), d) for i in indices for d in days}
+        cost = sum(self._staff_cost(key) for key in staff_keys)
+        cost += sum(self._section_cost(key) for key in section_keys)
+        cost += sum(self._entry_cost(i, self.positions[i]) for i in indices)
+        return cost
+
+    def _pick_room(self, i: int, day_idx: int, slot_idx: int, current_room: int, length: int = 1) -> Optional[int]:
+        """Keep the current room when free, else the smallest free room of the same type that seats as many"""
+        if not self.grid.room_busy[day_idx, slot_idx:slot_idx + length, current_room].any():
+            return current_room
+        return self.grid.best_fit_room(day_idx, slot_idx, self.room_types[current_room],
+                                       int(self.grid.capacities[current_room]), length=length)
+
+    def _relocate(self, moves, same_room: bool = False) -> Optional[float]:
+        """Apply [(entry, new_cell)] if feasible; returns cost delta or None (state unchanged)
+
+        With same_room, the moves are one block on consecutive slots and share a single room.
+        """
+        indices = [i for i, _ in moves]
+        old = {i: self.positions[i] for i in indices}
+        days = {old[i][0] for i in indices} | {cell[0] for _, cell in moves}
+        before = self._local_cost(indices, days)
+        # A day may not go over max_hours_per_day, nor further over it when it already was
+        load_keys = {(self.entries[i]['staff_id'], d) for i in indices for d in days} if self.max_hours_per_day else ()
+        loads_before = {key: self._staff_load(key) for key in load_keys}
+
+        for i in indices:
+            self.grid.release(old[i][0], old[i][1], self.entries[i]['staff_id'], old[i][2], self._section(i))
+            self._toggle(i, old[i])
+
+        placed = []
+        feasible = True
+        for i, (day_idx, slot_idx) in moves:
+            staff_idx = self.grid.staff_index[self.entries[i]['staff_id']]
+            section_idx = self.grid.section_index[self._section(i)]
+            room_idx = None
+            if not (self.grid.staff_busy[day_idx, slot_idx, staff_idx] or
+                    self.grid.section_busy[day_idx, slot_idx, section_idx]):
+                if not same_room:
+                    room_idx = self._pick_room(i, day_idx, slot_idx, old[i][2])
+                elif not placed:
+                    room_idx = self._pick_room(i, day_idx, slot_idx, old[i][2], length=len(moves))
+                elif not self.grid.room_busy[day_idx, slot_idx, self.positions[placed[0]][2]]:
+                    room_idx = self.positions[placed[0]][2]
+            if room_idx is None:
+                feasible = False
+                break
+            position = (day_idx, slot_idx, room_idx)
+            self.grid.book(day_idx, slot_idx, self.entries[i]['staff_id'], room_idx, self._section(i))
+            self._toggle(i, position)
+            self.positions[i] = position
+            placed.append(i)
+
+        if feasible and any(self._staff_load(key) > max(self.max_hours_per_day, loads_before[key])
+                            for key in load_keys):
+            feasible = False
+
+        if not feasible:
+            for i in placed:
+                self._undo_one(i)
+            for i in indices:
+                self.positions[i] = old[i]
+                self.grid.book(old[i][0], old[i][1], self.entries[i]['staff_id'], old[i][2], self._section(i))
+                self._toggle(i, old[i])
+            return None
+
+        self._last_move = old
+        return self._local_cost(indices, days) - before
+
+    def _undo_one(self, i: int):
+        position = self.positions[i]
+        self.grid.release(position[0], position[1], self.entries[i]['staff_id'], position[2], self._section(i))
+        self._toggle(i, position)
+
+    def _revert(self):
+        old = self._last_move
+        for i in old:
+            self._undo_one(i)
+        for i, position in old.items():
+            self.positions[i] = position
+            self.grid.book(position[0], position[1], self.entries[i]['staff_id'], position[2], self._section(i))
+            self._toggle(i, position)
+
+    def _propose(self) -> Optional[float]:
+        i = self.rng.choice(self.movable)
+        block = self.block_of.get(i)
+        if block is not None:
+            day_idx = self.rng.randrange(len(self.grid.days))
+            slot_idx = self.rng.randrange(self.n_slots)
+            if (day_idx, slot_idx) == self.positions[block[0]][:2] or \
+                    not self.intervals.can_start_block(slot_idx, len(block)):
+                return None
+            return self._relocate([(j, (day_idx, slot_idx + k)) for k, j in enumerate(block)], same_room=True)
+        if self.rng.random() < 0.5:
+            cell = (self.rng.randrange(len(self.grid.days)), self.rng.randrange(self.n_slots))
+            if cell == self.positions[i][:2]:
+                return None
+            return self._relocate([(i, cell)])
+        j = self.rng.choice(self.by_section[self._section(i)])
+        if i == j or self.positions[i][:2] == self.positions[j][:2]:
+            return None
+        return self._relocate([(i, self.positions[j][:2]), (j, self.positions[i][:2])])
+
+    def run(self, time_budget: float = DEFAULT_TIME_BUDGET, should_stop=None) -> Dict:
+        """Anneal until the wall-clock budget is spent; returns the best timetable found"""
+        start_positions = list(self.positions)
+        best_cost = self.cost
+        best_positions = list(self.positions)
+        iterations = accepted = 0
+
+        if self.movable:
+            start = time.monotonic()
+            t_start, t_end = 2.0, 0.01
+            while True:
+                elapsed = time.monotonic() - start
+                if elapsed >= time_budget or (should_stop and should_stop()):
+                    break
+                temperature = t_start * (t_end / t_start) ** (elapsed / time_budget)
+                iterations += 1
+                delta = self._propose()
+                if delta is None:
+                    continue
+                if delta <= 0 or self.rng.random() < math.exp(-delta / temperature):
+                    self.cost += delta
+                    accepted += 1
+                    if self.cost < best_cost - 1e-9:
+                        best_cost = self.cost
+                        best_positions = list(self.positions)
+                else:
+                    self._revert()
+
+        timetable = []
+        for i, entry in enumerate(self.entries):
+            position = best_positions[i]
+            if position is not None:
+                entry = dict(entry,
+                             day=self.grid.days[position[0]],
+                             time_slot_id=self.grid.slot_ids[position[1]],
+                             classroom_id=self.grid.classrooms[position[2]]['id'])
+            timetable.append(entry)
+
+        # Report exact scores rather than the accumulated deltas
+        before = self.score(start_positions)
+        after = self.score(best_positions)
+        return {
+            "timetable": timetable,
+            "cost_before": before["cost"],
+            "cost_after": after["cost"],
+            "score_before": before["score"],
+            "score_after": after["score"],
+            "score_breakdown": after["components"],
+            "iterations": iterations,
+            "accepted_moves": accepted
+        }
@@ -0,0 +1,249 @@
+"""
+Dense occupancy engine for timetable generation
+
+Staff, classrooms and sections are tracked as boolean arrays indexed by
+(day, slot, resource) so that feasibility checks are vectorized ANDs
+instead of Python scans over lists of bookings. Free rooms per cell are
+also kept as capacity-sorted lists, so the smallest room that seats a
+section is found by binary search.
+"""
+
+import bisect
+from typing import List, Dict, Optional, Iterable
+import numpy as np
+
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+
+# Room type required by subjects with practical hours
+LAB_ROOM_TYPE = "Lab"
+
+def required_room_type(subject: Dict) -> Optional[str]:
+    """Room type a subject must be scheduled in (None means any room)"""
+    return LAB_ROOM_TYPE if subject.get('practical_hours', 0) > 0 else None
+
+def seating_requirement(min_capacity: Optional[int], capacities: Iterable[int]) -> int:
+    """Seats a room needs for a section of min_capacity (0 for no requirement)
+
+    Capped at the largest of capacities, so a section larger than every
+    suitable room still gets the biggest ones instead of none.
+    """
+    capacities = [int(capacity) for capacity in capacities]
+    if not min_capacity or not capacities:
+        return 0
+    return max(0, min(int(min_capacity), max(capacities)))
+
+class OccupancyGrid:
+    """Day x slot x resource occupancy for staff, classrooms and sections"""
+
+    def __init__(self,
+                 time_slots: List[Dict],
+                 staff_ids: Iterable[int],
+                 classrooms: List[Dict],
+                 sections: Iterable = ("default",),
+                 days: List[str] = DAYS):
+        self.days = list(days)
+        self.time_slots = list(time_slots)
+        self.slot_ids = [slot['id'] for slot in self.time_slots]
+        self.staff_ids = list(dict.fromkeys(staff_ids))
+        self.classrooms = list(classrooms)
+        self.sections = list(dict.fromkeys(sections))
+
+        self.day_index = {day: i for i, day in enumerate(self.days)}
+        self.slot_index = {slot_id: i for i, slot_id in enumerate(self.slot_ids)}
+        self.staff_index = {staff_id: i for i, staff_id in enumerate(self.staff_ids)}
+        self.room_index = {room['id']: i for i, room in enumerate(self.classrooms)}
+        self.section_index = {section: i for i, section in enumerate(self.sections)}
+
+        shape = (len(self.days), len(self.slot_ids))
+        self.staff_busy = np.zeros(shape + (len(self.staff_ids),), dtype=bool)
+        self.room_busy = np.zeros(shape + (len(self.classrooms),), dtype=bool)
+        self.section_busy = np.zeros(shape + (len(self.sections),), dtype=bool)
+
+        # Precomputed room masks per room type; None selects every available room
+        room_types = np.array([room.get('room_type') or "Theory" for room in self.classrooms], dtype=object)
+        available = np.array([room.get('is_available', True) for room in self.classrooms], dtype=bool)
+        self.room_masks = {None: available}
+        for room_type in set(room_types.tolist()):
+            self.room_masks[room_type] = available & (room_types == room_type)
+
+        # Free room counts per (day, slot) for each mask, kept in sync on book/release
+        self.free_rooms_count = {
+            room_type: np.full(shape, int(mask.sum()), dtype=np.int32)
+            for room_type, mask in self.room_masks.items()
+        }
+
+        # Capacity index: (room key, day, slot) -> sorted [(tier, capacity, room_idx)] of free rooms,
+        # built on first use; labs are tier 1 so rooms open to any subject are only given one when nothing else fits
+        self.capacities = np.array([room.get('capacity') or 0 for room in self.classrooms], dtype=np.int64)
+        self.room_tiers = (room_types == LAB_ROOM_TYPE).astype(np.int64)
+        self.free_by_capacity = {}
+
+    def add_room_group(self, key, room_ids: Iterable[int], room_type: Optional[str] = None):
+        """Register a room mask restricted to a subset of rooms (e.g. one department's rooms)"""
+        if key not in self.room_masks:
+            ids = set(room_ids)
+            in_group = np.array([room['id'] in ids for room in self.classrooms], dtype=bool)
+            mask = self.room_mask(room_type) & in_group
+            self.room_masks[key] = mask
+            self.free_rooms_count[key] = (mask & ~self.room_busy).sum(axis=2).astype(np.int32)
+        return key
+
+    def sized_room_key(self, room_type=None, min_capacity: Optional[int] = None):
+        """Room key restricted to rooms of room_type (or a room group) seating min_capacity
+
+        The requirement is capped as in seating_requirement.
+        """
+        base = self.room_mask(room_type)
+        min_capacity = seating_requirement(min_capacity, self.capacities[base])
+        if min_capacity <= 0:
+            return room_type
+        key = ("capacity", room_type, min_capacity)
+        if key not in self.room_masks:
+            mask = base & (self.capacities >= min_capacity)
+            self.room_masks[key] = mask
+            self.free_rooms_count[key] = (mask & ~self.room_busy).sum(axis=2).astype(np.int32)
+        return key
+
+    def rooms_overlap(self, key_a, key_b) -> bool:
+        """Whether two room masks share at least one room"""
+        return bool(np.any(self.room_mask(key_a) & self.room_mask(key_b)))
+
+    @property
+    def shape(self):
+        """(days, slots) shape of the grid"""
+        return (len(self.days), len(self.slot_ids))
+
+    def room_mask(self, room_type: Optional[str] = None) -> np.ndarray:
+        """Boolean mask of rooms usable for the given room type"""
+        mask = self.room_masks.get(room_type)
+        if mask is None:
+            return np.zeros(len(self.classrooms), dtype=bool)
+        return mask
+
+    def feasible_cells(self, staff_id: int, room_type: Optional[str] = None, section="default") -> np.ndarray:
+        """(days, slots) mask of cells where staff, section and a suitable room are all free"""
+        cells = ~self.staff_busy[:, :, self.staff_index[staff_id]]
+        cells &= ~self.section_busy[:, :, self.section_index[section]]
+        counts = self.free_rooms_count.get(room_type)
+        if counts is None:
+            return np.zeros(self.shape, dtype=bool)
+        cells &= counts > 0
+        return cells
+
+    def free_rooms(self, day_idx: int, slot_idx: int, room_type: Optional[str] = None) -> np.ndarray:
+        """Indices of suitable rooms free at a cell, in classroom list order"""
+        return np.flatnonzero(self.room_mask(room_type) & ~self.room_busy[day_idx, slot_idx])
+
+    def _free_list(self, room_type, day_idx: int, slot_idx: int) -> List:
+        index_key = (room_type, day_idx, slot_idx)
+        free = self.free_by_capacity.get(index_key)
+        if free is None:
+            rooms = self.free_rooms(day_idx, slot_idx, room_type)
+            free = sorted(self._capacity_item(i) for i in rooms)
+            self.free_by_capacity[index_key] = free
+        return free
+
+    def _capacity_item(self, room_idx: int):
+        return (int(self.room_tiers[room_idx]), int(self.capacities[room_idx]), int(room_idx))
+
+    def best_fit_room(self, day_idx: int, slot_idx: int, room_type=None, min_capacity: int = 0,
+                      length: int = 1) -> Optional[int]:
+        """Smallest free suitable room seating at least min_capacity (non-lab rooms first), or None
+
+        With length > 1 the room must also be free for the following length - 1 slots.
+        """
+        free = self._free_list(room_type, day_idx, slot_idx)
+        for tier in (0, 1):
+            i = bisect.bisect_left(free, (tier, min_capacity, -1))
+            while i < len(free) and free[i][0] == tier:
+                room_idx = free[i][2]
+                if length == 1 or not self.room_busy[day_idx, slot_idx:slot_idx + length, room_idx].any():
+                    return room_idx
+                i += 1
+        return None
+
+    def is_free(self, day_idx: int, slot_idx: int, staff_id: int, room_idx: int, section="default") -> bool:
+        """Check that staff, room and section are all free at a cell"""
+        return not (self.staff_busy[day_idx, slot_idx, self.staff_index[staff_id]] or
+                    self.room_busy[day_idx, slot_idx, room_idx] or
+                    self.section_busy[day_idx, slot_idx, self.section_index[section]])
+
+    def _update_room_counts(self, day_idx: int, slot_idx: int, room_idx: int, delta: int):
+        item = self._capacity_item(room_idx)
+        for room_type, mask in self.room_masks.items():
+            if mask[room_idx]:
+                self.free_rooms_count[room_type][day_idx, slot_idx] += delta
+                free = self.free_by_capacity.get((room_type, day_idx, slot_idx))
+                if free is None:
+                    continue
+                if delta < 0:
+                    del free[bisect.bisect_left(free, item)]
+                else:
+                    bisect.insort(free, item)
+
+    def book(self, day_idx: int, slot_idx: int, staff_id: int, room_idx: int, section="default"):
+        """Mark staff, room and section as busy at a cell"""
+        self.staff_busy[day_idx, slot_idx, self.staff_index[staff_id]] = True
+        self.section_busy[day_idx, slot_idx, self.section_index[section]] = True
+        if not self.room_busy[day_idx, slot_idx, room_idx]:
+            self.room_busy[day_idx, slot_idx, room_idx] = True
+            self._update_room_counts(day_idx, slot_idx, room_idx, -1)
+
+    def release(self, day_idx: int, slot_idx: int, staff_id: int, room_idx: int, section="default"):
+        """Free staff, room and section at a cell"""
+        self.staff_busy[day_idx, slot_idx, self.staff_index[staff_id]] = False
+        self.section_busy[day_idx, slot_idx, self.section_index[section]] = False
+        if self.room_busy[day_idx, slot_idx, room_idx]:
+            self.room_busy[day_idx, slot_idx, room_idx] = False
+            self._update_room_counts(day_idx, slot_idx, room_idx, 1)
+
+    def cell_of(self, entry: Dict):
+        """(day_idx, slot_idx) of a timetable entry, or None if outside the grid"""
+        day_idx = self.day_index.get(entry['day'])
+        slot_idx = self.slot_index.get(entry['time_slot_id'])
+        if day_idx is None or slot_idx is None:
+            return None
+        return day_idx, slot_idx
+
+    def book_entry(self, entry: Dict, section="default") -> bool:
+        """Book an existing timetable entry; returns False if it clashes or is off-grid"""
+        cell = self.cell_of(entry)
+        room_idx = self.room_index.get(entry['classroom_id'])
+        if cell is None or room_idx is None or entry['staff_id'] not in self.staff_index:
+            return False
+        if not self.is_free(cell[0], cell[1], entry['staff_id'], room_idx, section):
+            return False
+        self.book(cell[0], cell[1], entry['staff_id'], room_idx, section)
+        return True
+
+    def block_entry(self, entry: Dict):
+        """Reserve the staff member and room of a booking that is not being rescheduled"""
+        cell = self.cell_of(entry)
+        if cell is None:
+            return
+        staff_idx = self.staff_index.get(entry['staff_id'])
+        if staff_idx is not None:
+            self.staff_busy[cell[0], cell[1], staff_idx] = True
+        room_idx = self.room_index.get(entry['classroom_id'])
+        if room_idx is not None and not self.room_busy[cell[0], cell[1], room_idx]:
+            self.room_busy[cell[0], cell[1], room_idx] = True
+            self._update_room_counts(cell[0], cell[1], room_idx, -1)
+
+    def make_entry(self, day_idx: int, slot_idx: int, subject: Dict, room_idx: int, confidence: float = 0.8) -> Dict:
+        """Build a timetable entry dict for a booked cell"""
+        return {
+            "day": self.days[day_idx],
+            "time_slot_id": self.slot_ids[slot_idx],
+            "subject_id": subject['id'],
+            "staff_id": subject['assigned_staff_id'],
+            "classroom_id": self.classrooms[room_idx]['id'],
+            "confidence": confidence
+        }
+
+    @classmethod
+    def for_subjects(cls, subjects: List[Dict], staff: List[Dict], classrooms: List[Dict],
+                     time_slots: List[Dict], sections: Iterable = ("default",), days: List[str] = DAYS):
+        """Build a grid covering the listed staff plus every staff member assigned to a subject"""
+        staff_ids = [s['id'] for s in staff]
+        staff_ids += [s['assigned_staff_id'] for s in subjects if s.get('assigned_staff_id')]
+        return cls(time_slots, staff_ids, classrooms, sections=sections, days=days)
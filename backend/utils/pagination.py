@@ -0,0 +1,39 @@
+"""
+Keyset pagination for list endpoints
+
+Pages are ordered by primary key and continue after the last id of the
+previous page (WHERE id > cursor), so each page costs an index range scan
+no matter how deep the client has paged, and rows added or removed
+between requests never shift or repeat a page. The body stays a plain
+list; the cursor for the next page travels in the X-Next-Cursor header
+and is absent on the last page.
+"""
+
+from typing import List, Optional
+from fastapi import Query, Response
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+MAX_PAGE_LIMIT = 1000
+
+# Shared query parameters; without a limit an endpoint returns every row, as before
+LimitParam = Query(None, ge=1, le=MAX_PAGE_LIMIT, description="Page size; omit to get every row")
+CursorParam = Query(None, ge=0, description="X-Next-Cursor value of the previous page")
+
+def keyset_page(query, id_column, limit: Optional[int], cursor: Optional[int]):
+    """Order a select by id and restrict it to the page after cursor
+
+    One row beyond limit is fetched to tell whether another page follows.
+    """
+    query = query.order_by(id_column)
+    if cursor is not None:
+        query = query.where(id_column > cursor)
+    if limit is not None:
+        query = query.limit(limit + 1)
+    return query
+
+def finish_page(rows: List, limit: Optional[int], response: Response) -> List:
+    """Drop the look-ahead row and advertise the next cursor when there is one"""
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = str(rows[-1].id)
+    return rows
@@ -0,0 +1,181 @@
+"""
+Parallel solver portfolio
+
+Runs several strategy-varied solver instances (different seeds and variable
+orderings) in a process pool and keeps the best complete timetable that is
+ready when the deadline hits. The pool is started once and reused, and a
+shared stop event plus the deadline end every instance of a run as soon as
+it returns or is cancelled.
+"""
+
+import os
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Dict, Optional, Callable
+from backend.utils.occupancy import OccupancyGrid
+from backend.utils.csp_solver import CSPTimetableSolver, build_tasks, lab_block_hours, ORDERINGS
+from backend.utils.local_search import TimetableAnnealer
+from backend.utils.slot_intervals import SlotIntervals
+
+PORTFOLIO_WORKERS = int(os.getenv("PORTFOLIO_WORKERS", str(min(8, os.cpu_count() or 1))))
+
+# Share of each instance's budget spent on construction; the rest goes to annealing
+CONSTRUCTION_SHARE = 0.5
+
+# Share of the deadline given to instances, leaving room for process start-up and result transfer
+INSTANCE_SHARE = 0.85
+
+# How often the parent, and each instance, checks for cancellation (seconds)
+POLL_INTERVAL = 0.25
+
+# Worker pools by size and the manager serving stop events, started on first use
+_pools = {}
+_manager = None
+_pools_lock = threading.Lock()
+
+def _shared_pool(workers: int):
+    """Reusable process pool of the given size and the manager for stop events"""
+    global _manager
+    with _pools_lock:
+        if _manager is None:
+            _manager = multiprocessing.Manager()
+        if workers not in _pools:
+            _pools[workers] = ProcessPoolExecutor(max_workers=workers)
+        return _pools[workers], _manager
+
+def _discard_pool(workers: int):
+    with _pools_lock:
+        pool = _pools.pop(workers, None)
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def shutdown_pools():
+    """Stop the worker processes and the stop-event manager (on application shutdown)"""
+    global _manager
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+        manager, _manager = _manager, None
+    for pool in pools:
+        pool.shutdown(wait=True, cancel_futures=True)
+    if manager is not None:
+        manager.shutdown()
+
+def _stop_check(stop_event, deadline: float) -> Callable[[], bool]:
+    """should_stop for an instance: past the wall-clock deadline, or the stop event is set
+
+    The event lives in the manager process, so it is polled at most every POLL_INTERVAL.
+    """
+    state = {"checked": 0.0, "stopped": False}
+    def should_stop() -> bool:
+        if state["stopped"] or time.time() >= deadline:
+            return True
+        now = time.monotonic()
+        if now - state["checked"] >= POLL_INTERVAL:
+            state["checked"] = now
+            state["stopped"] = stop_event.is_set()
+        return state["stopped"]
+    return should_stop
+
+def portfolio_strategies(size: int) -> List[Dict]:
+    """Strategy mix: the deterministic MRV solver first, then seeded variants of every ordering"""
+    orderings = list(ORDERINGS)
+    strategies = [{"ordering": "mrv", "seed": None}]
+    for i in range(1, size):
+        strategies.append({"ordering": orderings[i % len(orderings)], "seed": i})
+    return strategies
+
+def run_instance(payload: Dict, should_stop: Optional[Callable[[], bool]] = None, stop_event=None) -> Dict:
+    """Build a timetable with one strategy, then anneal it; runs inside a worker process
+
+    In a worker, stop_event and payload['deadline'] take the place of should_stop.
+    """
+    if stop_event is not None:
+        should_stop = _stop_check(stop_event, payload['deadline'])
+    started = time.monotonic()
+    budget = payload['time_budget']
+    subjects = payload['subjects']
+    grid = OccupancyGrid.for_subjects(subjects, payload['staff'], payload['classrooms'], payload['time_slots'])
+    for entry in payload['fixed_entries']:
+        grid.block_entry(entry)
+    solver = CSPTimetableSolver(
+        grid, build_tasks(subjects, min_capacity=payload['constraints'].get("section_strength")),
+        max_hours_per_day=payload['constraints'].get("max_hours_per_day"),
+        time_budget=budget * CONSTRUCTION_SHARE,
+        seed=payload['strategy']['seed'],
+        ordering=payload['strategy']['ordering'],
+        should_stop=should_stop,
+        intervals=SlotIntervals(payload['time_slots'], payload['constraints'].get("lunch_break"))
+    )
+    result = solver.solve()
+
+    annealer = TimetableAnnealer(result['timetable'], payload['time_slots'], payload['classrooms'],
+                                 fixed_entries=payload['fixed_entries'],
+                                 constraints=payload['constraints'], seed=payload['strategy']['seed'],
+                                 block_hours=lab_block_hours(subjects))
+    improved = annealer.run(max(0.0, budget - (time.monotonic() - started)), should_stop=should_stop)
+    return {
+        "strategy": payload['strategy'],
+        "timetable": improved['timetable'],
+        "unplaced": [{"subject_id": item['subject']['id'], "hours": item['hours']} for item in result['unplaced']],
+        "unplaced_subjects": result['unplaced'],
+        "score": improved['score_after']
+    }
+
+def rank(result: Dict):
+    """Complete timetables first, then the highest score"""
+    return (sum(item['hours'] for item in result['unplaced']), -result['score'])
+
+class SolverPortfolio:
+    """Best-of-N solver selection under a deadline"""
+
+    def __init__(self, size: Optional[int] = None, max_workers: Optional[int] = None):
+        self.max_workers = max_workers or PORTFOLIO_WORKERS
+        self.size = size or self.max_workers
+
+    def solve(self, subjects, staff, classrooms, time_slots, constraints, time_budget: float,
+              should_stop: Optional[Callable[[], bool]] = None, fixed_entries: List[Dict] = ()) -> Dict:
+        """Run every strategy until the deadline and return the best result (None if cancelled first)"""
+        deadline = time.monotonic() + time_budget
+        payloads = [
+            {"subjects": subjects, "staff": staff, "classrooms": classrooms, "time_slots": time_slots,
+             "constraints": constraints, "time_budget": time_budget * INSTANCE_SHARE, "strategy": strategy,
+             "fixed_entries": list(fixed_entries), "deadline": time.time() + time_budget}
+            for strategy in portfolio_strategies(self.size)
+        ]
+
+        if self.max_workers <= 1:
+            results = [run_instance(payloads[0], should_stop=should_stop)]
+        else:
+            workers = min(self.max_workers, len(payloads))
+            pool, manager = _shared_pool(workers)
+            stop_event = manager.Event()
+            futures = []
+            try:
+                futures = [pool.submit(run_instance, payload, stop_event=stop_event) for payload in payloads]
+                pending = futures
+                while pending and time.monotonic() < deadline and not (should_stop and should_stop()):
+                    _, pending = wait(pending, timeout=min(POLL_INTERVAL, max(0.0, deadline - time.monotonic())))
+                done = [future for future in futures if future.done() and not future.cancelled()]
+                if not done and should_stop and should_stop():
+                    return None
+                if not done:
+                    # Never come back empty-handed: take the first instance to finish (they stop at the deadline)
+                    done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                results = [future.result() for future in done]
+            except BrokenProcessPool:
+                # A worker died; start a fresh pool on the next run
+                _discard_pool(workers)
+                raise
+            finally:
+                # Instances still queued never start; running ones stop at their next check
+                stop_event.set()
+                for future in futures:
+                    future.cancel()
+
+        best = min(results, key=rank)
+        best['instances'] = len(results)
+        return best
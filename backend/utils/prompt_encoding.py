@@ -0,0 +1,139 @@
+"""
+Compact prompt encoding for the LLM timetable providers
+
+The AI context is rendered as pipe-separated tables with small integer
+aliases instead of database ids, and the model answers with compact
+[day, slot, subject, room] rows. When the problem does not fit the model's
+context window or output limit, subjects are split into staff-group chunks
+that are solved one after another; cells booked by earlier chunks are passed
+on as taken, so the merged timetable never double-books the section.
+"""
+
+import math
+from typing import List, Dict, Tuple
+from backend.utils.occupancy import DAYS, required_room_type
+
+# Rough characters per token for budgeting before a request is sent
+CHARS_PER_TOKEN = 4
+
+# Output tokens needed per scheduled hour ("[1,3,12,4],") and for the JSON envelope
+TOKENS_PER_ENTRY = 12
+RESPONSE_OVERHEAD_TOKENS = 150
+
+PROMPT_HEADER = """You are an expert timetable scheduling AI for SRM College. Schedule every weekly subject hour for one class section.
+Rules: no staff member or room double-booked; one class per day/slot cell; no class during lunch {lunch}; at most {max_hours} hours per staff per day; balance load across days; theory in the morning, labs (lab=1) in the afternoon in a Lab room; minimise gaps in staff schedules."""
+
+PROMPT_FOOTER = """Reply with JSON only, using the ids above: {"t":[[d,p,s,r],...],"c":["conflict",...],"s":["suggestion",...],"score":0.0-1.0}. One row per scheduled hour."""
+
+def estimate_tokens(text: str) -> int:
+    """Token estimate used for budgeting; providers report exact counts afterwards"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+def _hhmm(value) -> str:
+    return str(value)[:5]
+
+class PromptEncoder:
+    """Encode an AI context as compact tables and decode compact answers"""
+
+    def __init__(self, context: Dict, days=DAYS):
+        self.context = context
+        self.days = list(days)
+        self.subjects = sorted(context['subjects'], key=lambda s: s['id'])
+        self.rooms = sorted(context['classrooms'], key=lambda c: c['id'])
+        self.slots = sorted(context['time_slots'], key=lambda t: (str(t.get('start_time', '')), t['id']))
+        self.slot_index = {t['id']: i for i, t in enumerate(self.slots)}
+        # Aliases are 1-based positions in the lists above
+        self.subject_alias = {s['id']: i for i, s in enumerate(self.subjects, 1)}
+        staff_ids = sorted({s['assigned_staff_id'] for s in self.subjects if s.get('assigned_staff_id')})
+        self.staff_alias = {staff_id: i for i, staff_id in enumerate(staff_ids, 1)}
+
+    def _static_tables(self) -> List[str]:
+        constraints = self.context.get('constraints', {})
+        lunch = constraints.get('lunch_break') or {}
+        lines = [PROMPT_HEADER.format(
+            lunch=f"{lunch.get('start', '-')}-{lunch.get('end', '-')}",
+            max_hours=constraints.get('max_hours_per_day', '-')
+        )]
+        lines.append("DAYS d|name")
+        lines += [f"{i}|{day}" for i, day in enumerate(self.days, 1)]
+        lines.append("SLOTS p|start-end")
+        lines += [f"{i}|{_hhmm(t.get('start_time'))}-{_hhmm(t.get('end_time'))}" for i, t in enumerate(self.slots, 1)]
+        lines.append("ROOMS r|type|capacity")
+        lines += [f"{i}|{c.get('room_type', '')}|{c.get('capacity', '')}" for i, c in enumerate(self.rooms, 1)]
+        return lines
+
+    def encode(self, subjects: List[Dict], taken: List[Tuple[int, int]] = ()) -> str:
+        """Prompt for a subset of subjects; taken holds (day_idx, slot_idx) cells already used"""
+        lines = self._static_tables()
+        lines.append("SUBJECTS s|code|staff|hours|lab")
+        for s in subjects:
+            hours = s.get('theory_hours', 3) + s.get('practical_hours', 0)
+            lab = 1 if required_room_type(s) else 0
+            lines.append(f"{self.subject_alias[s['id']]}|{s['code']}|{self.staff_alias[s['assigned_staff_id']]}|{hours}|{lab}")
+        if taken:
+            lines.append("TAKEN d,p (already booked, do not use)")
+            lines.append(" ".join(f"{d + 1},{p + 1}" for d, p in sorted(taken)))
+        lines.append(PROMPT_FOOTER)
+        return "\n".join(lines)
+
+    def expected_output_tokens(self, subjects: List[Dict]) -> int:
+        hours = sum(s.get('theory_hours', 3) + s.get('practical_hours', 0) for s in subjects)
+        return RESPONSE_OVERHEAD_TOKENS + hours * TOKENS_PER_ENTRY
+
+    def chunks(self, context_tokens: int, max_output_tokens: int) -> List[List[Dict]]:
+        """Split subjects into staff-group chunks that fit the prompt and output budgets"""
+        subjects = [s for s in self.subjects if s.get('assigned_staff_id')]
+        groups = {}
+        for s in subjects:
+            groups.setdefault(s['assigned_staff_id'], []).append(s)
+
+        # Leave room for the taken-cells line, which grows as chunks are solved
+        taken_tokens = estimate_tokens(" 5,10" * len(self.days) * len(self.slots))
+
+        def fits(chunk):
+            output = self.expected_output_tokens(chunk)
+            prompt = estimate_tokens(self.encode(chunk)) + taken_tokens
+            return output <= max_output_tokens and prompt + output <= context_tokens
+
+        if fits(subjects):
+            return [subjects]
+
+        chunks, current = [], []
+        for group in groups.values():
+            # A staff group that alone is too large is split subject by subject
+            pieces = [group] if fits(group) else [[s] for s in group]
+            for piece in pieces:
+                if current and not fits(current + piece):
+                    chunks.append(current)
+                    current = []
+                current += piece
+        if current:
+            chunks.append(current)
+        return chunks
+
+    def decode(self, result: Dict, subjects: List[Dict]) -> List[Dict]:
+        """Map compact [d, p, s, r] rows back to timetable entries with database ids"""
+        allowed = {self.subject_alias[s['id']]: s for s in subjects}
+        entries = []
+        for row in result.get('t', []):
+            try:
+                d, p, s, r = (int(value) for value in row[:4])
+            except (TypeError, ValueError):
+                continue
+            subject = allowed.get(s)
+            if subject is None or not (1 <= d <= len(self.days) and 1 <= p <= len(self.slots)
+                                       and 1 <= r <= len(self.rooms)):
+                continue
+            entries.append({
+                "day": self.days[d - 1],
+                "time_slot_id": self.slots[p - 1]['id'],
+                "subject_id": subject['id'],
+                "staff_id": subject['assigned_staff_id'],
+                "classroom_id": self.rooms[r - 1]['id'],
+                "confidence": 0.9
+            })
+        return entries
+
+    def cell(self, entry: Dict) -> Tuple[int, int]:
+        """(day_idx, slot_idx) of a decoded entry"""
+        return self.days.index(entry['day']), self.slot_index[entry['time_slot_id']]
@@ -0,0 +1,228 @@
+"""
+Incremental timetable repair
+
+After a small change (subject reassigned to another staff member, classroom
+taken out of service, time slot deactivated, section grown past its rooms)
+only the affected entries are
+re-placed. Every other booking stays pinned on the occupancy grid, an
+affected entry keeps its day/slot whenever the change allows it, and only
+what is left over goes through the constraint solver.
+"""
+
+from typing import List, Dict, Optional
+from sqlalchemy.orm import Session
+from backend.database.models import TimetableEntry, Subject, Classroom, TimeSlot
+from backend.utils.occupancy import OccupancyGrid, required_room_type
+from backend.utils.csp_solver import CSPTimetableSolver, describe_unplaced, lab_block_hours
+from backend.utils.slot_intervals import SlotIntervals
+from backend.utils.timetable_data import (
+    subject_to_dict, classroom_to_dict, entry_to_dict, load_active_time_slots, load_section_strengths,
+    move_entries, MAX_HOURS_PER_DAY, LUNCH_BREAK
+)
+
+REPAIR_TIME_BUDGET = 2.0
+
+def _scope(entry: Dict):
+    return (entry['department_id'], entry['semester'], entry['section'])
+
+def repair_entries(affected: List[Dict],
+                   pinned: List[Dict],
+                   blocked: List[Dict],
+                   subjects: Dict[int, Dict],
+                   rooms_by_department: Dict[int, List[Dict]],
+                   time_slots: List[Dict],
+                   max_hours_per_day: Optional[int] = MAX_HOURS_PER_DAY,
+                   time_budget: float = REPAIR_TIME_BUDGET,
+                   section_strengths: Optional[Dict] = None,
+                   lunch_break: Optional[Dict] = None) -> Dict:
+    """Re-place affected entries around pinned ones.
+
+    affected entries already carry their new staff_id; pinned entries belong to the
+    same scopes and never move; blocked entries only reserve their staff and rooms.
+    section_strengths maps scopes to enrollment so sections only move into rooms that fit.
+    Practical hours that move are re-placed as one contiguous block, as in generation.
+    """
+    section_strengths = section_strengths or {}
+    scopes = list(dict.fromkeys(_scope(e) for e in affected + pinned))
+    classrooms = list({room['id']: room for rooms in rooms_by_department.values() for room in rooms}.values())
+    staff_ids = [e['staff_id'] for e in affected + pinned + blocked]
+    grid = OccupancyGrid(time_slots, staff_ids, classrooms, sections=scopes)
+
+    for entry in blocked:
+        grid.block_entry(entry)
+    for entry in pinned:
+        if not grid.book_entry(entry, _scope(entry)):
+            # Booking in a room outside the grid: still reserve staff and the section's slot
+            grid.block_entry(entry)
+            cell = grid.cell_of(entry)
+            if cell is not None:
+                grid.section_busy[cell[0], cell[1], grid.section_index[_scope(entry)]] = True
+
+    def room_key(entry):
+        room_type = required_room_type(subjects[entry['subject_id']])
+        room_ids = [room['id'] for room in rooms_by_department.get(entry['department_id'], [])]
+        group = grid.add_room_group((entry['department_id'], room_type), room_ids, room_type)
+        return grid.sized_room_key(group, section_strengths.get(_scope(entry)))
+
+    # Keep the original day/slot when staff and section are still free there
+    kept, leftover = [], []
+    for entry in affected:
+        cell = grid.cell_of(entry)
+        staff_idx = grid.staff_index[entry['staff_id']]
+        section_idx = grid.section_index[_scope(entry)]
+        if cell is not None and not (grid.staff_busy[cell[0], cell[1], staff_idx] or
+                                     grid.section_busy[cell[0], cell[1], section_idx]):
+            room_idx = grid.room_index.get(entry['classroom_id'])
+            if room_idx is None or not grid.room_mask(room_key(entry))[room_idx] or grid.room_busy[cell + (room_idx,)]:
+                room_idx = grid.best_fit_room(cell[0], cell[1], room_key(entry))
+            if room_idx is not None:
+                grid.book(cell[0], cell[1], entry['staff_id'], room_idx, _scope(entry))
+                kept.append(dict(entry, classroom_id=grid.classrooms[room_idx]['id']))
+                continue
+        leftover.append(entry)
+
+    # A lab subject's affected hours stay put together or move together, so its block is not split
+    block_hours = lab_block_hours(list(subjects.values()))
+    moving = {(_scope(e), e['subject_id']) for e in leftover if e['subject_id'] in block_hours}
+    for entry in [e for e in kept if (_scope(e), e['subject_id']) in moving]:
+        day_idx, slot_idx = grid.cell_of(entry)
+        grid.release(day_idx, slot_idx, entry['staff_id'], grid.room_index[entry['classroom_id']], _scope(entry))
+        kept.remove(entry)
+        leftover.append(entry)
+
+    # Everything else is re-placed by the solver: per (scope, subject) one task of single
+    # hours, and for a lab subject with a whole block's worth of hours, one block task
+    pools = {}
+    for entry in leftover:
+        pools.setdefault((_scope(entry), entry['subject_id']), []).append(entry)
+    tasks = []
+    for (scope, subject_id), entries in pools.items():
+        entry = entries[0]
+        task = {
+            "subject": dict(subjects[subject_id], assigned_staff_id=entry['staff_id']),
+            "section": scope,
+            "staff_id": entry['staff_id'],
+            "room_type": room_key(entry),
+        }
+        hours = len(entries)
+        block = block_hours.get(subject_id, 0)
+        if block and hours >= block:
+            tasks.append(dict(task, hours=block, block=block))
+            hours -= block
+        if hours:
+            tasks.append(dict(task, hours=hours))
+
+    result = CSPTimetableSolver(grid, tasks, max_hours_per_day=max_hours_per_day, time_budget=time_budget,
+                                intervals=SlotIntervals(time_slots, lunch_break)).solve()
+
+    # Hand the solver's cells back to the original rows so entry ids are preserved
+    moved = []
+    for placed in result['timetable']:
+        scope = placed.pop('section')
+        original = pools[(scope, placed['subject_id'])].pop()
+        moved.append(dict(original, day=placed['day'], time_slot_id=placed['time_slot_id'],
+                          classroom_id=placed['classroom_id']))
+    dropped = [entry for entry_pool in pools.values() for entry in entry_pool]
+
+    unplaced = [dict(item, section=item['section'][2]) for item in result['unplaced']]
+    return {
+        "kept": kept,
+        "moved": moved,
+        "dropped": dropped,
+        "conflicts": describe_unplaced(unplaced)
+    }
+
+def repair_timetable(db: Session,
+                     subject_id: Optional[int] = None,
+                     classroom_id: Optional[int] = None,
+                     time_slot_id: Optional[int] = None,
+                     time_budget: Optional[float] = None,
+                     section_scope: Optional[tuple] = None) -> Dict:
+    """Repair stored entries touched by a subject, classroom, time slot or section strength change (caller commits)
+
+    section_scope is a (department_id, semester, section) whose entries in rooms
+    seating fewer than its strength are re-seated.
+    """
+    query = db.query(TimetableEntry)
+    affected_rows = []
+    if subject_id is not None:
+        # An unassigned subject keeps its entries until a new staff member is assigned
+        subject = db.query(Subject).filter(Subject.id == subject_id).first()
+        if subject is not None and subject.assigned_staff_id is not None:
+            affected_rows += [(row, subject.assigned_staff_id) for row in
+                              query.filter(TimetableEntry.subject_id == subject_id,
+                                           TimetableEntry.staff_id != subject.assigned_staff_id).all()]
+    if classroom_id is not None:
+        classroom = db.query(Classroom).filter(Classroom.id == classroom_id).first()
+        if classroom is None or not classroom.is_available:
+            affected_rows += [(row, row.staff_id) for row in
+                              query.filter(TimetableEntry.classroom_id == classroom_id).all()]
+    if time_slot_id is not None:
+        time_slot = db.query(TimeSlot).filter(TimeSlot.id == time_slot_id).first()
+        if time_slot is None or not time_slot.is_active:
+            affected_rows += [(row, row.staff_id) for row in
+                              query.filter(TimetableEntry.time_slot_id == time_slot_id).all()]
+    if section_scope is not None:
+        strength = load_section_strengths(db, [section_scope]).get(section_scope)
+        if strength:
+            department_id, semester, section = section_scope
+            # Entries already in the largest suitable room are kept in place by repair_entries
+            affected_rows += [(row, row.staff_id) for row in
+                              query.join(Classroom, Classroom.id == TimetableEntry.classroom_id).filter(
+                                  TimetableEntry.department_id == department_id,
+                                  TimetableEntry.semester == semester,
+                                  TimetableEntry.section == section,
+                                  Classroom.capacity < strength).all()]
+
+    affected_rows = list({row.id: (row, staff_id) for row, staff_id in affected_rows}.values())
+    summary = {"affected": len(affected_rows), "kept_in_place": 0, "moved": 0, "removed": 0, "conflicts": []}
+    if not affected_rows:
+        return summary
+
+    rows_by_id = {row.id: row for row, _ in affected_rows}
+    affected = [dict(entry_to_dict(row), staff_id=staff_id) for row, staff_id in affected_rows]
+    scopes = {_scope(e) for e in affected}
+    department_ids = {scope[0] for scope in scopes}
+    staff_ids = {e['staff_id'] for e in affected}
+
+    classrooms = db.query(Classroom).filter(
+        Classroom.department_id.in_(department_ids),
+        Classroom.is_available == True
+    ).all()
+    rooms_by_department = {}
+    for c in classrooms:
+        rooms_by_department.setdefault(c.department_id, []).append(classroom_to_dict(c))
+    room_ids = [c.id for c in classrooms]
+
+    pinned, blocked = [], []
+    others = db.query(TimetableEntry).filter(
+        TimetableEntry.department_id.in_(department_ids),
+        ~TimetableEntry.id.in_(list(rows_by_id))
+    ).all()
+    others += db.query(TimetableEntry).filter(
+        (TimetableEntry.staff_id.in_(staff_ids)) | (TimetableEntry.classroom_id.in_(room_ids)),
+        ~TimetableEntry.department_id.in_(department_ids)
+    ).all()
+    for row in others:
+        entry = entry_to_dict(row)
+        (pinned if _scope(entry) in scopes else blocked).append(entry)
+
+    subject_ids = {e['subject_id'] for e in affected}
+    subjects = {s.id: subject_to_dict(s) for s in db.query(Subject).filter(Subject.id.in_(subject_ids)).all()}
+
+    result = repair_entries(affected, pinned, blocked, subjects, rooms_by_department,
+                            load_active_time_slots(db), time_budget=time_budget or REPAIR_TIME_BUDGET,
+                            section_strengths=load_section_strengths(db, scopes), lunch_break=LUNCH_BREAK)
+
+    for entry in result["dropped"]:
+        db.delete(rows_by_id[entry['id']])
+    db.flush()
+    move_entries(db, [dict(entry, row=rows_by_id[entry['id']]) for entry in result["kept"] + result["moved"]])
+
+    summary.update(
+        kept_in_place=len(result["kept"]),
+        moved=len(result["moved"]),
+        removed=len(result["dropped"]),
+        conflicts=result["conflicts"]
+    )
+    return summary
@@ -0,0 +1,111 @@
+"""
+Vectorized timetable quality scoring
+
+A timetable is turned into boolean (staff, day, slot) and (section, day,
+slot) occupancy arrays, and every soft-constraint penalty (gaps, load
+imbalance, labs outside the afternoon, over-long runs of back-to-back
+classes, unplaced hours) is computed with whole-array operations. This is
+the objective shared by the generators, the annealer and portfolio
+selection, reported with a per-component breakdown.
+"""
+
+from typing import List, Dict, Optional
+import numpy as np
+from backend.utils.occupancy import DAYS, LAB_ROOM_TYPE
+
+# Soft-constraint weights
+WEIGHTS = {
+    "staff_gaps": 3.0,
+    "section_gaps": 2.0,
+    "load_imbalance": 1.0,
+    "labs_outside_afternoon": 2.0,
+    "back_to_back": 4.0,
+    "unplaced_hours": 10.0,
+}
+
+MAX_CONSECUTIVE_HOURS = 3
+
+def afternoon_slot_flags(time_slots: List[Dict], constraints: Optional[Dict] = None) -> List[bool]:
+    """Slots that start at or after the lunch break (12:00 when no break is configured)"""
+    lunch = (constraints or {}).get("lunch_break") or {}
+    threshold = str(lunch.get("start", "12:00"))[:5]
+    return [str(slot['start_time'])[:5] >= threshold for slot in time_slots]
+
+def score_from_cost(cost: float, n_entries: int) -> float:
+    """Map a penalty to a 0..1 score (1.0 means no soft-constraint violations)"""
+    return round(1.0 / (1.0 + cost / max(1, n_entries)), 4)
+
+def day_stats(occupancy: np.ndarray):
+    """Hours, gaps and longest run of consecutive classes for each row of a (..., slots) array"""
+    n_slots = occupancy.shape[-1]
+    hours = occupancy.sum(axis=-1)
+    first = occupancy.argmax(axis=-1)
+    last = n_slots - 1 - occupancy[..., ::-1].argmax(axis=-1)
+    gaps = np.where(hours > 0, last - first + 1 - hours, 0)
+
+    # Each AND with the array shifted by one slot shortens every run by one
+    runs = np.zeros(hours.shape, dtype=np.int64)
+    shifted = occupancy
+    while shifted.shape[-1] and shifted.any():
+        runs += shifted.any(axis=-1)
+        shifted = shifted[..., 1:] & shifted[..., :-1]
+    return hours, gaps, runs
+
+def score_timetable(entries: List[Dict],
+                    time_slots: List[Dict],
+                    classrooms: List[Dict],
+                    constraints: Optional[Dict] = None,
+                    weights: Optional[Dict] = None,
+                    required_hours: int = 0,
+                    days: List[str] = DAYS) -> Dict:
+    """Weighted soft-constraint cost, 0..1 score and per-component penalties of a timetable
+
+    time_slots must be in teaching-day order. Entries off the day/slot grid are
+    ignored; required_hours counts the hours missing from the timetable as unplaced.
+    """
+    weights = dict(WEIGHTS, **(weights or {}))
+    max_consecutive = (constraints or {}).get("max_consecutive_hours", MAX_CONSECUTIVE_HOURS)
+    day_index = {day: i for i, day in enumerate(days)}
+    slot_index = {slot['id']: i for i, slot in enumerate(time_slots)}
+    lab_rooms = {room['id'] for room in classrooms if (room.get('room_type') or "Theory") == LAB_ROOM_TYPE}
+    placed = [e for e in entries if e.get('day') in day_index and e.get('time_slot_id') in slot_index]
+
+    components = dict.fromkeys(("staff_gaps", "section_gaps", "load_imbalance",
+                                "labs_outside_afternoon", "back_to_back"), 0.0)
+    if placed:
+        n = len(placed)
+        day_idx = np.fromiter((day_index[e['day']] for e in placed), dtype=np.int64, count=n)
+        slot_idx = np.fromiter((slot_index[e['time_slot_id']] for e in placed), dtype=np.int64, count=n)
+        _, staff_idx = np.unique(np.array([e['staff_id'] for e in placed]), return_inverse=True)
+        _, section_idx = np.unique(np.array([str(e.get('section', "default")) for e in placed]),
+                                   return_inverse=True)
+        is_lab = np.fromiter((e.get('classroom_id') in lab_rooms for e in placed), dtype=bool, count=n)
+
+        shape = (len(days), len(time_slots))
+        staff_busy = np.zeros((staff_idx.max() + 1,) + shape, dtype=bool)
+        staff_busy[staff_idx, day_idx, slot_idx] = True
+        section_busy = np.zeros((section_idx.max() + 1,) + shape, dtype=bool)
+        section_busy[section_idx, day_idx, slot_idx] = True
+
+        staff_hours, staff_gaps, staff_runs = day_stats(staff_busy)
+        _, section_gaps, _ = day_stats(section_busy)
+        # Hours above an even spread of each staff member's week, squared
+        daily_target = np.ceil(staff_hours.sum(axis=1) / len(days))
+        excess = np.maximum(0, staff_hours - daily_target[:, None])
+        afternoon = np.array(afternoon_slot_flags(time_slots, constraints), dtype=bool)
+
+        components["staff_gaps"] = weights["staff_gaps"] * staff_gaps.sum()
+        components["section_gaps"] = weights["section_gaps"] * section_gaps.sum()
+        components["load_imbalance"] = weights["load_imbalance"] * (excess ** 2).sum()
+        components["labs_outside_afternoon"] = weights["labs_outside_afternoon"] * (is_lab & ~afternoon[slot_idx]).sum()
+        components["back_to_back"] = weights["back_to_back"] * np.maximum(0, staff_runs - max_consecutive).sum()
+
+    unplaced = max(0, required_hours - len(placed))
+    components["unplaced_hours"] = weights["unplaced_hours"] * unplaced
+    components = {name: round(float(value), 3) for name, value in components.items()}
+    cost = sum(components.values())
+    return {
+        "cost": round(cost, 3),
+        "score": score_from_cost(cost, max(len(placed), required_hours)),
+        "components": components
+    }
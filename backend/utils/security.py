@@ -8,8 +8,9 @@ from datetime import datetime, timedelta
 from passlib.context import CryptContext
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
-from backend.database.database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.database.database import get_async_db
 from backend.database.models import Staff, MainAdmin
 
 # Password hashing
@@ -51,9 +52,9 @@ def verify_token(token: str):
     except jwt.PyJWTError:
         return None
 
-def get_current_user(
+async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get current authenticated user"""
     token = credentials.credentials
@@ -69,10 +70,8 @@ def get_current_user(
     user_id = payload.get("user_id")
     user_type = payload.get("user_type")
     
-    if user_type == "main_admin":
-        user = db.query(MainAdmin).filter(MainAdmin.id == user_id).first()
-    else:
-        user = db.query(Staff).filter(Staff.id == user_id).first()
+    model = MainAdmin if user_type == "main_admin" else Staff
+    user = (await db.execute(select(model).where(model.id == user_id))).scalar_one_or_none()
     
     if user is None:
         raise HTTPException(
@@ -0,0 +1,81 @@
+"""
+Time slot interval model
+
+Turns the active time slots into minute intervals once and precomputes what
+the generators and conflict checks ask about them: which slot follows
+which without a real break (short changeover gaps are allowed, the lunch
+break never is), how many contiguous slots start at each position, and
+which slots of different lengths overlap. Contiguity of a k-slot block is
+then a single array lookup.
+"""
+
+from typing import List, Dict, Optional, FrozenSet
+import numpy as np
+
+# Longest gap between two slots that still counts as back-to-back (tea / changeover breaks)
+ADJACENT_GAP_MINUTES = 15
+
+def to_minutes(value) -> int:
+    """Minutes after midnight of a datetime.time or an "HH:MM[:SS]" string"""
+    if hasattr(value, "hour"):
+        return value.hour * 60 + value.minute
+    hours, minutes = str(value).split(":")[:2]
+    return int(hours) * 60 + int(minutes)
+
+class SlotIntervals:
+    """Adjacency, break and overlap structure of an ordered list of time slots"""
+
+    def __init__(self, time_slots: List[Dict], lunch_break: Optional[Dict] = None,
+                 max_gap: int = ADJACENT_GAP_MINUTES):
+        # Positions follow the given order, which is the grid's slot order
+        self.slot_ids = [slot['id'] for slot in time_slots]
+        self.index = {slot_id: i for i, slot_id in enumerate(self.slot_ids)}
+        self.starts = np.array([to_minutes(slot['start_time']) for slot in time_slots], dtype=np.int64)
+        self.ends = np.array([to_minutes(slot['end_time']) for slot in time_slots], dtype=np.int64)
+        n = len(self.slot_ids)
+
+        self.lunch = None
+        self.in_break = np.zeros(n, dtype=bool)
+        if lunch_break and lunch_break.get("start") and lunch_break.get("end"):
+            self.lunch = (to_minutes(lunch_break["start"]), to_minutes(lunch_break["end"]))
+            self.in_break = (self.starts < self.lunch[1]) & (self.lunch[0] < self.ends)
+
+        # adjacent[i]: slot i + 1 follows slot i with at most max_gap minutes and no break in between
+        self.adjacent = np.zeros(n, dtype=bool)
+        for i in range(n - 1):
+            gap = self.starts[i + 1] - self.ends[i]
+            crosses_break = (self.lunch is not None and
+                             max(self.ends[i], self.lunch[0]) < min(self.starts[i + 1], self.lunch[1]))
+            self.adjacent[i] = (0 <= gap <= max_gap and not crosses_break
+                                and not self.in_break[i] and not self.in_break[i + 1])
+
+        # run_length[i]: contiguous slots starting at position i
+        self.run_length = np.ones(n, dtype=np.int64)
+        for i in range(n - 2, -1, -1):
+            if self.adjacent[i]:
+                self.run_length[i] = self.run_length[i + 1] + 1
+
+        # Slots whose intervals intersect, for slot lists mixing lengths (e.g. 1h slots and a 2h lab slot)
+        overlap = (self.starts[:, None] < self.ends[None, :]) & (self.starts[None, :] < self.ends[:, None])
+        np.fill_diagonal(overlap, False)
+        self.overlaps = {
+            slot_id: frozenset(self.slot_ids[j] for j in np.flatnonzero(overlap[i]))
+            for i, slot_id in enumerate(self.slot_ids)
+        }
+
+    def can_start_block(self, slot_idx: int, length: int) -> bool:
+        """Whether length contiguous slots start at position slot_idx"""
+        return bool(self.run_length[slot_idx] >= length)
+
+    def block_starts(self, length: int) -> np.ndarray:
+        """Mask of slot positions where a block of length contiguous slots can start"""
+        return self.run_length >= length
+
+    def overlapping(self, slot_id: int) -> FrozenSet[int]:
+        """Other slots whose time overlaps slot_id"""
+        return self.overlaps.get(slot_id, frozenset())
+
+    def is_adjacent(self, slot_id: int, next_slot_id: int) -> bool:
+        """Whether next_slot_id directly follows slot_id"""
+        i = self.index.get(slot_id)
+        return i is not None and self.index.get(next_slot_id) == i + 1 and bool(self.adjacent[i])
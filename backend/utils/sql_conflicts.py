@@ -0,0 +1,85 @@
+"""
+Database-side conflict detection
+
+Staff and room clashes are found with GROUP BY ... HAVING COUNT(*) > 1
+aggregate queries, so the database does the scan and only the clashing
+groups come back. Groups are read in pages (or streamed in batches) and the
+bookings behind each page are fetched with one extra query per clash type,
+keeping memory bounded however large timetable_entries grows.
+"""
+
+from typing import List, Dict, Optional, Iterator
+from sqlalchemy import func, literal, select, union_all, tuple_, case
+from sqlalchemy.orm import Session
+from backend.database.models import TimetableEntry
+
+STREAM_BATCH_SIZE = 500
+
+_RESOURCE_COLUMNS = {"staff": TimetableEntry.staff_id, "room": TimetableEntry.classroom_id}
+_RESOURCE_FIELDS = {"staff": "staff_id", "room": "classroom_id"}
+
+def _clash_groups(kind: str, department_id: Optional[int] = None):
+    column = _RESOURCE_COLUMNS[kind]
+    query = select(
+        literal(kind).label("type"),
+        TimetableEntry.day,
+        TimetableEntry.time_slot_id,
+        column.label("resource_id"),
+        func.count(TimetableEntry.id).label("bookings")
+    ).group_by(TimetableEntry.day, TimetableEntry.time_slot_id, column).having(func.count(TimetableEntry.id) > 1)
+    if department_id is not None:
+        # Keep groups where at least one of the clashing bookings belongs to the department
+        query = query.having(func.sum(case((TimetableEntry.department_id == department_id, 1), else_=0)) > 0)
+    return query
+
+def clash_groups_query(department_id: Optional[int] = None):
+    """Ordered staff and room clash groups as one statement"""
+    groups = union_all(_clash_groups("staff", department_id), _clash_groups("room", department_id)).subquery()
+    return select(groups).order_by(groups.c.type, groups.c.day, groups.c.time_slot_id, groups.c.resource_id)
+
+def _attach_entries(db: Session, groups) -> List[Dict]:
+    """Load the bookings behind a batch of clash groups"""
+    clashes = []
+    for kind in dict.fromkeys(g.type for g in groups):
+        column = _RESOURCE_COLUMNS[kind]
+        bookings = {(g.day, g.time_slot_id, g.resource_id): g.bookings for g in groups if g.type == kind}
+        keys = list(bookings)
+        rows = db.query(TimetableEntry).filter(
+            tuple_(TimetableEntry.day, TimetableEntry.time_slot_id, column).in_(keys)
+        ).order_by(TimetableEntry.id).all()
+        by_key = {}
+        for row in rows:
+            by_key.setdefault((row.day, row.time_slot_id, getattr(row, _RESOURCE_FIELDS[kind])), []).append({
+                "id": row.id, "subject_id": row.subject_id, "staff_id": row.staff_id,
+                "classroom_id": row.classroom_id, "department_id": row.department_id,
+                "semester": row.semester, "section": row.section
+            })
+        for day, time_slot_id, resource_id in keys:
+            clashes.append({
+                "type": kind,
+                "day": day,
+                "time_slot_id": time_slot_id,
+                _RESOURCE_FIELDS[kind]: resource_id,
+                "bookings": bookings[(day, time_slot_id, resource_id)],
+                "entries": by_key.get((day, time_slot_id, resource_id), [])
+            })
+    return clashes
+
+def clash_page(db: Session, limit: int, offset: int = 0, department_id: Optional[int] = None) -> Dict:
+    """One page of clash groups with their bookings"""
+    groups = db.execute(clash_groups_query(department_id).limit(limit + 1).offset(offset)).all()
+    has_more = len(groups) > limit
+    groups = groups[:limit]
+    return {
+        "conflicts": _attach_entries(db, groups),
+        "offset": offset,
+        "limit": limit,
+        "next_offset": offset + limit if has_more else None
+    }
+
+def iter_clashes(db: Session, department_id: Optional[int] = None,
+                 batch_size: int = STREAM_BATCH_SIZE) -> Iterator[Dict]:
+    """Stream every clash group in batches without materializing the whole result"""
+    result = db.execute(clash_groups_query(department_id).execution_options(yield_per=batch_size))
+    for batch in result.partitions(batch_size):
+        yield from _attach_entries(db, batch)
@@ -0,0 +1,169 @@
+"""
+Materialized staff workload and gap statistics
+
+staff_day_loads holds one row per (staff, day) with the hours taught, the
+free slots between the first and last class, and the ordered slot ids. Rows
+are recomputed for exactly the (staff, day) pairs a flush or bulk statement
+touched, inside the same transaction as the timetable_entries change, so
+workload reports read a handful of summary rows instead of rescanning entries.
+"""
+
+from typing import List, Dict, Iterable
+from sqlalchemy import event, select, delete, insert, inspect, tuple_
+from sqlalchemy.orm import Session
+from backend.database.models import TimetableEntry, TimeSlot, StaffDayLoad
+from backend.utils.local_search import gaps_in
+from backend.utils.occupancy import DAYS
+from backend.utils.timetable_data import PARKED_DAY_PREFIX
+
+# (staff, day) pairs per statement, keeping tuple IN lists well below driver limits
+REFRESH_BATCH_SIZE = 500
+
+def _slot_positions(connection) -> Dict[int, int]:
+    """Position of each active time slot in the teaching day"""
+    rows = connection.execute(
+        select(TimeSlot.id).where(TimeSlot.is_active == True).order_by(TimeSlot.start_time, TimeSlot.id)
+    ).all()
+    return {row.id: i for i, row in enumerate(rows)}
+
+def _summaries(connection, keys: List, positions: Dict[int, int]) -> List[Dict]:
+    slots = {key: [] for key in keys}
+    rows = connection.execute(
+        select(TimetableEntry.staff_id, TimetableEntry.day, TimetableEntry.time_slot_id)
+        .where(tuple_(TimetableEntry.staff_id, TimetableEntry.day).in_(keys))
+    )
+    for row in rows:
+        slots[(row.staff_id, row.day)].append(row.time_slot_id)
+
+    summaries = []
+    for (staff_id, day), slot_ids in slots.items():
+        if not slot_ids:
+            continue
+        # Slots that are no longer active count as hours but not towards gaps
+        mask = 0
+        for slot_id in slot_ids:
+            if slot_id in positions:
+                mask |= 1 << positions[slot_id]
+        ordered = sorted(slot_ids, key=lambda slot_id: (positions.get(slot_id, len(positions)), slot_id))
+        summaries.append({
+            "staff_id": staff_id,
+            "day": day,
+            "hours": len(slot_ids),
+            "gaps": gaps_in(mask),
+            "slot_ids": ",".join(str(slot_id) for slot_id in ordered)
+        })
+    return summaries
+
+def refresh_loads(connection, keys: Iterable):
+    """Recompute the summary rows of the given (staff_id, day) pairs"""
+    keys = sorted({(staff_id, day) for staff_id, day in keys
+                   if staff_id is not None and day and not day.startswith(PARKED_DAY_PREFIX)})
+    if not keys:
+        return
+    positions = _slot_positions(connection)
+    for start in range(0, len(keys), REFRESH_BATCH_SIZE):
+        batch = keys[start:start + REFRESH_BATCH_SIZE]
+        connection.execute(delete(StaffDayLoad).where(tuple_(StaffDayLoad.staff_id, StaffDayLoad.day).in_(batch)))
+        summaries = _summaries(connection, batch, positions)
+        if summaries:
+            connection.execute(insert(StaffDayLoad), summaries)
+
+def rebuild_loads(connection):
+    """Recompute every summary row from timetable_entries"""
+    connection.execute(delete(StaffDayLoad))
+    keys = connection.execute(select(TimetableEntry.staff_id, TimetableEntry.day).distinct()).all()
+    refresh_loads(connection, [tuple(key) for key in keys])
+
+def ensure_loads(db: Session):
+    """Backfill the summary for databases that had entries before the table existed"""
+    if db.query(StaffDayLoad.staff_id).first() is None and db.query(TimetableEntry.id).first() is not None:
+        rebuild_loads(db.connection())
+        db.commit()
+
+def workload_report(db: Session, staff_members: List, max_hours_per_day: int) -> List[Dict]:
+    """Per-staff daily hours, gaps and days over max_hours_per_day"""
+    ensure_loads(db)
+    loads = {}
+    if staff_members:
+        rows = db.query(StaffDayLoad).filter(StaffDayLoad.staff_id.in_([s.id for s in staff_members])).all()
+        for row in rows:
+            loads.setdefault(row.staff_id, []).append(row)
+
+    day_order = {day: i for i, day in enumerate(DAYS)}
+    report = []
+    for member in staff_members:
+        rows = sorted(loads.get(member.id, []), key=lambda r: (day_order.get(r.day, len(DAYS)), r.day))
+        report.append({
+            "staff_id": member.id,
+            "name": member.name,
+            "department_id": member.department_id,
+            "total_hours": sum(r.hours for r in rows),
+            "total_gaps": sum(r.gaps for r in rows),
+            "days": [
+                {"day": r.day, "hours": r.hours, "gaps": r.gaps,
+                 "slot_ids": [int(slot_id) for slot_id in r.slot_ids.split(",")]}
+                for r in rows
+            ],
+            "overloaded_days": [r.day for r in rows if r.hours > max_hours_per_day]
+        })
+    return report
+
+# Session hooks: flushed rows are refreshed straight away, bulk statements just before commit
+
+def _entry_keys(entry: TimetableEntry) -> set:
+    """Current and pre-flush (staff_id, day) pairs of an entry"""
+    state = inspect(entry)
+    staff_ids = set(state.attrs.staff_id.history.deleted) | {entry.staff_id}
+    days = set(state.attrs.day.history.deleted) | {entry.day}
+    return {(staff_id, day) for staff_id in staff_ids for day in days}
+
+@event.listens_for(Session, "after_flush")
+def _refresh_flushed_entries(session, flush_context):
+    keys = set()
+    slots_changed = False
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, TimetableEntry):
+            keys |= _entry_keys(obj)
+        elif isinstance(obj, TimeSlot):
+            slots_changed = True
+    if slots_changed:
+        # Slot order or activity changed, so every gap count may be off
+        rebuild_loads(session.connection())
+    elif keys:
+        refresh_loads(session.connection(), keys)
+
+@event.listens_for(Session, "do_orm_execute")
+def _capture_bulk_keys(orm_execute_state):
+    if orm_execute_state.is_select:
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None or mapper.class_ is not TimetableEntry:
+        return
+    info = orm_execute_state.session.info
+    statement = orm_execute_state.statement
+    if orm_execute_state.is_delete:
+        # Read the pairs the delete is about to remove before it runs
+        query = select(TimetableEntry.staff_id, TimetableEntry.day).distinct()
+        if statement.whereclause is not None:
+            query = query.where(statement.whereclause)
+        keys = orm_execute_state.session.connection().execute(query).all()
+        info.setdefault("staff_load_keys", set()).update(tuple(key) for key in keys)
+    elif orm_execute_state.is_insert and orm_execute_state.parameters:
+        parameters = orm_execute_state.parameters
+        rows = parameters if isinstance(parameters, list) else [parameters]
+        info.setdefault("staff_load_keys", set()).update((row.get('staff_id'), row.get('day')) for row in rows)
+    else:
+        info["staff_load_rebuild"] = True
+
+@event.listens_for(Session, "before_commit")
+def _refresh_bulk_keys(session):
+    keys = session.info.pop("staff_load_keys", None)
+    if session.info.pop("staff_load_rebuild", False):
+        rebuild_loads(session.connection())
+    elif keys:
+        refresh_loads(session.connection(), keys)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_bulk_keys(session):
+    session.info.pop("staff_load_keys", None)
+    session.info.pop("staff_load_rebuild", None)
@@ -0,0 +1,104 @@
+"""
+Term calendar expansion
+
+Timetable entries are weekly patterns (day + slot). Over a term they become
+dated sessions: every date between the term's start and end whose weekday
+has entries, minus holidays. Expansion is a chain of generators, so a
+term is produced one date at a time and streamed as NDJSON or iCalendar
+without ever holding the whole term in memory.
+"""
+
+import json
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, Iterator, List
+
+# iCalendar content lines are folded at 75 octets (RFC 5545 section 3.1)
+ICAL_LINE_LIMIT = 75
+
+def iter_term_dates(start: date, end: date, holidays: Iterable[date] = ()) -> Iterator[date]:
+    """Every date from start to end inclusive, skipping holidays"""
+    skip = set(holidays)
+    current = start
+    while current <= end:
+        if current not in skip:
+            yield current
+        current += timedelta(days=1)
+
+def iter_occurrences(entries: List[Dict], start: date, end: date,
+                     holidays: Iterable[date] = ()) -> Iterator[Dict]:
+    """Dated sessions of weekly entries, in date then start-time order
+
+    Each entry needs day, start_time and end_time ("HH:MM[:SS]" or datetime.time);
+    the other fields are copied onto every occurrence.
+    """
+    by_day = {}
+    for entry in entries:
+        by_day.setdefault(entry['day'], []).append(entry)
+    for day_entries in by_day.values():
+        day_entries.sort(key=lambda e: (str(e['start_time']), e.get('id') or 0))
+
+    for current in iter_term_dates(start, end, holidays):
+        for entry in by_day.get(current.strftime("%A"), ()):
+            yield dict(entry, date=current.isoformat(),
+                       start=f"{current.isoformat()}T{_hhmmss(entry['start_time'])}",
+                       end=f"{current.isoformat()}T{_hhmmss(entry['end_time'])}")
+
+def iter_ndjson(occurrences: Iterable[Dict]) -> Iterator[str]:
+    """One JSON document per line"""
+    for occurrence in occurrences:
+        yield json.dumps(occurrence, default=str) + "\n"
+
+def iter_ical(occurrences: Iterable[Dict], calendar_name: str = "Timetable") -> Iterator[str]:
+    """VCALENDAR with one VEVENT per occurrence, yielded event by event"""
+    stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+    yield _lines(["BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//SRM Timetable//Term calendar//EN",
+                  "CALSCALE:GREGORIAN", f"X-WR-CALNAME:{_escape(calendar_name)}"])
+    for occurrence in occurrences:
+        lines = [
+            "BEGIN:VEVENT",
+            f"UID:{occurrence.get('id')}-{occurrence['date'].replace('-', '')}@srm-timetable",
+            f"DTSTAMP:{stamp}",
+            f"DTSTART:{_ical_time(occurrence['start'])}",
+            f"DTEND:{_ical_time(occurrence['end'])}",
+            f"SUMMARY:{_escape(_summary(occurrence))}",
+        ]
+        if occurrence.get('room_number'):
+            lines.append(f"LOCATION:{_escape(occurrence['room_number'])}")
+        if occurrence.get('staff_name'):
+            lines.append(f"DESCRIPTION:{_escape('Staff: ' + occurrence['staff_name'])}")
+        lines.append("END:VEVENT")
+        yield _lines(lines)
+    yield _lines(["END:VCALENDAR"])
+
+def _hhmmss(value) -> str:
+    text = value.strftime("%H:%M:%S") if hasattr(value, "strftime") else str(value)
+    return text if text.count(":") == 2 else f"{text}:00"
+
+def _ical_time(value: str) -> str:
+    """Floating local date-time, e.g. 20260105T090000"""
+    return value.replace("-", "").replace(":", "")
+
+def _summary(occurrence: Dict) -> str:
+    subject = " ".join(part for part in (occurrence.get('subject_code'), occurrence.get('subject_name')) if part)
+    section = occurrence.get('section')
+    return f"{subject or 'Class'} (Section {section})" if section else subject or "Class"
+
+def _escape(text: str) -> str:
+    return str(text).replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+def _fold(line: str) -> str:
+    encoded = line.encode("utf-8")
+    if len(encoded) <= ICAL_LINE_LIMIT:
+        return line
+    parts, current = [], ""
+    for char in line:
+        limit = ICAL_LINE_LIMIT if not parts else ICAL_LINE_LIMIT - 1
+        if len((current + char).encode("utf-8")) > limit:
+            parts.append(current)
+            current = ""
+        current += char
+    parts.append(current)
+    return "\r\n ".join(parts)
+
+def _lines(lines: List[str]) -> str:
+    return "".join(_fold(line) + "\r\n" for line in lines)
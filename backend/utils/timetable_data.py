@@ -0,0 +1,159 @@
+"""
+Helpers that turn ORM rows into the plain dicts consumed by the timetable engines
+"""
+
+from contextlib import contextmanager
+from typing import List, Dict, Iterable, Optional
+from fastapi import HTTPException, status
+from sqlalchemy import or_, and_, not_, insert
+from sqlalchemy.exc import IntegrityError
+from backend.database.models import Subject, Staff, Classroom, TimeSlot, TimetableEntry, Section
+from backend.utils.conflict_index import track_inserted, TRACKED_INSERT
+
+MAX_HOURS_PER_DAY = 6
+LUNCH_BREAK = {"start": "13:15", "end": "14:00"}
+
+# Day value prefix for rows parked mid-move by move_entries
+PARKED_DAY_PREFIX = "~"
+
+def subject_to_dict(s: Subject) -> Dict:
+    """Subject fields used by the generators"""
+    return {
+        "id": s.id,
+        "name": s.name,
+        "code": s.code,
+        "assigned_staff_id": s.assigned_staff_id,
+        "theory_hours": s.theory_hours,
+        "practical_hours": s.practical_hours,
+        "credits": s.credits
+    }
+
+def staff_to_dict(s: Staff) -> Dict:
+    """Staff fields used by the generators"""
+    return {
+        "id": s.id,
+        "name": s.name,
+        "role": s.role,
+        "max_subjects": s.max_subjects
+    }
+
+def classroom_to_dict(c: Classroom) -> Dict:
+    """Classroom fields used by the generators"""
+    return {
+        "id": c.id,
+        "room_number": c.room_number,
+        "capacity": c.capacity,
+        "room_type": c.room_type
+    }
+
+def time_slot_to_dict(t: TimeSlot) -> Dict:
+    """Time slot fields used by the generators"""
+    return {
+        "id": t.id,
+        "slot_name": t.slot_name,
+        "start_time": str(t.start_time),
+        "end_time": str(t.end_time)
+    }
+
+def entry_to_dict(e: TimetableEntry) -> Dict:
+    """Timetable entry fields used by conflict checks and optimizers"""
+    return {
+        "id": e.id,
+        "day": e.day,
+        "time_slot_id": e.time_slot_id,
+        "subject_id": e.subject_id,
+        "staff_id": e.staff_id,
+        "classroom_id": e.classroom_id,
+        "department_id": e.department_id,
+        "semester": e.semester,
+        "section": e.section
+    }
+
+def default_constraints(department_id: int, semester: int, section: str,
+                        section_strength: Optional[int] = None) -> Dict:
+    """Scheduling constraints shared by every generation path"""
+    return {
+        "department_id": department_id,
+        "semester": semester,
+        "section": section,
+        "section_strength": section_strength,
+        "max_hours_per_day": MAX_HOURS_PER_DAY,
+        "lunch_break": dict(LUNCH_BREAK)
+    }
+
+def load_section_strengths(db, scopes: Iterable) -> Dict:
+    """Enrollment per (department_id, semester, section) scope; scopes without one are left out"""
+    scopes = set(scopes)
+    if not scopes:
+        return {}
+    rows = db.query(Section).filter(
+        Section.department_id.in_({scope[0] for scope in scopes}),
+        Section.semester.in_({scope[1] for scope in scopes})
+    ).all()
+    strengths = {(row.department_id, row.semester, row.name): row.strength for row in rows}
+    return {scope: strengths[scope] for scope in scopes if scope in strengths}
+
+def load_active_time_slots(db) -> List[Dict]:
+    """Active time slots in chronological order"""
+    time_slots = db.query(TimeSlot).filter(TimeSlot.is_active == True).order_by(TimeSlot.start_time).all()
+    return [time_slot_to_dict(t) for t in time_slots]
+
+def load_outside_bookings(db, department_id: int, semester: int, section: str,
+                          staff_ids: Iterable[int], room_ids: Iterable[int]) -> List[Dict]:
+    """Bookings of the given staff or rooms that belong to other department/semester/sections"""
+    rows = db.query(TimetableEntry).filter(
+        or_(TimetableEntry.staff_id.in_(list(staff_ids)),
+            TimetableEntry.classroom_id.in_(list(room_ids))),
+        not_(and_(TimetableEntry.department_id == department_id,
+                  TimetableEntry.semester == semester,
+                  TimetableEntry.section == section))
+    ).all()
+    return [entry_to_dict(e) for e in rows]
+
+def move_entries(db, moves: List[Dict]):
+    """Update entry cells in two flushes so swaps never trip the unique slot indexes
+
+    Each move holds the row plus its new day, time_slot_id, classroom_id and staff_id.
+    """
+    # Park moved rows on a per-row placeholder day first
+    for move in moves:
+        move['row'].day = f"{PARKED_DAY_PREFIX}{move['row'].id}"
+    db.flush()
+    for move in moves:
+        row = move['row']
+        row.day = move['day']
+        row.time_slot_id = move['time_slot_id']
+        row.classroom_id = move['classroom_id']
+        row.staff_id = move.get('staff_id', row.staff_id)
+    db.flush()
+
+# Columns a stored entry is written with; id and created_at come back from the database
+ENTRY_COLUMNS = ("day", "time_slot_id", "subject_id", "staff_id", "classroom_id",
+                 "department_id", "semester", "section")
+
+def insert_entries(db, entries: List[Dict]) -> List:
+    """Insert entries as batched INSERT ... RETURNING statements inside the current transaction
+
+    Returns plain rows (id, created_at and the stored columns), so nothing has to
+    be refreshed or lazily reloaded once the transaction commits. Row order is not
+    tied to input order; requiring it makes SQLite fall back to one row per statement.
+    """
+    if not entries:
+        return []
+    statement = insert(TimetableEntry).returning(*TimetableEntry.__table__.c)
+    rows = db.execute(statement, [{column: e[column] for column in ENTRY_COLUMNS} for e in entries],
+                      execution_options={TRACKED_INSERT: True}).all()
+    track_inserted(db, rows)
+    return rows
+
+@contextmanager
+def clash_guard(db, detail: str = "Timetable change clashes with an existing staff or room booking"):
+    """Roll back and answer HTTP 409 when writes in the block hit a unique slot index"""
+    try:
+        yield
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=detail
+        )
@@ -5,6 +5,7 @@ Provides web interface for all timetable management operations
 
 import os
 import requests
+from io import BytesIO
 from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, send_file
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
 from dotenv import load_dotenv
@@ -42,6 +43,9 @@ def create_flask_app():
     # API Base URL
     API_BASE_URL = f"http://{os.getenv('FASTAPI_HOST', '127.0.0.1')}:{os.getenv('FASTAPI_PORT', 8000)}/api"
     
+    # Rows per page on the list pages
+    PAGE_SIZE = int(os.getenv('PAGE_SIZE', 50))
+    
     @login_manager.user_loader
     def load_user(user_id):
         """Load user for Flask-Login"""
@@ -67,13 +71,26 @@ def create_flask_app():
             elif method == 'DELETE':
                 response = requests.delete(url, headers=headers)
             
-            if response.status_code == 200 or response.status_code == 201:
+            if response.status_code in (200, 201, 202):
                 return response.json()
             else:
                 return {'error': response.json().get('detail', 'API request failed')}
         except Exception as e:
             return {'error': str(e)}
     
+    def fetch_page(endpoint, params, token):
+        """Fetch one page of a list endpoint; returns (rows, next cursor) or an error dict"""
+        params = {k: v for k, v in params.items() if v not in (None, '')}
+        params['limit'] = PAGE_SIZE
+        try:
+            response = requests.get(f"{API_BASE_URL}{endpoint}", headers={'Authorization': f'Bearer {token}'},
+                                    params=params)
+            if response.status_code == 200:
+                return response.json(), response.headers.get('X-Next-Cursor')
+            return {'error': response.json().get('detail', 'API request failed')}
+        except Exception as e:
+            return {'error': str(e)}
+    
     # Routes
     @app.route('/')
     def index():
@@ -205,36 +222,43 @@ def create_flask_app():
     @login_required
     def staff():
         """Staff management page"""
-        # Get staff based on user permissions
-        if current_user.user_type == 'main_admin':
-            staff_list = make_api_request('/staff', token=current_user.token)
-        else:
-            staff_list = make_api_request(f'/staff?department_id={current_user.department_id}', token=current_user.token)
+        # Get one page of staff based on user permissions
+        search = request.args.get('q', '')
+        params = {'search': search, 'cursor': request.args.get('cursor')}
+        if current_user.user_type != 'main_admin':
+            params['department_id'] = current_user.department_id
         
-        if 'error' in staff_list:
-            staff_list = []
-            flash(staff_list['error'], 'error')
+        page = fetch_page('/staff/', params, current_user.token)
+        if isinstance(page, dict):
+            flash(page['error'], 'error')
+            staff_list, next_cursor = [], None
+        else:
+            staff_list, next_cursor = page
         
         # Get departments for dropdown
         departments = make_api_request('/departments', token=current_user.token)
         if 'error' in departments:
             departments = []
         
-        return render_template('staff.html', staff_list=staff_list, departments=departments)
+        return render_template('staff.html', staff_list=staff_list, departments=departments,
+                             search=search, next_cursor=next_cursor, paged=bool(request.args.get('cursor')))
     
     @app.route('/subjects')
     @login_required
     def subjects():
         """Subjects management page"""
-        # Get subjects based on user permissions
-        if current_user.user_type == 'main_admin':
-            subjects_list = make_api_request('/subjects', token=current_user.token)
-        else:
-            subjects_list = make_api_request(f'/subjects?department_id={current_user.department_id}', token=current_user.token)
+        # Get one page of subjects based on user permissions
+        search = request.args.get('q', '')
+        params = {'search': search, 'cursor': request.args.get('cursor')}
+        if current_user.user_type != 'main_admin':
+            params['department_id'] = current_user.department_id
         
-        if 'error' in subjects_list:
-            subjects_list = []
-            flash(subjects_list['error'], 'error')
+        page = fetch_page('/subjects/', params, current_user.token)
+        if isinstance(page, dict):
+            flash(page['error'], 'error')
+            subjects_list, next_cursor = [], None
+        else:
+            subjects_list, next_cursor = page
         
         # Get departments and staff for dropdowns
         departments = make_api_request('/departments', token=current_user.token)
@@ -248,7 +272,10 @@ def create_flask_app():
         return render_template('subjects.html', 
                              subjects=subjects_list, 
                              departments=departments, 
-                             staff_list=staff_list)
+                             staff_list=staff_list,
+                             search=search,
+                             next_cursor=next_cursor,
+                             paged=bool(request.args.get('cursor')))
     
     @app.route('/timetable')
     @login_required
@@ -290,7 +317,7 @@ def create_flask_app():
             flash('This page is for staff members only.', 'error')
             return redirect(url_for('dashboard'))
         
-        timetable = make_api_request(f'/timetable?staff_id={current_user.id}', token=current_user.token)
+        timetable = make_api_request(f'/timetable/view?staff_id={current_user.id}', token=current_user.token)
         if 'error' in timetable:
             timetable = []
             flash(timetable['error'], 'error')
@@ -298,12 +325,33 @@ def create_flask_app():
         return render_template('my_timetable.html', timetable=timetable)
     
     # API endpoints for AJAX requests
+    @app.route('/api/timetable')
+    @login_required
+    def api_timetable():
+        """Timetable rows with subject, staff, room and slot details for the grid"""
+        response = make_api_request('/timetable/view', 'GET', request.args.to_dict(), current_user.token)
+        return jsonify(response)
+    
     @app.route('/api/generate-timetable', methods=['POST'])
     @login_required
     def api_generate_timetable():
-        """Generate timetable via AJAX"""
+        """Queue timetable generation via AJAX; returns the job to poll"""
         data = request.get_json()
-        response = make_api_request('/timetable/generate', 'POST', data, current_user.token)
+        response = make_api_request('/timetable/jobs', 'POST', data, current_user.token)
+        return jsonify(response)
+    
+    @app.route('/api/timetable-jobs/<job_id>', methods=['GET', 'DELETE'])
+    @login_required
+    def api_timetable_job(job_id):
+        """Poll or cancel a timetable generation job"""
+        response = make_api_request(f'/timetable/jobs/{job_id}', request.method, None, current_user.token)
+        return jsonify(response)
+    
+    @app.route('/api/timetable-jobs/<job_id>/result')
+    @login_required
+    def api_timetable_job_result(job_id):
+        """Fetch the timetable produced by a finished job"""
+        response = make_api_request(f'/timetable/jobs/{job_id}/result', 'GET', None, current_user.token)
         return jsonify(response)
     
     @app.route('/api/export-timetable')
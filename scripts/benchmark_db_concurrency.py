@@ -0,0 +1,138 @@
+"""
+Reader throughput while a timetable generation is writing
+
+Runs the same workload against a scratch SQLite database in rollback-journal
+mode and in WAL mode: one writer repeatedly replaces a section's timetable in
+a single transaction (as store_scope_timetable does), holding it open for a
+while like a slow generation, while several readers keep loading timetables.
+
+Usage: python -m scripts.benchmark_db_concurrency [--seconds 5] [--readers 8] [--hold 0.2]
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+from datetime import time as clock
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+from backend.database.database import Base, create_db_engine
+from backend.database.models import Department, Staff, Subject, Classroom, TimeSlot, TimetableEntry
+
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+SLOTS = 8
+SECTIONS = ["A", "B", "C", "D"]
+
+def seed(Session):
+    db = Session()
+    dept = Department(name="Computer Science", code="CSE")
+    db.add(dept)
+    db.flush()
+    for i in range(SLOTS):
+        db.add(TimeSlot(slot_name=f"Period {i + 1}", start_time=clock(9 + i), end_time=clock(10 + i)))
+    for i in range(40):
+        db.add(Staff(name=f"Staff {i}", email=f"staff{i}@srmist.edu.in", password_hash="x",
+                     role="Professor", department_id=dept.id))
+        db.add(Classroom(room_number=f"CSE-{i:03d}", capacity=60, room_type="Lecture", department_id=dept.id))
+        db.add(Subject(name=f"Subject {i}", code=f"CS{i:03d}", department_id=dept.id, semester=3))
+    db.flush()
+    for s, section in enumerate(SECTIONS):
+        db.add_all(section_entries(dept.id, section, s * 10))
+    department_id = dept.id
+    db.commit()
+    db.close()
+    return department_id
+
+def section_entries(department_id, section, offset):
+    return [
+        TimetableEntry(day=day, time_slot_id=slot + 1, subject_id=offset + slot + 1,
+                       staff_id=offset + slot + 1, classroom_id=offset + slot + 1,
+                       department_id=department_id, semester=3, section=section)
+        for day in DAYS for slot in range(SLOTS)
+    ]
+
+def run(journal_mode, seconds, readers, hold):
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_db_engine(f"sqlite:///{path}", sqlite_pragmas={"journal_mode": journal_mode})
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    department_id = seed(Session)
+
+    stop = threading.Event()
+    lock = threading.Lock()
+    stats = {"reads": 0, "read_errors": 0, "latencies": [], "commits": 0, "write_errors": 0}
+
+    def writer():
+        while not stop.is_set():
+            db = Session()
+            try:
+                db.query(TimetableEntry).filter(TimetableEntry.section == "A").delete()
+                db.add_all(section_entries(department_id, "A", 0))
+                db.flush()
+                time.sleep(hold)  # the transaction stays open, as during a slow generation
+                db.commit()
+                stats["commits"] += 1
+            except OperationalError:
+                db.rollback()
+                stats["write_errors"] += 1
+            finally:
+                db.close()
+
+    def reader(n):
+        section = SECTIONS[n % len(SECTIONS)]
+        while not stop.is_set():
+            db = Session()
+            started = time.perf_counter()
+            try:
+                db.query(TimetableEntry).filter(
+                    TimetableEntry.department_id == department_id,
+                    TimetableEntry.semester == 3,
+                    TimetableEntry.section == section
+                ).all()
+                with lock:
+                    stats["reads"] += 1
+                    stats["latencies"].append(time.perf_counter() - started)
+            except OperationalError:
+                with lock:
+                    stats["read_errors"] += 1
+            finally:
+                db.close()
+
+    threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    engine.dispose()
+
+    latencies = sorted(stats["latencies"]) or [0.0]
+    return {
+        "reads_per_second": stats["reads"] / seconds,
+        "read_errors": stats["read_errors"],
+        "median_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1 if len(latencies) > 1 else 0] * 1000,
+        "writer_commits": stats["commits"],
+        "writer_errors": stats["write_errors"]
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--hold", type=float, default=0.2, help="seconds each write transaction stays open")
+    args = parser.parse_args()
+
+    print(f"📊 {args.readers} readers, 1 writer holding each transaction {args.hold}s, {args.seconds}s per mode")
+    for journal_mode in ("DELETE", "WAL"):
+        result = run(journal_mode, args.seconds, args.readers, args.hold)
+        print(f"{journal_mode:>6}: {result['reads_per_second']:8.0f} reads/s  "
+              f"median {result['median_ms']:6.2f} ms  p99 {result['p99_ms']:7.2f} ms  "
+              f"read errors {result['read_errors']}  commits {result['writer_commits']}  "
+              f"write errors {result['writer_errors']}")
+
+if __name__ == "__main__":
+    main()
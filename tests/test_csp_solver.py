@@ -0,0 +1,25 @@
+"""
+Regression tests for the CSP timetable solver
+"""
+
+from datetime import time
+from backend.utils.occupancy import OccupancyGrid
+from backend.utils.csp_solver import CSPTimetableSolver, build_tasks
+
+TIME_SLOTS = [{"id": i + 1, "slot_name": f"Period {i + 1}", "start_time": time(9 + i), "end_time": time(10 + i)}
+              for i in range(6)]
+
+def test_practical_hours_without_lab_rooms_are_reported_unplaced():
+    """Without a Lab room the lab subject's hours are reported unplaced instead of crashing the solve"""
+    classrooms = [{"id": 1, "room_number": "CSE-101", "capacity": 60, "room_type": "Theory"}]
+    subjects = [
+        {"id": 1, "code": "CS101", "assigned_staff_id": 1, "theory_hours": 3, "practical_hours": 0},
+        {"id": 2, "code": "CS102", "assigned_staff_id": 2, "theory_hours": 2, "practical_hours": 2},
+    ]
+    grid = OccupancyGrid(TIME_SLOTS, [1, 2], classrooms)
+
+    result = CSPTimetableSolver(grid, build_tasks(subjects), max_hours_per_day=6, time_budget=1.0).solve()
+
+    assert [entry["subject_id"] for entry in result["timetable"]] == [1, 1, 1]
+    assert not result["complete"]
+    assert [(item["subject"]["id"], item["hours"]) for item in result["unplaced"]] == [(2, 4)]